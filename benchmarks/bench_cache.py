@@ -0,0 +1,50 @@
+"""
+Micro-benchmark the SQLite cache backend against LocMem and Django's database cache.
+
+    python -m benchmarks.bench_cache --ops 5000
+"""
+import argparse
+import tempfile
+
+from benchmarks.common import benchmark_database, measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ops', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache.backends.db import DatabaseCache
+    from django.core.cache.backends.locmem import LocMemCache
+    from django.core.management import call_command
+    from medcard_app.cache_backends import SQLiteCache
+
+    payload = {'user': {'username': 'pat', 'email': 'pat@example.com', 'password': 'x' * 40},
+               'profile': {'patient_fullname': 'Pat', 'patient_address': 'Main street 1'}, 'code': '1234'}
+    options = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+
+    with benchmark_database(), tempfile.TemporaryDirectory() as directory:
+        call_command('createcachetable', 'medcard_bench_cache', verbosity=0)
+        backends = {
+            'locmem': LocMemCache('bench', options),
+            'database': DatabaseCache('medcard_bench_cache', options),
+            'sqlite': SQLiteCache(f'{directory}/cache.sqlite3', options),
+        }
+        for name, cache in backends.items():
+            keys = [f'verification_{number}@example.com' for number in range(args.ops)]
+            operations = {
+                'set': lambda: [cache.set(key, payload, 1800) for key in keys],
+                'get hit': lambda: [cache.get(key) for key in keys],
+                'get miss': lambda: [cache.get(f'missing_{key}') for key in keys],
+                'add (exists)': lambda: [cache.add(key, payload) for key in keys],
+                'incr': lambda: [cache.set('counter', 0), *(cache.incr('counter') for _ in keys)],
+            }
+            for operation, func in operations.items():
+                samples = [sample / args.ops for sample in measure(func, 3)]
+                report(f'{name:<9} {operation}', samples)
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Throughput and "database is locked" rate of concurrent API workers per database profile.
+
+    python -m benchmarks.bench_concurrency --workers 8 --seconds 20
+
+Each worker process runs requests through the full Django stack against one
+shared SQLite file: reads of the doctor list, free slots and the patient's
+appointments, and appointment bookings (``AppointmentAPIViewPost``).  Every
+profile runs in a fresh interpreter so its settings apply from start-up.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from benchmarks.common import BASE_DIR, benchmark_database, setup_django
+
+PROFILES = ['development', 'production']
+
+
+def seed(doctors, patients):
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+    from benchmarks.seed import seed_directory
+    from medcard_app.models import DoctorAvailability, Doctors
+
+    seed_directory(doctors)
+    DoctorAvailability.objects.bulk_create(
+        [DoctorAvailability(doctor_id=pk, day_of_week=day, start_time='08:00', end_time='20:00')
+         for pk in Doctors.objects.values_list('pk', flat=True) for day in range(1, 8)])
+    users = User.objects.bulk_create([User(username=f'PAT{number}', password='!') for number in range(patients)])
+    return [token.key for token in Token.objects.bulk_create([Token(key=Token.generate_key(), user=user)
+                                                              for user in users])]
+
+
+def worker(number, tokens, doctor_ids, seconds, write_share, results):
+    from django.db import OperationalError, connections
+    from rest_framework.test import APIClient
+
+    rng = random.Random(number)
+    client = APIClient()
+    counts, latencies = Counter(), []
+    first_day = date.today() + timedelta(days=1)
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {rng.choice(tokens)}')
+        write = rng.random() < write_share
+        started = time.perf_counter()
+        try:
+            if write:
+                slot = rng.randrange(24)
+                start = f'{8 + slot // 2:02}:{slot % 2 * 30:02}'
+                end = f'{8 + (slot + 1) // 2:02}:{(slot + 1) % 2 * 30:02}'
+                response = client.post('/api/appointments_crud/', {
+                    'doctor': rng.choice(doctor_ids), 'status': 'scheduled', 'start_time': start, 'end_time': end,
+                    'date': (first_day + timedelta(days=rng.randrange(90))).isoformat()})
+            else:
+                response = rng.choice([
+                    lambda: client.get('/api/doctors/', {'page_size': 20}),
+                    lambda: client.get('/api/free_slots/', {'doctor': rng.choice(doctor_ids),
+                                                            'date_from': first_day.isoformat()}),
+                    lambda: client.get('/api/appointments_list/'),
+                ])()
+            outcome = f'{"write" if write else "read"} {response.status_code}'
+        except OperationalError as error:
+            outcome = f'{"write" if write else "read"} locked' if 'locked' in str(error) else repr(error)
+        latencies.append(time.perf_counter() - started)
+        counts[outcome] += 1
+    connections.close_all()
+    results.put((counts, latencies))
+
+
+def run(args):
+    os.environ['MEDCARD_DB_PROFILE'] = args.profile
+    setup_django()
+    from django.conf import settings
+    from django.db import connection, connections
+    from medcard_app.models import Doctors
+
+    with benchmark_database():
+        tokens = seed(args.doctors, args.patients)
+        doctor_ids = list(Doctors.objects.values_list('pk', flat=True))
+        with connection.cursor() as cursor:
+            journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+        # Children must open their own connections
+        connections.close_all()
+
+        results = multiprocessing.get_context('fork').Queue()
+        processes = [multiprocessing.get_context('fork').Process(
+            target=worker, args=(number, tokens, doctor_ids, args.seconds, args.write_share, results))
+            for number in range(args.workers)]
+        for process in processes:
+            process.start()
+        counts, latencies = Counter(), []
+        for _ in processes:
+            worker_counts, worker_latencies = results.get()
+            counts.update(worker_counts)
+            latencies.extend(worker_latencies)
+        for process in processes:
+            process.join()
+
+    requests = sum(counts.values())
+    locked = sum(count for outcome, count in counts.items() if outcome.endswith('locked'))
+    latencies.sort()
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    print(f'{args.profile}: journal_mode={journal_mode} CONN_MAX_AGE={settings.DATABASES["default"]["CONN_MAX_AGE"]}')
+    print(f'  {requests / args.seconds:8.1f} requests/s, {locked} locked ({locked / requests:.2%}), '
+          f'p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms')
+    print('  ' + ', '.join(f'{outcome}: {count}' for outcome, count in sorted(counts.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profile', choices=PROFILES, help='Run one profile (default: each in turn).')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--write-share', type=float, default=0.3)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--patients', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.profile:
+        run(args)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in PROFILES:
+            # A private cache file per profile, so neither run sees the other's entries
+            env = dict(os.environ, MEDCARD_CACHE_PATH=f'{directory}/{profile}-cache.sqlite3')
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_concurrency', '--profile', profile,
+                            *sys.argv[1:]], cwd=BASE_DIR, env=env, check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Time prescription conflict checks and a population screen.
+
+    python -m benchmarks.bench_contraindications --profiles 200000
+
+The reference table pairs ``--pairs`` random allergy/medication names; the
+profile rows draw their allergy and medication from the same name pools.
+"""
+import argparse
+import random
+import time
+from datetime import date
+
+from benchmarks.common import benchmark_database, measure, report, setup_django
+
+
+def seed(profiles, pairs, rng, allergies=200, medications=2000):
+    from django.db import transaction
+    from benchmarks.seed import word
+    from medcard_app.directory import insert_rows
+    from medcard_app.models import (Allergies, ChronicIllnesses, Contraindication, GeneticIllnesses,
+                                    MedicalCondition, Medication, PatientMedicalProfile)
+
+    allergy_names = sorted({word(rng) for _ in range(allergies)})
+    medication_names = sorted({word(rng, 4) for _ in range(medications)})
+    Contraindication.objects.bulk_create(
+        [Contraindication(allergy_name=allergy, medication_name=medication)
+         for allergy, medication in {(rng.choice(allergy_names), rng.choice(medication_names)) for _ in range(pairs)}])
+    # Conditions and profile rows reference each other; the check is deferred to the commit
+    with transaction.atomic():
+        allergy_rows = Allergies.objects.bulk_create(
+            [Allergies(allergy_name=name, allergy_description='') for name in allergy_names])
+        medication_rows = Medication.objects.bulk_create(
+            [Medication(name=name, dosage='1/day', side_effects='', start_date=date(2020, 1, 1))
+             for name in medication_names])
+        genetic = GeneticIllnesses.objects.create(genetic_illness_name='None', description='')
+        chronic = ChronicIllnesses.objects.create(chronic_illness_name='None', description='', monitoring_freq='',
+                                                  severity_stage='')
+        condition = MedicalCondition.objects.create(patient_id_id=1, diagnosis='None')
+        insert_rows(PatientMedicalProfile,
+                    ['patient_id', 'allergy_id', 'genetic_id', 'medication_id', 'chron_illness_id', 'condition_id',
+                     'doctor_notes'],
+                    [(rng.randint(1, profiles // 5), rng.choice(allergy_rows).pk, genetic.pk,
+                      rng.choice(medication_rows).pk, chronic.pk, condition.pk, '') for _ in range(profiles)])
+    return allergy_names, medication_names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=200000)
+    parser.add_argument('--pairs', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    from medcard_app.contraindications import contraindications, screen
+
+    rng = random.Random(42)
+    with benchmark_database():
+        allergy_names, medication_names = seed(args.profiles, args.pairs, rng)
+        started = time.perf_counter()
+        contraindications.table()
+        print(f'load {args.pairs} pairs: {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        prescriptions = [(rng.sample(allergy_names, 3), rng.sample(medication_names, 5)) for _ in range(10000)]
+        samples = measure(lambda: [contraindications.conflicts(*prescription) for prescription in prescriptions], 5)
+        report('check 3 allergies x 5 medications', [sample / len(prescriptions) for sample in samples])
+
+        started = time.perf_counter()
+        found = screen()
+        print(f'screen {args.profiles} profile rows: {time.perf_counter() - started:.2f}s, '
+              f'{len(found)} patients with conflicts')
+
+
+if __name__ == '__main__':
+    main()
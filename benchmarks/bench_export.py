@@ -0,0 +1,69 @@
+"""
+Compare the peak memory of a streamed appointment export with serializing the whole table.
+
+    python -m benchmarks.bench_export --appointments 200000
+
+Peak Python heap use is measured with tracemalloc, so the absolute numbers
+are larger than without it; the point is how each grows with the row count.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, time as clock, timedelta
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+def traced(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        func()
+        return time.perf_counter() - started, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--doctors', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from benchmarks.seed import seed_directory
+    from medcard_app import exports
+    from medcard_app.models import Appointment, Doctors
+    from medcard_app.serializers import AppointmentSerializer
+
+    with benchmark_database():
+        rng = seed_directory(args.doctors)
+        doctors = list(Doctors.objects.values_list('pk', flat=True))
+        patients = User.objects.bulk_create([User(username=f'PAT{number}', password='!') for number in range(1000)])
+        # Every doctor sees 16 patients a day, one per half hour from 09:00
+        batch = []
+        for number in range(args.appointments):
+            day, slot = divmod(number // len(doctors), 16)
+            start = clock(9 + slot // 2, 30 * (slot % 2))
+            batch.append(Appointment(patient=rng.choice(patients), doctor_id=doctors[number % len(doctors)],
+                                     date=date(2026, 1, 1) + timedelta(days=day), start_time=start,
+                                     end_time=clock(start.hour, start.minute + 29)))
+            if len(batch) == 10000:
+                Appointment.objects.bulk_create(batch)
+                batch = []
+        Appointment.objects.bulk_create(batch)
+
+        first = Appointment.objects.order_by('pk').values_list('pk', flat=True).first()
+        for rows in (args.appointments // 10, args.appointments):
+            selected = {'pk__lt': first + rows}
+            serialized = traced(lambda: AppointmentSerializer(
+                Appointment.objects.filter(**selected).order_by('pk'), many=True).data)
+            streamed = traced(lambda: sum(len(piece) for piece in exports.stream(
+                exports.appointments().filter(**selected).order_by('pk').iterator(chunk_size=exports.CHUNK_SIZE))))
+            for label, (elapsed, peak) in [('serializer.data', serialized), ('streamed NDJSON', streamed)]:
+                print(f'{rows:>8} rows  {label:<16} {elapsed:7.2f}s  peak {peak / 2 ** 20:8.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Compare the grid-cell nearest-clinic search with scanning every clinic.
+
+    python -m benchmarks.bench_geo --clinics 50000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import benchmark_database, measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clinics', type=int, default=50000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from medcard_app import geo
+    from medcard_app.models import Clinics
+    from benchmarks.seed import seed_directory
+
+    def scan(latitude, longitude):
+        rows = Clinics.objects.exclude(latitude=None).values_list('pk', 'latitude', 'longitude')
+        return sorted((geo.distance_km(latitude, longitude, lat, lng), pk) for pk, lat, lng in rows)[:args.k]
+
+    with benchmark_database():
+        started = time.perf_counter()
+        seed_directory(args.clinics, clinics=args.clinics)
+        print(f'Seeded {args.clinics} clinics in {time.perf_counter() - started:.1f}s\n')
+
+        rng = random.Random(7)
+        for _ in range(3):
+            latitude, longitude = 41 + rng.uniform(-0.8, 0.8), 69 + rng.uniform(-0.8, 0.8)
+            label = f'({latitude:.3f}, {longitude:.3f})'
+            report(f'grid {label}', measure(lambda: geo.nearest_clinics(latitude, longitude, args.k), args.repeat))
+            report(f'scan {label}', measure(lambda: scan(latitude, longitude), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
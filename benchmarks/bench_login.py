@@ -0,0 +1,82 @@
+"""
+Compare the login view with the previous authenticate()-based implementation.
+
+    python -m benchmarks.bench_login --logins 20 --storm 200
+
+Reports logins/s, CPU time and queries per successful login, and CPU time per
+attempt of a bad-password storm against one account.
+"""
+import argparse
+import time
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--storm', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import authenticate, login
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.middleware import SessionMiddleware
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework import status
+    from rest_framework.authtoken.models import Token
+    from rest_framework.response import Response
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.views import APIView
+    from medcard_app.models import EmailVerification
+    from medcard_app.views import LoginAPIView
+
+    class LegacyLoginView(APIView):
+        """The login view before the fast path."""
+
+        def post(self, request):
+            username, password = request.data['username'], request.data['password']
+            user = authenticate(request, username=username, password=password)
+            if user is None:
+                return Response(status=status.HTTP_401_UNAUTHORIZED)
+            if not EmailVerification.objects.get(user=user).verified:
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+            token, created = Token.objects.get_or_create(user=user)
+            login(request, user)
+            cache.set(user.email, {'username': username, 'role': 'patient'})
+            return Response({'token': token.key}, status=status.HTTP_200_OK)
+
+    factory = APIRequestFactory()
+
+    def call(view, password, ip='10.0.0.1'):
+        request = factory.post('/api/login/', {'username': 'pat', 'password': password}, REMOTE_ADDR=ip)
+        return SessionMiddleware(view)(request)
+
+    def run(label, view):
+        cache.clear()
+        started, cpu = time.perf_counter(), time.process_time()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(args.logins):
+                assert call(view, 'secret-pass-1').status_code == 200
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+        print(f'{label:<8} login   {args.logins / elapsed:8.1f} logins/s   {cpu / args.logins * 1000:8.2f} ms CPU'
+              f'   {len(queries) / args.logins:5.1f} queries/login')
+
+        cpu = time.process_time()
+        rejected = sum(call(view, 'wrong', ip=f'10.1.{n // 250}.{n % 250}').status_code == 429
+                       for n in range(args.storm))
+        cpu = time.process_time() - cpu
+        print(f'{label:<8} storm   {cpu / args.storm * 1000:8.2f} ms CPU/attempt   {rejected}/{args.storm} '
+              f'rejected before hashing')
+
+    with benchmark_database():
+        user = User.objects.create_user(username='pat', password='secret-pass-1', email='pat@example.com')
+        EmailVerification.objects.create(user=user, code='1234', verified=True)
+        run('before', LegacyLoginView.as_view())
+        run('after', LoginAPIView.as_view())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Time the medication interval queries on a synthetic dataset.
+
+    python -m benchmarks.bench_medications --medications 1000000
+
+Patients get ``--per-patient`` medications on average, started over ten years,
+lasting a week to two years, with a share left open-ended.  Run with
+``--without-indexes`` to drop the (patient_id, medication_id) index and compare.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from benchmarks.common import benchmark_database, measure, report, setup_django
+
+INDEXES = ['medical_profile_medication_idx']
+
+
+def seed(medications, per_patient, open_share, rng, batch_size=100000):
+    from django.db import connection, transaction
+    from medcard_app.directory import insert_rows
+    from medcard_app.models import (Allergies, ChronicIllnesses, GeneticIllnesses, MedicalCondition, Medication,
+                                    PatientMedicalProfile)
+
+    # Conditions and profile rows reference each other; the check is deferred to the commit
+    with transaction.atomic():
+        allergy = Allergies.objects.create(allergy_name='None', allergy_description='')
+        genetic = GeneticIllnesses.objects.create(genetic_illness_name='None', description='')
+        chronic = ChronicIllnesses.objects.create(chronic_illness_name='None', description='', monitoring_freq='',
+                                                  severity_stage='')
+        condition = MedicalCondition.objects.create(patient_id_id=1, diagnosis='None')
+        first_day = date(2016, 1, 1)
+        patients = medications // per_patient
+        for start in range(0, medications, batch_size):
+            count = min(batch_size, medications - start)
+            rows = []
+            for _ in range(count):
+                started = first_day + timedelta(days=rng.randrange(3650))
+                ended = None if rng.random() < open_share else started + timedelta(days=rng.randint(7, 730))
+                rows.append(('Medication', '1/day', '', started, ended))
+            insert_rows(Medication, ['name', 'dosage', 'side_effects', 'start_date', 'end_date'], rows)
+            insert_rows(PatientMedicalProfile,
+                        ['patient_id', 'allergy_id', 'genetic_id', 'medication_id', 'chron_illness_id', 'condition_id',
+                         'doctor_notes'],
+                        # Charts grow over years, so a patient's rows are spread over the table
+                        [(rng.randint(1, patients), allergy.pk, genetic.pk, start + number + 1, chronic.pk,
+                          condition.pk, '') for number in range(count)])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--medications', type=int, default=1000000)
+    parser.add_argument('--per-patient', type=int, default=5)
+    parser.add_argument('--open-share', type=float, default=0.2, help='Share of medications without an end date.')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--without-indexes', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from medcard_app.medications import medications_by_patient, patient_medications
+
+    rng = random.Random(42)
+    with benchmark_database():
+        seed(args.medications, args.per_patient, args.open_share, rng)
+        if args.without_indexes:
+            with connection.cursor() as cursor:
+                for name in INDEXES:
+                    cursor.execute(f'DROP INDEX {name}')
+        patients = args.medications // args.per_patient
+        today, past = date(2026, 10, 17), date(2020, 3, 1)
+        some = [rng.randint(1, patients) for _ in range(1000)]
+
+        def cases():
+            patient = rng.randint(1, patients)
+            return {
+                'one patient, on a date': lambda: list(patient_medications(patient, past, past)),
+                'one patient, a year window': lambda: list(patient_medications(patient, past, past + timedelta(365))),
+                '1000 patients, on a date': lambda: medications_by_patient(some, past, past),
+                'everyone, active today': lambda: medications_by_patient(None, today, today),
+                'everyone, one week in 2020': lambda: medications_by_patient(None, past, past + timedelta(6)),
+            }
+
+        for label in cases():
+            repeat = args.repeat if label.startswith('one') else 3
+            report(label, measure(lambda: cases()[label](), repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Measure the email outbox against sending one SMTP session per message.
+
+    python -m benchmarks.bench_outbox --messages 2000 --handshake-ms 50
+
+A local SMTP sink stands in for the mail server; ``--handshake-ms`` adds the
+greeting delay a remote server with TLS would cost per connection.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+class SMTPSink(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept and discard messages."""
+    handshake = 0.0
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        time.sleep(self.handshake)
+        self.reply('220 sink ready')
+        in_data = False
+        for raw in self.rfile:
+            line = raw.decode(errors='replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    self.reply('250 queued')
+                continue
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply('250 sink')
+            elif command == 'DATA':
+                in_data = True
+                self.reply('354 go ahead')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--handshake-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.mail import get_connection, send_mail
+    from medcard_app import outbox
+
+    SMTPSink.handshake = args.handshake_ms / 1000
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPSink)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    options = dict(backend='django.core.mail.backends.smtp.EmailBackend', host='127.0.0.1',
+                   port=server.server_address[1], username='', password='', use_tls=False)
+
+    with benchmark_database():
+        sample = min(args.messages, 100)
+        started = time.perf_counter()
+        for number in range(sample):
+            send_mail('Verification Code', 'Your verification code is: 1234.', 'medcard@example.com',
+                      [f'user{number}@example.com'], connection=get_connection(**options))
+        per_message = (time.perf_counter() - started) / sample
+        print(f'send_mail per request   {per_message * 1000:9.3f} ms/signup   {1 / per_message:8.0f} emails/s')
+
+        started = time.perf_counter()
+        for number in range(args.messages):
+            outbox.enqueue('Verification Code', 'Your verification code is: 1234.', [f'user{number}@example.com'])
+        per_message = (time.perf_counter() - started) / args.messages
+        print(f'outbox enqueue          {per_message * 1000:9.3f} ms/signup')
+
+        started = time.perf_counter()
+        sent, retrying, failed = outbox.drain(args.batch_size, connection=get_connection(**options))
+        elapsed = time.perf_counter() - started
+        print(f'send_queued_emails      {sent} sent, {retrying} retrying, {failed} failed in {elapsed:.2f}s '
+              f'{sent / elapsed:8.0f} emails/s')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
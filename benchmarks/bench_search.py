@@ -0,0 +1,38 @@
+"""
+Compare the FTS5 search index with ``icontains`` scans.
+
+    python -m benchmarks.bench_search --doctors 200000
+"""
+import argparse
+import time
+
+from benchmarks.common import benchmark_database, measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from medcard_app import search
+    from benchmarks.seed import seed_directory, word
+
+    with benchmark_database():
+        started = time.perf_counter()
+        rng = seed_directory(args.doctors)
+        print(f'Seeded {args.doctors} doctors in {time.perf_counter() - started:.1f}s')
+        started = time.perf_counter()
+        count = search.rebuild()
+        print(f'Rebuilt the search index ({count} rows) in {time.perf_counter() - started:.2f}s\n')
+
+        queries = ['cardio', 'ka', 'neuro ' + word(rng, 1).lower(), word(rng, 2).lower(), 'clinic street']
+        for query in queries:
+            report(f'fts5      {query!r}', measure(lambda: search.search_ids(query, limit=20), args.repeat))
+            report(f'icontains {query!r}',
+                   measure(lambda: search._search_ids_icontains(query, None, 20), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Time sync_directory on a generated provider directory export.
+
+    python -m benchmarks.bench_sync --doctors 10000
+
+Runs an initial load, a no-op re-sync and a re-sync with a share of the
+doctors edited, and prints each change summary.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+from benchmarks.common import benchmark_database, setup_django
+
+
+def build_export(doctors, clinics, rng):
+    from benchmarks.seed import SPECIALITIES, word
+
+    export = [{'clinic_name': f'{word(rng)} Clinic {number}', 'contacts': '+998 71 000 00 00',
+               'address': f'{rng.randint(1, 200)} {word(rng, 2)} street',
+               'clinic_location': f'{41 + rng.uniform(-1, 1):.5f},{69 + rng.uniform(-1, 1):.5f}', 'doctors': []}
+              for number in range(clinics)]
+    for number in range(doctors):
+        rng.choice(export)['doctors'].append({
+            'doctor_username': f'DOC{number}', 'doctor_fullname': f'{word(rng)} {word(rng, 2)}',
+            'doctor_birthdate': f'19{rng.randint(50, 99)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}',
+            'doctor_phone': '998000000', 'doctor_license_no': f'L-{number}',
+            'speciality_name': rng.choice(SPECIALITIES),
+            'availabilities': [{'day_of_week': day, 'start_time': '09:00', 'end_time': '17:00'} for day in range(1, 6)],
+            'qualifications': [{'qualification': 'MD', 'institution': f'{word(rng)} University',
+                                'year_obtained': '2005-06-01'}],
+            'experiences': [{'place_of_experience': f'{word(rng)} Hospital', 'start_year': '2006-01-01',
+                             'end_year': '2015-01-01', 'position': 'Resident', 'description': ''}],
+        })
+    return export
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=10000)
+    parser.add_argument('--clinics', type=int, default=300)
+    parser.add_argument('--edited', type=float, default=0.05, help='Share of doctors edited before the last sync.')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+
+    rng = random.Random(42)
+    export = build_export(args.doctors, args.clinics, rng)
+    with benchmark_database(), tempfile.TemporaryDirectory() as directory:
+        path = f'{directory}/directory.ndjson'
+
+        def sync(label):
+            with open(path, 'w') as target:
+                target.writelines(json.dumps(clinic) + '\n' for clinic in export)
+            print(f'--- {label}')
+            started = time.perf_counter()
+            call_command('sync_directory', path)
+            print(f'{label}: {time.perf_counter() - started:.2f}s\n')
+
+        sync('initial load')
+        sync('no changes')
+        doctors = [doctor for clinic in export for doctor in clinic['doctors']]
+        for doctor in rng.sample(doctors, int(len(doctors) * args.edited)):
+            doctor['doctor_phone'] = '998111111'
+            doctor['availabilities'][0]['end_time'] = '15:00'
+        sync(f'{args.edited:.0%} of doctors edited')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Shared setup for the benchmark scripts.
+
+Run a benchmark from the repository root with ``python -m benchmarks.<name>``.
+Every benchmark works on a throw-away SQLite database created and migrated
+through Django's test database machinery, so ``db.sqlite3`` is never touched.
+"""
+import contextlib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medcard_project.settings')
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def benchmark_database(name='bench_db.sqlite3'):
+    """Create and migrate a scratch database, destroying it on exit; mirror aliases (the replica) point at it."""
+    from django.db import connection, connections
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = str(BASE_DIR / name)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    mirrors = [alias for alias in connections if connections[alias].settings_dict['TEST']['MIRROR'] == connection.alias]
+    for alias in mirrors:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat):
+    """Call ``func`` ``repeat`` times and return the wall-clock duration of each call in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f'{label:<40} median {statistics.median(samples) * 1000:9.3f} ms   p95 {p95 * 1000:9.3f} ms')
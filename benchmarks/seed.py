@@ -0,0 +1,42 @@
+"""Synthetic directory data for the benchmarks."""
+import random
+from datetime import date
+
+from django.contrib.auth.models import User
+
+SYLLABLES = ['al', 'be', 'chi', 'do', 'er', 'fa', 'gu', 'ha', 'in', 'jo', 'ka', 'li', 'mo', 'na', 'or', 'pe',
+             'qu', 'ra', 'si', 'ta', 'ul', 've', 'wi', 'xa', 'yo', 'zu']
+SPECIALITIES = ['Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Oncology', 'Orthopedics', 'Psychiatry',
+                'Radiology', 'Urology', 'Gastroenterology', 'Endocrinology', 'Ophthalmology', 'Surgery',
+                'Gynecology', 'Pulmonology', 'Nephrology', 'Rheumatology', 'Hematology', 'Allergology', 'Dentistry']
+
+
+def word(rng, parts=3):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+
+def seed_directory(doctors, clinics=None, batch_size=5000, seed=42):
+    """Create ``doctors`` doctors spread over ``clinics`` clinics and every specialty in ``SPECIALITIES``."""
+    from medcard_app.geo import locate
+    from medcard_app.models import Clinics, Doctors, DoctorSpeciality
+
+    rng = random.Random(seed)
+    clinics = clinics or max(1, doctors // 100)
+    specialities = DoctorSpeciality.objects.bulk_create(
+        [DoctorSpeciality(speciality_name=name) for name in SPECIALITIES])
+    clinic_rows = Clinics.objects.bulk_create(
+        [locate(Clinics(clinic_name=f'{word(rng)} Clinic', contacts='+998 71 000 00 00',
+                        address=f'{rng.randint(1, 200)} {word(rng, 2)} street, {word(rng, 2)}',
+                        clinic_location=f'{41 + rng.uniform(-1, 1):.5f},{69 + rng.uniform(-1, 1):.5f}'))
+         for _ in range(clinics)], batch_size=batch_size)
+    for start in range(0, doctors, batch_size):
+        count = min(batch_size, doctors - start)
+        users = User.objects.bulk_create(
+            [User(username=f'DOC{start + i}', email=f'doc{start + i}@example.com', password='!')
+             for i in range(count)], batch_size=batch_size)
+        Doctors.objects.bulk_create(
+            [Doctors(clinic=rng.choice(clinic_rows), doctor_username=user,
+                     doctor_fullname=f'{word(rng)} {word(rng, 4)}', doctor_birthdate=date(1980, 1, 1),
+                     doctor_phone='998000000', doctor_license_no=f'L-{user.pk}',
+                     speciality_name=rng.choice(specialities)) for user in users], batch_size=batch_size)
+    return rng
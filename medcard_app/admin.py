@@ -13,6 +13,12 @@ class EmailAdmin(admin.ModelAdmin):
     list_display = ['user', 'code', 'verified']
 
 
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+
+
 @admin.register(Clinics)
 class ClinicsAdmin(admin.ModelAdmin):
     list_display = ['clinic_name', 'contacts', 'address', 'clinic_location']
@@ -52,3 +58,16 @@ class DoctorsAdmin(admin.ModelAdmin):
 @admin.register(DoctorReview)
 class DoctorsAdmin(admin.ModelAdmin):
     list_display = ['doctor', 'rating', 'review']
+
+
+@admin.register(PatientMedicalProfile)
+class PatientMedicalProfileAdmin(admin.ModelAdmin):
+    list_display = ['patient_id', 'allergy_id', 'medication_id', 'condition_id']
+    list_select_related = ['allergy_id', 'medication_id', 'condition_id']
+    search_fields = ['=patient_id']
+
+
+@admin.register(Contraindication)
+class ContraindicationAdmin(admin.ModelAdmin):
+    list_display = ['allergy_name', 'medication_name', 'reason']
+    search_fields = ['allergy_name', 'medication_name']
@@ -0,0 +1,123 @@
+"""
+Token authentication without a database round trip per request.
+
+``CachedTokenAuthentication`` is a drop-in replacement for DRF's
+``TokenAuthentication``.  Resolved users are kept in a small in-process LRU
+(``LOCAL_TTL`` seconds) in front of the shared Django cache (``SHARED_TTL``
+seconds); only a miss in both runs the ``Token``/``User`` query.  The model
+signals in ``signals.py`` evict a token when it is deleted or its user is
+changed or deactivated.  Other processes drop their local copy within
+``LOCAL_TTL`` seconds.
+
+Both caches hold the user's field values without the password hash, which
+is never written to the shared cache file; the user built from them loads
+the hash lazily if anything asks for it.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+LOCAL_TTL = 30
+LOCAL_MAX_ENTRIES = 10000
+SHARED_TTL = 5 * 60
+
+
+def shared_key(token_key):
+    # Hash the token so raw credentials never end up in cache keys
+    return f'auth_token:{hashlib.sha256(token_key.encode()).hexdigest()}'
+
+
+def user_values(user):
+    """The user's field values to cache: every concrete field but the password hash."""
+    return {field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields if field.attname != 'password'}
+
+
+def build_user(values):
+    # As if loaded with .defer('password'): a save() writes only the cached fields back
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, list(values), list(values.values()))
+
+
+class TokenUserCache:
+    """Thread-safe LRU of token key to user field values with a TTL, plus hit/miss counters."""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES, ttl=LOCAL_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(['local_hits', 'shared_hits', 'misses', 'evictions'], 0)
+
+    def count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            self._stats['local_hits'] += 1
+            return entry[1]
+
+    def set(self, key, values):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), max_entries=self.max_entries, ttl=self.ttl)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = round((lookups - stats['misses']) / lookups, 4) if lookups else None
+        return stats
+
+
+token_cache = TokenUserCache()
+
+
+def invalidate_tokens(keys):
+    """Forget the cached users of the given token keys in this process and in the shared cache."""
+    keys = list(keys)
+    for key in keys:
+        token_cache.delete(key)
+    if keys:
+        cache.delete_many([shared_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        values = token_cache.get(key)
+        if values is None:
+            values = cache.get(shared_key(key))
+            if values is not None:
+                token_cache.count('shared_hits')
+            else:
+                token_cache.count('misses')
+                user, _ = super().authenticate_credentials(key)
+                values = user_values(user)
+                cache.set(shared_key(key), values, timeout=SHARED_TTL)
+            token_cache.set(key, values)
+        # Each request gets its own instance so per-request attributes never leak between requests
+        user = build_user(values)
+        return user, Token(key=key, user=user)
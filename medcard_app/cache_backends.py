@@ -0,0 +1,185 @@
+"""
+A shared cache backend stored in a local SQLite database in WAL mode.
+
+Every worker process on the host opens the same file, so values written by
+one process (pending signups, login roles, cache generations, tokens...) are
+seen by all of them without running a cache server::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'medcard_app.cache_backends.SQLiteCache',
+            'LOCATION': BASE_DIR / 'cache.sqlite3',
+            'TIMEOUT': 300,
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_FREQUENCY': 3},
+        }
+    }
+
+Each statement is atomic on its own; ``add``/``incr``/``touch`` are single
+conditional statements or run under ``BEGIN IMMEDIATE``, so concurrent
+processes never lose updates.  Triggers keep an exact entry count, and a
+write that pushes it past ``MAX_ENTRIES`` purges expired rows and then the
+``1 / CULL_FREQUENCY`` of entries closest to expiry.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)",
+    "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO cache_size VALUES (0, 0)",
+    "CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache "
+    "BEGIN UPDATE cache_size SET entries = entries + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache "
+    "BEGIN UPDATE cache_size SET entries = entries - 1; END",
+]
+# Upserts keep the row (an UPDATE), so the insert trigger only counts new keys
+UPSERT = ("INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+          "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires")
+LIVE = "(expires IS NULL OR expires > ?)"
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            # Pending signups and login roles live here: readable by the owner only.  SQLite gives the
+            # -wal and -shm files the mode of the database file.
+            os.close(os.open(self._path, os.O_CREAT | os.O_RDWR, 0o600))
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _write(self, rows):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(UPSERT, rows)
+            self._cull(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _cull(self, connection):
+        entries, = connection.execute("SELECT entries FROM cache_size").fetchone()
+        if entries <= self._max_entries:
+            return
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        entries, = connection.execute("SELECT entries FROM cache_size").fetchone()
+        if entries > self._max_entries and self._cull_frequency == 0:
+            # CULL_FREQUENCY 0 means clear the whole cache, as with Django's own backends
+            connection.execute("DELETE FROM cache")
+        elif entries > self._max_entries:
+            # Soonest to expire first; entries without a timeout go last
+            connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)",
+                (max(1, entries // self._cull_frequency),))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(f"SELECT value FROM cache WHERE key = ? AND {LIVE}",
+                                         (key, time.time())).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({', '.join('?' * len(keys))}) AND {LIVE}",
+            [*keys, time.time()])
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write([(key, self._dumps(value), self.get_backend_timeout(timeout))])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self._write([(self.make_and_validate_key(key, version=version), self._dumps(value), expires)
+                     for key, value in data.items()])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Replaces the row only when it has expired, so exactly one concurrent add() wins
+            cursor = connection.execute(
+                f"INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE "
+                f"SET value = excluded.value, expires = excluded.expires WHERE NOT {LIVE}",
+                (key, self._dumps(value), self.get_backend_timeout(timeout), time.time()))
+            added = cursor.rowcount > 0
+            if added:
+                self._cull(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(f"SELECT value FROM cache WHERE key = ? AND {LIVE}",
+                                     (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            # Keeps the key's expiry, like the other backends
+            connection.execute("UPDATE cache SET value = ? WHERE key = ?", (self._dumps(value), key))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(f"UPDATE cache SET expires = ? WHERE key = ? AND {LIVE}",
+                                            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._connection().execute(f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(keys))})", keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(f"SELECT 1 FROM cache WHERE key = ? AND {LIVE}",
+                                          (key, time.time())).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests; nothing to do per request
+        pass
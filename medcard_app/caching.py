@@ -0,0 +1,133 @@
+"""
+Pre-rendered API responses and the generation stamps that invalidate them.
+
+A generation is an opaque, time-ordered token stored in the cache.  Rendered
+responses are cached under keys that include the current generation, so
+bumping the generation (from the model signals in ``signals.py``) invalidates
+every variant at once without having to know which keys exist.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.http import condition
+from rest_framework.renderers import JSONRenderer
+
+from .routers import pin_to_primary
+
+RENDERED_RESPONSE_TIMEOUT = 60 * 60 * 24
+
+CLINIC_LIST_GENERATION = 'clinic_list:generation'
+
+
+def doctor_generation_key(pk):
+    return f'doctor_profile:{pk}:generation'
+
+
+def patient_generation_key(username):
+    return f'patient_profile:{username}:generation'
+
+
+def medical_record_generation_key(patient_id):
+    return f'medical_record:{patient_id}:generation'
+
+
+def new_generation():
+    return f'{time.time_ns():x}'
+
+
+def get_generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        generation = new_generation()
+        if not cache.add(key, generation, timeout=None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def bump_generation(key):
+    """Invalidate everything cached under ``key``'s generation once the current transaction commits."""
+    bump_generations([key])
+
+
+def bump_generations(keys):
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, new_generation()), timeout=None))
+
+
+def generation_time(generation):
+    """The generation's stamp rounded up to the whole second, the resolution of Last-Modified."""
+    return datetime.fromtimestamp(-(-int(generation, 16) // 10 ** 9), tz=timezone.utc)
+
+
+def selection_hash(request=None):
+    """Digest of the ``?fields=``/``?expand=`` selection; no request means the full representation."""
+    selection = '|'
+    if request is not None:
+        selection = f"{request.query_params.get('fields', '')}|{request.query_params.get('expand', '')}"
+    return hashlib.md5(selection.encode()).hexdigest()
+
+
+def variant_key(prefix, generation, request=None):
+    """Cache key for one ``?fields=``/``?expand=`` variant of a response."""
+    return f'{prefix}:{generation}:{selection_hash(request)}'
+
+
+def generation_condition(generation_key):
+    """
+    Answer conditional GETs (``If-None-Match``/``If-Modified-Since``) from a generation stamp.
+
+    ``generation_key`` receives the view's URL keyword arguments and returns the stamp's cache
+    key.  A matching request gets a 304 before the view body, and so the ORM, runs at all.
+    Only successful responses carry the validators: a client must not be able to revalidate a
+    404 into a 304.
+    """
+
+    def etag(request, *args, **kwargs):
+        return f'{get_generation(generation_key(**kwargs))}-{selection_hash(request)}'
+
+    def last_modified(request, *args, **kwargs):
+        modified = generation_time(get_generation(generation_key(**kwargs)))
+        # A later write within the same second would get the same Last-Modified; none until it is over
+        return modified if modified.timestamp() <= time.time() else None
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+
+    def decorator(func):
+        view = conditional(func)
+
+        @wraps(func)
+        def inner(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if not (200 <= response.status_code < 300 or response.status_code == 304):
+                for header in ('ETag', 'Last-Modified'):
+                    if response.has_header(header):
+                        del response[header]
+            return response
+
+        return inner
+
+    return decorator
+
+
+def doctor_profile_key(pk, request=None):
+    return variant_key(f'doctor_profile:{pk}', get_generation(doctor_generation_key(pk)), request)
+
+
+def medical_record_key(patient_id):
+    return variant_key(f'medical_record:{patient_id}', get_generation(medical_record_generation_key(patient_id)))
+
+
+def get_or_render(key, build):
+    """Return the cached JSON bytes under ``key``, rendering ``build()`` on a miss."""
+    content = cache.get(key)
+    if content is None:
+        # The key carries the new generation; a lagging replica could still hold the old rows
+        with pin_to_primary():
+            content = JSONRenderer().render(build())
+        cache.set(key, content, timeout=RENDERED_RESPONSE_TIMEOUT)
+    return content
@@ -0,0 +1,110 @@
+"""
+Allergy/medication conflict checks against the ``Contraindication`` reference table.
+
+The table is small and read on every check, so each process keeps it in
+memory as ``{allergy: {medication: reason}}`` keyed by normalized names; a
+check is then a few dict lookups.  Writes to the table bump a generation
+(``signals.py``); a process notices the new generation within
+``REFRESH_INTERVAL`` seconds and reloads, and the writing process reloads
+at once.
+"""
+import threading
+import time
+from itertools import groupby
+
+from .caching import get_generation
+from .models import Contraindication, PatientMedicalProfile
+
+CONTRAINDICATION_GENERATION = 'contraindications:generation'
+REFRESH_INTERVAL = 5
+SCREEN_CHUNK_SIZE = 2000
+
+
+def normalize(name):
+    return ' '.join(name.casefold().split())
+
+
+def load():
+    table = {}
+    for allergy, medication, reason in Contraindication.objects.values_list('allergy_name', 'medication_name',
+                                                                            'reason'):
+        table.setdefault(normalize(allergy), {})[normalize(medication)] = reason
+    return table
+
+
+class ContraindicationTable:
+    """The in-memory lookup table, reloaded when the reference data changes."""
+
+    def __init__(self):
+        self._table = None
+        self._generation = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def table(self):
+        table = self._table
+        if table is not None and time.monotonic() < self._checked + REFRESH_INTERVAL:
+            return table
+        with self._lock:
+            generation = get_generation(CONTRAINDICATION_GENERATION)
+            if self._table is None or generation != self._generation:
+                self._table, self._generation = load(), generation
+            self._checked = time.monotonic()
+            return self._table
+
+    def invalidate(self):
+        self._table = None
+
+    def conflicts(self, allergies, medications):
+        """``[{'allergy', 'medication', 'reason'}]`` for every contraindicated pair, using the given spellings."""
+        table = self.table()
+        medications = {normalize(medication): medication for medication in medications}
+        found = []
+        for allergy in dict.fromkeys(allergies):
+            banned = table.get(normalize(allergy))
+            if not banned:
+                continue
+            for key, medication in medications.items():
+                reason = banned.get(key)
+                if reason is not None:
+                    found.append({'allergy': allergy, 'medication': medication, 'reason': reason})
+        return found
+
+
+contraindications = ContraindicationTable()
+
+
+def chart_names(rows):
+    """The distinct allergy and medication names of ``(allergy, medication)`` rows, in first-seen order."""
+    allergies, medications = {}, {}
+    for allergy, medication in rows:
+        allergies[allergy] = medications[medication] = None
+    return list(allergies), list(medications)
+
+
+def prescription_conflicts(profile):
+    """Conflicts a profile row would add to its patient's chart, checked in both directions."""
+    others = PatientMedicalProfile.objects.filter(patient_id=profile.patient_id)
+    if profile.pk is not None:
+        others = others.exclude(pk=profile.pk)
+    allergies, medications = chart_names(others.values_list('allergy_id__allergy_name', 'medication_id__name'))
+    allergy, medication = profile.allergy_id.allergy_name, profile.medication_id.name
+    found = contraindications.conflicts(allergies + [allergy], [medication])
+    if allergy not in allergies:
+        found += contraindications.conflicts([allergy], [name for name in medications if name != medication])
+    return found
+
+
+def screen(patient_ids=None):
+    """``{patient_id: [conflicts]}`` for every patient (or those given) whose chart has a conflict, in one pass."""
+    rows = PatientMedicalProfile.objects.order_by('patient_id', 'id')
+    if patient_ids is not None:
+        rows = rows.filter(patient_id__in=patient_ids)
+    rows = rows.values_list('patient_id', 'allergy_id__allergy_name', 'medication_id__name').iterator(
+        chunk_size=SCREEN_CHUNK_SIZE)
+    found = {}
+    for patient_id, chart in groupby(rows, key=lambda row: row[0]):
+        conflicts = contraindications.conflicts(*chart_names(row[1:] for row in chart))
+        if conflicts:
+            found[patient_id] = conflicts
+    return found
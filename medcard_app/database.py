@@ -0,0 +1,21 @@
+"""
+Per-connection SQLite tuning.
+
+``configure_sqlite`` runs on ``connection_created`` and applies
+``settings.SQLITE_PRAGMAS`` in order.  With persistent connections
+(``CONN_MAX_AGE``) that happens once per worker thread rather than once per
+request.  Read-only (``mode=ro``) connections skip ``journal_mode``, which
+is a property of the database file that only a writer can change.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    read_only = 'mode=ro' in str(connection.settings_dict['NAME'])
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not (read_only and name == 'journal_mode'):
+                cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,297 @@
+"""
+Bulk synchronisation of the provider directory from a nested export.
+
+The export is a list of clinics (a JSON array, ``{"clinics": [...]}`` or one
+clinic per NDJSON line)::
+
+    {"clinic_name": "Central", "contacts": "...", "address": "...", "clinic_location": "41.31,69.24",
+     "doctors": [{"doctor_username": "DOC1", "doctor_fullname": "...", "doctor_birthdate": "1980-01-01",
+                  "doctor_phone": "...", "doctor_license_no": "...", "speciality_name": "Cardiology",
+                  "availabilities": [{"day_of_week": 1, "start_time": "09:00", "end_time": "17:00"}],
+                  "qualifications": [...], "experiences": [...]}]}
+
+Clinics are matched by name, doctors by username and specialties by name.
+Existing rows are read once into dictionaries, compared with the export and
+written back in batches: large inserts go through one ``executemany`` each
+(``insert_rows``), updates through ``bulk_update``, deletes by primary key.  The
+availability, qualification and experience lists of every exported doctor are
+mirrored exactly; clinics and doctors missing from the export are only deleted
+with ``prune=True``, and never a doctor who still has appointments or reviews.
+"""
+import json
+from collections import defaultdict
+from functools import lru_cache
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connections, router
+
+from . import geo, search
+from .caching import CLINIC_LIST_GENERATION, bump_generation, bump_generations, doctor_generation_key
+from .models import (Appointment, Clinics, DoctorAvailability, DoctorQualification, DoctorReview, Doctors,
+                     DoctorSpeciality, DoctorWorkExperience)
+
+BATCH_SIZE = 500
+CLINIC_FIELDS = ('contacts', 'address', 'clinic_location')
+GEO_FIELDS = ('latitude', 'longitude', 'grid_lat', 'grid_lng')
+DOCTOR_FIELDS = ('doctor_fullname', 'doctor_birthdate', 'doctor_phone', 'doctor_license_no')
+CHILDREN = {
+    'availabilities': (DoctorAvailability, ('day_of_week', 'start_time', 'end_time')),
+    'qualifications': (DoctorQualification, ('qualification', 'institution', 'year_obtained')),
+    'experiences': (DoctorWorkExperience, ('place_of_experience', 'start_year', 'end_year', 'position', 'description')),
+}
+
+
+class DirectoryError(ValueError):
+    pass
+
+
+def read_export(path):
+    """Load the clinics of a JSON or NDJSON export."""
+    with open(path, encoding='utf-8') as source:
+        text = source.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        except json.JSONDecodeError as error:
+            raise DirectoryError(f'{path} is neither JSON nor NDJSON: {error}')
+    if isinstance(data, dict):
+        data = data.get('clinics', [data])
+    return data
+
+
+@lru_cache(maxsize=65536)
+def _clean(field, value):
+    # Schedules and dates repeat a lot across a directory; check each distinct value once
+    return field.clean(value, None)
+
+
+def clean_values(model, field_names, data, where):
+    """
+    Convert and validate ``data``'s values with the model fields' ``clean``, like the admin forms would:
+    choices, ``max_length`` and the field validators apply.
+    """
+    values = []
+    for name in field_names:
+        field = model._meta.get_field(name)
+        value = data.get(name)
+        if value in (None, ''):
+            if not field.blank:
+                raise DirectoryError(f'{where}: {name} is required')
+            value = ''
+        try:
+            try:
+                value = _clean(field, value)
+            except TypeError:
+                value = field.clean(value, None)
+        except ValidationError as error:
+            raise DirectoryError(f'{where}: {name}: {" ".join(error.messages)}')
+        values.append(value)
+    return tuple(values)
+
+
+def insert_rows(model, field_names, rows):
+    """
+    INSERT ``rows`` (tuples of ``field_names`` values) with a single ``executemany``.
+
+    Other columns get their field defaults.  Skips the per-value overhead of
+    ``bulk_create``, which dominates tens of thousands of small rows.
+    """
+    db = connections[router.db_for_write(model)]
+    given = [model._meta.get_field(name) for name in field_names]
+    others = [field for field in model._meta.concrete_fields if not field.primary_key and field not in given]
+    defaults = [field.get_db_prep_save(field.get_default(), db) for field in others]
+    columns = ', '.join(db.ops.quote_name(field.column) for field in given + others)
+    sql = (f"INSERT INTO {db.ops.quote_name(model._meta.db_table)} ({columns}) "
+           f"VALUES ({', '.join(['%s'] * (len(given) + len(others)))})")
+    rows = [[field.get_db_prep_save(value, db) for field, value in zip(given, row)] + defaults for row in rows]
+    if rows:
+        with db.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    return len(rows)
+
+
+def _delete(model, pks, batch_size):
+    pks = list(pks)
+    for start in range(0, len(pks), batch_size):
+        model.objects.filter(pk__in=pks[start:start + batch_size]).delete()
+    return len(pks)
+
+
+class DirectorySync:
+    def __init__(self, clinics, prune=False, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.prune = prune
+        self.summary = {label: dict.fromkeys(['created', 'updated', 'deleted'], 0)
+                        for label in ['clinics', 'specialities', 'users', 'doctors', *CHILDREN]}
+        self.touched_doctors = set()
+        self.parse(clinics)
+
+    def count(self, label, action, number):
+        self.summary[label][action] += number
+
+    def parse(self, clinics):
+        self.clinics, self.doctors = {}, {}
+        for position, clinic in enumerate(clinics, start=1):
+            name = (clinic.get('clinic_name') or '').strip()
+            if not name:
+                raise DirectoryError(f'clinic #{position}: clinic_name is required')
+            if name in self.clinics:
+                raise DirectoryError(f'clinic {name!r} appears twice')
+            self.clinics[name] = clean_values(Clinics, CLINIC_FIELDS, clinic, f'clinic {name!r}')
+            for doctor in clinic.get('doctors', []):
+                username = (doctor.get('doctor_username') or '').strip()
+                where = f'clinic {name!r}, doctor {username or "?"!r}'
+                if not username:
+                    raise DirectoryError(f'{where}: doctor_username is required')
+                if username in self.doctors:
+                    raise DirectoryError(f'doctor {username!r} appears twice')
+                speciality = (doctor.get('speciality_name') or '').strip()
+                if not speciality:
+                    raise DirectoryError(f'{where}: speciality_name is required')
+                children = {
+                    key: {clean_values(model, fields, row, f'{where}, {key}') for row in doctor.get(key, [])}
+                    for key, (model, fields) in CHILDREN.items()
+                }
+                self.doctors[username] = {
+                    'clinic': name, 'speciality': speciality, 'email': doctor.get('email', ''),
+                    'values': clean_values(Doctors, DOCTOR_FIELDS, doctor, where), 'children': children,
+                }
+
+    def run(self):
+        """Apply the export; call inside a transaction.  Returns the change summary."""
+        speciality_ids = self.sync_specialities()
+        clinic_ids = self.sync_clinics()
+        user_ids = self.sync_users()
+        doctor_ids = self.sync_doctors(clinic_ids, speciality_ids, user_ids)
+        for key in CHILDREN:
+            self.sync_children(key, doctor_ids)
+        if self.prune:
+            # Doctors first, once the exported ones have moved: deleting a clinic cascades to its doctors
+            self.prune_doctors(user_ids)
+            self.prune_clinics(clinic_ids)
+
+        # Bulk writes skip the model signals: refresh the search index and cached payloads here
+        changed = {label for label, counts in self.summary.items() if any(counts.values())}
+        if search.is_enabled() and changed & {'clinics', 'specialities', 'doctors'}:
+            search.rebuild()
+        if changed:
+            bump_generation(CLINIC_LIST_GENERATION)
+        bump_generations(doctor_generation_key(pk) for pk in self.touched_doctors)
+        return self.summary
+
+    def sync_specialities(self):
+        existing = dict(DoctorSpeciality.objects.order_by('-pk').values_list('speciality_name', 'pk'))
+        missing = sorted({doctor['speciality'] for doctor in self.doctors.values()} - set(existing))
+        created = DoctorSpeciality.objects.bulk_create(
+            [DoctorSpeciality(speciality_name=name) for name in missing], batch_size=self.batch_size)
+        existing.update((speciality.speciality_name, speciality.pk) for speciality in created)
+        self.count('specialities', 'created', len(created))
+        return existing
+
+    def sync_clinics(self):
+        # The oldest clinic wins when the database already holds several with one name
+        existing = {}
+        for clinic in Clinics.objects.order_by('-pk'):
+            existing[clinic.clinic_name] = clinic
+        created, updated = [], []
+        for name, values in self.clinics.items():
+            clinic = existing.get(name)
+            if clinic is None:
+                created.append(geo.locate(Clinics(clinic_name=name, **dict(zip(CLINIC_FIELDS, values)))))
+            elif tuple(getattr(clinic, field) for field in CLINIC_FIELDS) != values:
+                for field, value in zip(CLINIC_FIELDS, values):
+                    setattr(clinic, field, value)
+                updated.append(geo.locate(clinic))
+        Clinics.objects.bulk_create(created, batch_size=self.batch_size)
+        Clinics.objects.bulk_update(updated, [*CLINIC_FIELDS, *GEO_FIELDS], batch_size=self.batch_size)
+        self.count('clinics', 'created', len(created))
+        self.count('clinics', 'updated', len(updated))
+        if updated:
+            # Doctor profiles embed the clinic
+            self.touched_doctors.update(Doctors.objects.filter(clinic__in=updated).values_list('pk', flat=True))
+        existing.update((clinic.clinic_name, clinic) for clinic in created)
+        return {name: existing[name].pk for name in self.clinics}
+
+    def sync_users(self):
+        usernames = list(self.doctors)
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Doctor accounts start without a usable password; they are set through the normal reset flow
+        created = insert_rows(User, ['username', 'email', 'password'], [
+            (username, doctor['email'], make_password(None))
+            for username, doctor in self.doctors.items() if username not in existing
+        ])
+        self.count('users', 'created', created)
+        return dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+
+    def sync_doctors(self, clinic_ids, speciality_ids, user_ids):
+        existing = {row[1]: row for row in Doctors.objects.order_by().values_list(
+            'pk', 'doctor_username_id', 'clinic_id', 'speciality_name_id', *DOCTOR_FIELDS)}
+        created, updated = [], []
+        for username, doctor in self.doctors.items():
+            user_id = user_ids[username]
+            values = (clinic_ids[doctor['clinic']], speciality_ids[doctor['speciality']], *doctor['values'])
+            row = existing.get(user_id)
+            if row is None:
+                created.append((user_id, *values))
+            elif row[2:] != values:
+                updated.append(Doctors(pk=row[0], doctor_username_id=user_id,
+                                       **dict(zip(['clinic_id', 'speciality_name_id', *DOCTOR_FIELDS], values))))
+        insert_rows(Doctors, ['doctor_username', 'clinic', 'speciality_name', *DOCTOR_FIELDS], created)
+        Doctors.objects.bulk_update(updated, ['clinic', 'speciality_name', *DOCTOR_FIELDS],
+                                    batch_size=self.batch_size)
+        self.count('doctors', 'created', len(created))
+        self.count('doctors', 'updated', len(updated))
+        self.touched_doctors.update(doctor.pk for doctor in updated)
+
+        ids = {user_id: row[0] for user_id, row in existing.items()}
+        if created:
+            ids.update(Doctors.objects.filter(doctor_username_id__in=[row[0] for row in created]).values_list(
+                'doctor_username_id', 'pk'))
+            self.touched_doctors.update(ids[row[0]] for row in created)
+        return {username: ids[user_ids[username]] for username in self.doctors}
+
+    def sync_children(self, key, doctor_ids):
+        model, fields = CHILDREN[key]
+        wanted = {doctor_ids[username]: doctor['children'][key] for username, doctor in self.doctors.items()}
+        existing = defaultdict(dict)
+        stale = []
+        for pk, doctor_id, *values in model.objects.order_by().values_list('pk', 'doctor_id', *fields):
+            if doctor_id not in wanted:
+                continue
+            values = tuple(values)
+            if values in wanted[doctor_id] and values not in existing[doctor_id]:
+                existing[doctor_id][values] = pk
+            else:
+                stale.append(pk)
+                self.touched_doctors.add(doctor_id)
+        created = [(doctor_id, *values) for doctor_id, rows in wanted.items()
+                   for values in rows if values not in existing[doctor_id]]
+        # Deletes first: a changed row may keep the unique (doctor, day, start) key of the row it replaces
+        self.count(key, 'deleted', _delete(model, stale, self.batch_size))
+        self.count(key, 'created', insert_rows(model, ['doctor', *fields], created))
+        self.touched_doctors.update(row[0] for row in created)
+
+    def prune_doctors(self, user_ids):
+        exported = set(user_ids.values())
+        stale = [pk for pk, user_id in Doctors.objects.order_by().values_list('pk', 'doctor_username_id')
+                 if user_id not in exported]
+        # Deleting a doctor cascades to their appointments and reviews; those need a person to decide
+        kept = (set(Appointment.objects.order_by().values_list('doctor_id', flat=True).distinct())
+                | set(DoctorReview.objects.order_by().values_list('doctor_id', flat=True).distinct()))
+        refused = [pk for pk in stale if pk in kept]
+        if refused:
+            usernames = Doctors.objects.filter(pk__in=refused[:10]).values_list('doctor_username__username', flat=True)
+            raise DirectoryError(f'cannot prune {len(refused)} doctors who still have appointments or reviews '
+                                 f'({", ".join(sorted(usernames))}{", ..." if len(refused) > 10 else ""}); '
+                                 f'keep them in the export or remove them by hand')
+        self.touched_doctors.update(stale)
+        self.count('doctors', 'deleted', _delete(Doctors, stale, self.batch_size))
+
+    def prune_clinics(self, clinic_ids):
+        exported = set(clinic_ids.values())
+        stale = [pk for pk in Clinics.objects.order_by().values_list('pk', flat=True) if pk not in exported]
+        self.count('clinics', 'deleted', _delete(Clinics, stale, self.batch_size))
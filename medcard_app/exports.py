@@ -0,0 +1,68 @@
+"""
+Streaming exports of patient, appointment and medical profile rows.
+
+Rows are read with ``QuerySet.iterator()`` as plain ``values()`` dicts and
+encoded in small batches, so an export of any size holds at most one chunk
+of rows in memory.  The same generators feed the ``export_records`` command
+and the ``StreamingHttpResponse`` of the export endpoint.
+"""
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Appointment, PatientMedicalProfile, PatientProfile
+
+CHUNK_SIZE = 2000
+# Rows encoded per yielded piece of output
+BATCH_SIZE = 500
+FORMATS = {'ndjson': 'application/x-ndjson', 'json': 'application/json'}
+
+
+def patients():
+    return PatientProfile.objects.values(
+        'id', 'patient_fullname', 'patient_birthdate', 'patient_phone', 'patient_gender', 'patient_address',
+        user_id=F('patient_username_id'), username=F('patient_username__username'),
+        email=F('patient_username__email'))
+
+
+def appointments():
+    return Appointment.objects.values('id', 'patient_id', 'doctor_id', 'date', 'start_time', 'end_time', 'status')
+
+
+def medical_profiles():
+    return PatientMedicalProfile.objects.values('id', 'patient_id', 'allergy_id', 'genetic_id', 'medication_id',
+                                                'chron_illness_id', 'condition_id', 'doctor_notes')
+
+
+DATASETS = {'patients': patients, 'appointments': appointments, 'medical_profiles': medical_profiles}
+
+
+def iter_rows(dataset, chunk_size=CHUNK_SIZE):
+    """Every row of ``dataset`` in primary key order, fetched ``chunk_size`` rows at a time."""
+    return DATASETS[dataset]().order_by('pk').iterator(chunk_size=chunk_size)
+
+
+def _batches(rows):
+    rows = iter(rows)
+    while batch := list(islice(rows, BATCH_SIZE)):
+        yield batch
+
+
+def stream(rows, file_format='ndjson'):
+    """Encode ``rows`` as NDJSON (one object per line) or a JSON array, yielding bytes."""
+    encode = DjangoJSONEncoder().encode
+    if file_format == 'ndjson':
+        for batch in _batches(rows):
+            yield ''.join(encode(row) + '\n' for row in batch).encode()
+        return
+
+    separator = '\n'
+    yield b'['
+    for batch in _batches(rows):
+        pieces = []
+        for row in batch:
+            pieces.append(separator + encode(row))
+            separator = ',\n'
+        yield ''.join(pieces).encode()
+    yield b'\n]\n'
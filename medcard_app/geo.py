@@ -0,0 +1,175 @@
+"""
+Nearest-clinic lookups on a plain latitude/longitude grid.
+
+``Clinics.clinic_location`` is free-form text; ``parse_location`` extracts the
+coordinates and ``grid_cell`` maps them to integer cells of ``CELL_DEGREES``
+degrees, stored in indexed ``grid_lat``/``grid_lng`` columns.  A k-nearest
+query reads the cell of the origin and then rings of cells around it, and
+stops as soon as nothing outside the rings read so far can be closer than the
+k-th clinic found.  No GIS extension is needed.
+"""
+import math
+import re
+from datetime import timedelta
+
+from django.db.models import Q
+
+from .models import Clinics, Doctors
+from .slots import build_slot_index, iter_slots, local_now
+
+CELL_DEGREES = 0.05
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+COLUMNS = round(360 / CELL_DEGREES)
+MAX_RINGS = 40
+
+_COORDINATES = re.compile(r'(-?\d{1,3}(?:\.\d+)?)\s*[,; ]\s*(-?\d{1,3}(?:\.\d+)?)')
+
+
+def parse_location(text):
+    """Return ``(latitude, longitude)`` found in ``text`` (``"41.31, 69.24"``, map URLs...) or ``None``."""
+    for match in _COORDINATES.finditer(text or ''):
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return latitude, longitude
+    return None
+
+
+def _wrap_column(column):
+    """The grid column in ``[-COLUMNS // 2, COLUMNS // 2)`` for ``column``, wrapping across ±180°."""
+    return (column + COLUMNS // 2) % COLUMNS - COLUMNS // 2
+
+
+def grid_cell(latitude, longitude):
+    return math.floor(latitude / CELL_DEGREES), _wrap_column(math.floor(longitude / CELL_DEGREES))
+
+
+def locate(clinic):
+    """Fill ``clinic``'s coordinate and grid fields from its ``clinic_location``."""
+    coordinates = parse_location(clinic.clinic_location)
+    if coordinates is None:
+        clinic.latitude = clinic.longitude = clinic.grid_lat = clinic.grid_lng = None
+    else:
+        clinic.latitude, clinic.longitude = coordinates
+        clinic.grid_lat, clinic.grid_lng = grid_cell(*coordinates)
+    return clinic
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def _columns(column, half_width):
+    """``Q`` for the columns within ``half_width`` of ``column``, wrapping across ±180°."""
+    if 2 * half_width + 1 >= COLUMNS:
+        return Q()
+    first, last = _wrap_column(column - half_width), _wrap_column(column + half_width)
+    if first <= last:
+        return Q(grid_lng__range=(first, last))
+    return Q(grid_lng__gte=first) | Q(grid_lng__lte=last)
+
+
+def _ring(row, column, extent, previous):
+    """
+    ``Q`` for the cells of the ``(rows, columns)`` half-extent ``extent`` around ``(row, column)``
+    that are outside ``previous``: a band above and below and a strip on either side.
+    """
+    height, width = extent
+    if previous is None:
+        return Q(grid_lat__range=(row - height, row + height)) & _columns(column, width)
+    previous_height, previous_width = previous
+    # Rows always grow by at least one per ring; columns may not
+    ring = ((Q(grid_lat__range=(row - height, row - previous_height - 1))
+             | Q(grid_lat__range=(row + previous_height + 1, row + height))) & _columns(column, width))
+    if width > previous_width:
+        ring |= (Q(grid_lat__range=(row - previous_height, row + previous_height)) & _columns(column, width)
+                 & ~_columns(column, previous_width))
+    return ring
+
+
+def _longitude_km(half_width, latitude_limit):
+    """
+    Lower bound of the distance to any point ``half_width`` columns or more east or west of the
+    origin's column, for points within ``latitude_limit`` degrees of the equator.
+    """
+    if 2 * half_width + 1 >= COLUMNS:
+        return math.inf
+    # haversine: sin(d / 2R) >= cos(latitude) * sin(dlng / 2) for both latitudes within the limit
+    bound = math.cos(math.radians(latitude_limit)) * math.sin(math.radians(half_width * CELL_DEGREES) / 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, bound))
+
+
+def search_extent(latitude, max_distance_km):
+    """
+    Half-extent ``(rows, columns)`` of the cells that can hold a point within ``max_distance_km``.
+
+    Rows follow from the distance alone.  Columns use the latitude furthest from the equator that
+    such a point can have, so they widen towards the poles, and cover the whole circle near them.
+    """
+    rows = math.ceil(max_distance_km / (CELL_DEGREES * KM_PER_DEGREE))
+    latitude_limit = abs(latitude) + max_distance_km / KM_PER_DEGREE
+    ratio = (math.sin(max_distance_km / (2 * EARTH_RADIUS_KM)) / math.cos(math.radians(latitude_limit))
+             if latitude_limit < 90 else math.inf)
+    if ratio >= 1:
+        return rows, COLUMNS // 2
+    columns = math.ceil(math.degrees(2 * math.asin(ratio)) / CELL_DEGREES)
+    return rows, min(columns, COLUMNS // 2)
+
+
+def nearest_clinics(latitude, longitude, k, max_distance_km=50.0):
+    """
+    The ``k`` clinics closest to the origin within ``max_distance_km``, nearest first.
+
+    Returns ``[(distance_km, clinic)]``.  Each ring of cells is one indexed query; the rings grow
+    in proportion to the search extent, so a search costs at most ``MAX_RINGS + 1`` queries
+    whatever the latitude.
+    """
+    row, column = grid_cell(latitude, longitude)
+    rows, columns = search_extent(latitude, max_distance_km)
+    latitude_limit = min(90.0, abs(latitude) + max_distance_km / KM_PER_DEGREE)
+    rings = max(1, min(rows, MAX_RINGS))
+    found = []
+    previous = None
+    for ring in range(rings + 1):
+        extent = (math.ceil(ring * rows / rings), math.ceil(ring * columns / rings))
+        for clinic in Clinics.objects.filter(_ring(row, column, extent, previous)):
+            distance = distance_km(latitude, longitude, clinic.latitude, clinic.longitude)
+            if distance <= max_distance_km:
+                found.append((distance, clinic))
+        found.sort(key=lambda item: item[0])
+        # Everything outside the cells read so far is at least this far away
+        covered_km = min(extent[0] * CELL_DEGREES * KM_PER_DEGREE, _longitude_km(extent[1], latitude_limit))
+        if len(found) >= k and found[k - 1][0] <= covered_km:
+            break
+        previous = extent
+    return found[:k]
+
+
+def open_soon(clinic_ids, hours, now=None):
+    """
+    Map clinic id to the doctors with a free slot starting within ``hours`` hours.
+
+    Each entry is ``(doctor, date, start_time, end_time)`` for the doctor's earliest
+    such slot, earliest first.  Costs three queries for any number of clinics.
+    """
+    now = now or local_now()
+    until = now + timedelta(hours=hours)
+    doctors = Doctors.objects.filter(clinic_id__in=clinic_ids)
+    index = build_slot_index(doctors.values('pk'), now.date(), until.date(), not_before=now)
+    soonest = {}
+    for doctor_id, days in index.items():
+        day = min(days)
+        start_time, end_time = next(iter_slots(days[day]))
+        if day < until.date() or start_time < until.time():
+            soonest[doctor_id] = (day, start_time, end_time)
+
+    found = {}
+    for doctor in doctors.filter(pk__in=soonest).select_related('speciality_name'):
+        found.setdefault(doctor.clinic_id, []).append((doctor, *soonest[doctor.pk]))
+    for entries in found.values():
+        entries.sort(key=lambda entry: (entry[1], entry[2], entry[0].pk))
+    return found
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from medcard_app import exports
+
+
+class Command(BaseCommand):
+    help = ("Export every patient, appointment or medical profile row as NDJSON or a JSON array, streaming the "
+            "rows so memory use stays constant however many there are.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(exports.DATASETS), help='Rows to export.')
+        parser.add_argument('--format', dest='file_format', choices=list(exports.FORMATS), default='ndjson',
+                            help='ndjson (one object per line, the default) or json (a single array).')
+        parser.add_argument('--output', help='File to write (default: standard output).')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE,
+                            help=f'Rows fetched from the database at a time (default {exports.CHUNK_SIZE}).')
+
+    def handle(self, *args, dataset, file_format, output, chunk_size, **options):
+        exported = 0
+
+        def counted(rows):
+            nonlocal exported
+            for exported, row in enumerate(rows, start=1):
+                yield row
+
+        started = time.perf_counter()
+        pieces = exports.stream(counted(exports.iter_rows(dataset, chunk_size)), file_format)
+        if output is None:
+            for piece in pieces:
+                self.stdout.write(piece.decode(), ending='')
+            # Keep standard output clean for piping
+            self.stderr.write(f'Exported {exported} {dataset} rows.')
+            return
+        with open(output, 'wb') as target:
+            target.writelines(pieces)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {exported} {dataset} rows to {output} in {time.perf_counter() - started:.1f}s.'))
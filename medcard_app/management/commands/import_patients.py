@@ -0,0 +1,140 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from medcard_app.models import EmailVerification, PatientProfile
+from medcard_app.serializers import ImportPatientSerializer
+
+USER_FIELDS = ('username', 'password', 'email')
+
+
+def read_rows(path, file_format):
+    """Yield one dict per CSV row or JSONL line."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def nest_user_fields(row):
+    """Accept flat rows as well as rows shaped like the signup payload."""
+    if 'user' in row:
+        return row
+    return {'user': {field: row.get(field) for field in USER_FIELDS},
+            **{field: value for field, value in row.items() if field not in USER_FIELDS}}
+
+
+class Command(BaseCommand):
+    help = ("Import patients from a CSV or JSONL file: validates each row with the signup rules, hashes passwords "
+            "in a process pool and writes users, profiles and verified email records in chunked transactions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSONL file of patients.')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'jsonl'],
+                            help='File format (default: from the extension).')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows validated, hashed and committed together (default 1000).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Password hashing processes (default: one per CPU; 1 hashes in-process).')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip the rows committed by a previous interrupted run of the same file.')
+        parser.add_argument('--unverified', action='store_true',
+                            help='Require the imported patients to verify their email before logging in.')
+
+    def handle(self, *args, path, file_format, chunk_size, workers, resume, unverified, **options):
+        path = Path(path)
+        if not path.exists():
+            raise CommandError(f'{path} does not exist.')
+        file_format = file_format or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+        checkpoint = path.with_name(path.name + '.checkpoint')
+        done = json.loads(checkpoint.read_text())['rows'] if resume and checkpoint.exists() else 0
+        if done:
+            self.stdout.write(f'Resuming after row {done}.')
+
+        # Workers start fresh instead of forking this process and its open database connections, and
+        # set Django up first so make_password() sees the project's PASSWORD_HASHERS
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=django.setup) if workers > 1 else None
+        rows = islice(read_rows(path, file_format), done, None)
+        created = rejected = 0
+        started = time.perf_counter()
+        try:
+            while chunk := list(islice(rows, chunk_size)):
+                chunk_created, errors = self.import_chunk(chunk, done, pool, workers, not unverified)
+                done += len(chunk)
+                created += chunk_created
+                rejected += len(errors)
+                for line, error in errors:
+                    self.stderr.write(f'Row {line}: {error}')
+                # Only committed chunks are checkpointed, so a resumed run never skips uncommitted rows
+                checkpoint.write_text(json.dumps({'rows': done}))
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{done} rows read, {created} imported, {rejected} rejected '
+                                  f'({created / elapsed:.0f} rows/s)')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        checkpoint.unlink(missing_ok=True)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} patients, rejected {rejected} rows in {elapsed:.1f}s '
+            f'({created / elapsed if elapsed else 0:.0f} rows/s).'))
+
+    def import_chunk(self, chunk, offset, pool, workers, verified):
+        """Validate, hash and insert one chunk; returns ``(created, [(row number, error)])``."""
+        valid, errors = [], []
+        for number, row in enumerate(chunk, start=offset + 1):
+            serializer = ImportPatientSerializer(data=nest_user_fields(row))
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                errors.append((number, dict(serializer.errors)))
+
+        # One query for the whole chunk instead of a UniqueValidator query per row
+        usernames = [data['user']['username'] for _, data in valid]
+        taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        unique = []
+        for number, data in valid:
+            username = data['user']['username']
+            if username in taken:
+                errors.append((number, {'username': ['A user with that username already exists.']}))
+            else:
+                taken.add(username)
+                unique.append(data)
+        errors.sort(key=lambda error: error[0])
+        if not unique:
+            return 0, errors
+
+        passwords = [data['user']['password'] for data in unique]
+        if pool is None:
+            hashes = [make_password(password) for password in passwords]
+        else:
+            hashes = list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=data['user']['username'], email=data['user'].get('email', ''), password=hashed)
+                for data, hashed in zip(unique, hashes)
+            ])
+            PatientProfile.objects.bulk_create([
+                PatientProfile(patient_username=user, **{key: value for key, value in data.items() if key != 'user'})
+                for user, data in zip(users, unique)
+            ])
+            EmailVerification.objects.bulk_create([
+                EmailVerification(user=user, code='', verified=verified) for user in users
+            ])
+        return len(users), errors
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from medcard_app import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of doctors and clinics from scratch."
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            raise CommandError('The full-text search index requires SQLite with FTS5.')
+        with transaction.atomic():
+            count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} doctors and clinics.'))
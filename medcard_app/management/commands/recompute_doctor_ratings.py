@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from medcard_app.caching import CLINIC_LIST_GENERATION, bump_generation, bump_generations, doctor_generation_key
+from medcard_app.models import DoctorReview, Doctors
+from medcard_app.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute the review count and rating aggregates of every doctor from DoctorReview."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = recompute_ratings(Doctors.objects.all(), DoctorReview.objects.all())
+            # The bulk UPDATE bypasses the model signals, so invalidate the cached payloads here
+            bump_generation(CLINIC_LIST_GENERATION)
+            bump_generations(doctor_generation_key(pk) for pk in Doctors.objects.values_list('pk', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Recomputed ratings for {updated} doctors.'))
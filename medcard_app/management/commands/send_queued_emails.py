@@ -0,0 +1,44 @@
+import smtplib
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from medcard_app import outbox
+
+
+class Command(BaseCommand):
+    help = "Send the queued outbox emails over a single connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE,
+                            help=f'Messages claimed and updated per batch (default {outbox.BATCH_SIZE}).')
+        parser.add_argument('--max-attempts', type=int, default=outbox.MAX_ATTEMPTS,
+                            help=f'Attempts before a message is marked failed (default {outbox.MAX_ATTEMPTS}).')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the outbox instead of exiting once it is drained.')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between polls with --loop (default 5).')
+
+    def handle(self, *args, batch_size, max_attempts, loop, interval, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                sent, retrying, failed = outbox.drain(batch_size, max_attempts)
+            except (smtplib.SMTPException, OSError) as error:
+                if not loop:
+                    raise CommandError(f'Could not connect to the mail server: {error}')
+                self.stderr.write(f'Could not connect to the mail server: {error}')
+            except DatabaseError as error:
+                # Another worker holding the write lock is not fatal; the next poll retries
+                if not loop:
+                    raise CommandError(f'Could not update the outbox: {error}')
+                self.stderr.write(f'Could not update the outbox: {error}')
+            else:
+                if sent or retrying or failed or not loop:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f'Sent {sent}, retrying {retrying}, failed {failed} emails in {elapsed:.2f}s '
+                                      f'({sent / elapsed if elapsed else 0:.0f} emails/s).')
+            if not loop:
+                return
+            time.sleep(interval)
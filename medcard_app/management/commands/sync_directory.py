@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from medcard_app.directory import BATCH_SIZE, DirectoryError, DirectorySync, read_export
+
+
+class Command(BaseCommand):
+    help = ("Synchronise clinics, doctors, specialties, schedules, qualifications and work experience with a "
+            "nested JSON/NDJSON directory export, applying inserts, updates and deletes in batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON (array or {"clinics": [...]}) or NDJSON file, one clinic per line.')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete clinics and doctors that are missing from the export; refused for '
+                                 'doctors who still have appointments or reviews.')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without saving them.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Rows per INSERT/UPDATE/DELETE statement batch (default {BATCH_SIZE}).')
+
+    def handle(self, *args, path, prune, dry_run, batch_size, **options):
+        started = time.perf_counter()
+        try:
+            sync = DirectorySync(read_export(path), prune=prune, batch_size=batch_size)
+            with transaction.atomic():
+                summary = sync.run()
+                if dry_run:
+                    transaction.set_rollback(True)
+        except (DirectoryError, IntegrityError) as error:
+            raise CommandError(str(error))
+
+        for label, counts in summary.items():
+            self.stdout.write(f'{label:<15} {counts["created"]:>7} created {counts["updated"]:>7} updated '
+                              f'{counts["deleted"]:>7} deleted')
+        verb = 'Checked' if dry_run else 'Synchronised'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(sync.clinics)} clinics and {len(sync.doctors)} doctors in '
+            f'{time.perf_counter() - started:.2f}s{" (dry run, nothing saved)" if dry_run else ""}.'))
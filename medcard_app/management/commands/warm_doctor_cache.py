@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from medcard_app.caching import RENDERED_RESPONSE_TIMEOUT, doctor_profile_key
+from medcard_app.models import Doctors
+from medcard_app.serializers import DoctorSerializer
+
+
+class Command(BaseCommand):
+    help = "Pre-render every doctor profile into the cache used by the doctor detail endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of doctors rendered per batch of queries (default 500).')
+
+    def handle(self, *args, batch_size, **options):
+        renderer = JSONRenderer()
+        doctor_ids = list(Doctors.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(doctor_ids), batch_size):
+            batch = Doctors.objects.filter(pk__in=doctor_ids[start:start + batch_size])
+            batch = DoctorSerializer.setup_eager_loading(batch)
+            cache.set_many({doctor_profile_key(doctor.pk): renderer.render(DoctorSerializer(doctor).data)
+                            for doctor in batch}, timeout=RENDERED_RESPONSE_TIMEOUT)
+            self.stdout.write(f'Rendered {min(start + batch_size, len(doctor_ids))}/{len(doctor_ids)} doctors')
+        self.stdout.write(self.style.SUCCESS(f'Warmed the profile cache for {len(doctor_ids)} doctors.'))
@@ -0,0 +1,52 @@
+"""
+Assembly of a patient's medical record from ``PatientMedicalProfile`` rows.
+
+Each profile row links a patient to one allergy, genetic illness, medication,
+chronic illness and condition, so a chart spans many rows that repeat the
+same references.  The record is read with one indexed query joining every
+foreign key, then grouped and de-duplicated in Python.
+"""
+from .models import PatientMedicalProfile
+from .serializers import (AllergySerializer, ChronicIllnessSerializer, GeneticIllnessSerializer,
+                          MedicalConditionSerializer, MedicationSerializer)
+
+# Record section -> (profile foreign key, serializer)
+SECTIONS = {
+    'allergies': ('allergy_id', AllergySerializer),
+    'medications': ('medication_id', MedicationSerializer),
+    'conditions': ('condition_id', MedicalConditionSerializer),
+    'chronic_illnesses': ('chron_illness_id', ChronicIllnessSerializer),
+    'genetic_illnesses': ('genetic_id', GeneticIllnessSerializer),
+}
+
+
+def profile_rows(patient_id):
+    """Every profile row of a patient with all its references, in one query."""
+    return (PatientMedicalProfile.objects.filter(patient_id=patient_id)
+            .select_related(*(field for field, _ in SECTIONS.values())).order_by('id'))
+
+
+def build_record(patient_id, rows=None):
+    """
+    The grouped medical record of ``patient_id``.
+
+    Each section lists a referenced row once, in the order it was first recorded;
+    medications are listed most recently started first.
+    """
+    rows = profile_rows(patient_id) if rows is None else rows
+    sections = {name: {} for name in SECTIONS}
+    notes = {}
+    for row in rows:
+        for name, (field, _) in SECTIONS.items():
+            related = getattr(row, field)
+            sections[name].setdefault(related.pk, related)
+        if row.doctor_notes.strip():
+            notes.setdefault(row.doctor_notes, row.pk)
+
+    medications = sections['medications']
+    sections['medications'] = dict(sorted(medications.items(), key=lambda item: item[1].start_date, reverse=True))
+    record = {'patient_id': patient_id}
+    for name, (_, serializer) in SECTIONS.items():
+        record[name] = serializer(sections[name].values(), many=True).data
+    record['doctor_notes'] = [{'profile': pk, 'note': note} for note, pk in notes.items()]
+    return record
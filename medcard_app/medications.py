@@ -0,0 +1,50 @@
+"""
+Point-in-time and overlap queries over medication intervals.
+
+A medication is taken from ``start_date`` through ``end_date`` inclusive; a
+null ``end_date`` means it has not been stopped.  The window bounds are
+inclusive too and either may be ``None`` for an unbounded side, so
+``overlap(day, day)`` is the point-in-time query.
+
+Patients are linked to medications through ``PatientMedicalProfile`` rows,
+which may repeat a medication; results list each medication once.
+"""
+from django.db.models import Q
+
+from .models import Medication, PatientMedicalProfile
+
+
+def overlap(date_from=None, date_to=None, prefix=''):
+    """``Q`` matching medications taken on at least one day of ``[date_from, date_to]``."""
+    condition = Q()
+    if date_to is not None:
+        condition &= Q(**{f'{prefix}start_date__lte': date_to})
+    if date_from is not None:
+        condition &= Q(**{f'{prefix}end_date__isnull': True}) | Q(**{f'{prefix}end_date__gte': date_from})
+    return condition
+
+
+def patient_medications(patient_id, date_from=None, date_to=None):
+    """The medications ``patient_id`` took during the window, most recently started first."""
+    return (Medication.objects.filter(overlap(date_from, date_to),
+                                      pk__in=PatientMedicalProfile.objects.filter(patient_id=patient_id)
+                                      .values('medication_id'))
+            .order_by('-start_date', 'pk'))
+
+
+def medications_by_patient(patient_ids=None, date_from=None, date_to=None):
+    """
+    ``{patient_id: [Medication]}`` for the medications each patient took during the window, in one query.
+
+    ``patient_ids=None`` covers every patient; patients without a matching medication are left out.
+    """
+    rows = PatientMedicalProfile.objects.filter(overlap(date_from, date_to, prefix='medication_id__'))
+    if patient_ids is not None:
+        rows = rows.filter(patient_id__in=patient_ids)
+    rows = rows.select_related('medication_id').order_by('patient_id', '-medication_id__start_date',
+                                                          'medication_id')
+    found = {}
+    for row in rows.only('patient_id', 'medication_id'):
+        medications = found.setdefault(row.patient_id, {})
+        medications.setdefault(row.medication_id_id, row.medication_id)
+    return {patient_id: list(medications.values()) for patient_id, medications in found.items()}
@@ -0,0 +1,96 @@
+# Generated by Django 5.0.1 on 2026-10-17 11:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Allergies',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('allergy_name', models.CharField(max_length=255)),
+                ('allergy_description', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChronicIllnesses',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chronic_illness_name', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('monitoring_freq', models.CharField(max_length=255)),
+                ('severity_stage', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GeneticIllnesses',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genetic_illness_name', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MedicalCondition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('diagnosis', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Medication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('dosage', models.CharField(max_length=255)),
+                ('side_effects', models.TextField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PatientMedicalProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_id', models.IntegerField()),
+                ('doctor_notes', models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='patientmedicalprofile',
+            name='allergy_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medcard_app.allergies'),
+        ),
+        migrations.AddField(
+            model_name='patientmedicalprofile',
+            name='chron_illness_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medcard_app.chronicillnesses'),
+        ),
+        migrations.AddField(
+            model_name='patientmedicalprofile',
+            name='condition_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medcard_app.medicalcondition'),
+        ),
+        migrations.AddField(
+            model_name='patientmedicalprofile',
+            name='genetic_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medcard_app.geneticillnesses'),
+        ),
+        migrations.AddField(
+            model_name='patientmedicalprofile',
+            name='medication_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medcard_app.medication'),
+        ),
+        migrations.AddField(
+            model_name='medicalcondition',
+            name='patient_id',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medcard_app.patientmedicalprofile'),
+        ),
+    ]
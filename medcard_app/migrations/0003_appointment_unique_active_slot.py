@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0002_medical_models'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('doctor', 'date', 'start_time'), name='unique_active_appointment_slot'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-17 11:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+from medcard_app.ratings import recompute_ratings
+
+
+def compute_initial_ratings(apps, schema_editor):
+    Doctors = apps.get_model('medcard_app', 'Doctors')
+    DoctorReview = apps.get_model('medcard_app', 'DoctorReview')
+    recompute_ratings(Doctors.objects.all(), DoctorReview.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0004_appointment_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctors',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False, verbose_name='Average Rating'),
+        ),
+        migrations.AddField(
+            model_name='doctors',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Sum of Ratings'),
+        ),
+        migrations.AddField(
+            model_name='doctors',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of Reviews'),
+        ),
+        migrations.AddIndex(
+            model_name='doctors',
+            index=models.Index(fields=['rating_avg', 'id'], name='doctor_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctors',
+            index=models.Index(fields=['speciality_name', 'rating_avg', 'id'], name='doctor_speciality_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctors',
+            index=models.Index(fields=['clinic', 'rating_avg', 'id'], name='doctor_clinic_rating_idx'),
+        ),
+        migrations.RunPython(compute_initial_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0005_doctor_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorreview',
+            index=models.Index(fields=['doctor', 'id'], name='review_doctor_latest_idx'),
+        ),
+    ]
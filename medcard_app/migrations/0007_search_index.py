@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-17 11:31
+
+from django.db import migrations
+
+# The schema and contents as of this migration; medcard_app.search keeps the live versions
+CREATE_SEARCH_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS medcard_search USING fts5("
+    "name, speciality, clinic_name, address, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+POPULATE_SEARCH_TABLE = [
+    "INSERT INTO medcard_search (rowid, name, speciality, clinic_name, address) "
+    "SELECT d.id * 2, d.doctor_fullname, s.speciality_name, c.clinic_name, c.address "
+    "FROM medcard_app_doctors d "
+    "JOIN medcard_app_doctorspeciality s ON s.id = d.speciality_name_id "
+    "JOIN medcard_app_clinics c ON c.id = d.clinic_id",
+    "INSERT INTO medcard_search (rowid, name, speciality, clinic_name, address) "
+    "SELECT c.id * 2 + 1, c.clinic_name, '', c.clinic_name, c.address FROM medcard_app_clinics c",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_SEARCH_TABLE)
+        for statement in POPULATE_SEARCH_TABLE:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS medcard_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medcard_app", "0006_review_doctor_latest_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
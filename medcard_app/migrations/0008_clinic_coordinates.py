@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+from medcard_app.geo import locate
+
+
+def locate_clinics(apps, schema_editor):
+    Clinics = apps.get_model('medcard_app', 'Clinics')
+    clinics = [locate(clinic) for clinic in Clinics.objects.all()]
+    Clinics.objects.bulk_update(clinics, ['latitude', 'longitude', 'grid_lat', 'grid_lng'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clinics',
+            name='grid_lat',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='clinics',
+            name='grid_lng',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='clinics',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='clinics',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='clinics',
+            index=models.Index(fields=['grid_lat', 'grid_lng'], name='clinic_grid_idx'),
+        ),
+        migrations.RunPython(locate_clinics, migrations.RunPython.noop),
+    ]
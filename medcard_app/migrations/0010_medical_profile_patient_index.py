@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0009_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patientmedicalprofile',
+            index=models.Index(fields=['patient_id', 'id'], name='medical_profile_patient_idx'),
+        ),
+    ]
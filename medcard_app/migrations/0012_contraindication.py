@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-17 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0011_medical_profile_medication_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contraindication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('allergy_name', models.CharField(max_length=255)),
+                ('medication_name', models.CharField(max_length=255)),
+                ('reason', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='contraindication',
+            constraint=models.UniqueConstraint(fields=('allergy_name', 'medication_name'), name='unique_contraindication'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medcard_app', '0012_contraindication'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['start_date', 'end_date'], name='medication_interval_idx'),
+        ),
+    ]
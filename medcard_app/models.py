@@ -1,5 +1,10 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+REVIEW_PREVIEW_SIZE = 3
 
 
 # Create your models here.
@@ -26,6 +31,31 @@ class EmailVerification(models.Model):
         verbose_name_plural = 'Emails'
 
 
+class OutgoingEmail(models.Model):
+    """A message waiting in the outbox for ``manage.py send_queued_emails``."""
+    subject = models.CharField(max_length=255, verbose_name='Subject')
+    body = models.TextField(verbose_name='Body')
+    from_email = models.CharField(max_length=254, blank=True, verbose_name='From')
+    recipient = models.EmailField(verbose_name='Recipient')
+    status = models.CharField(max_length=10, choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')],
+                              default='pending', verbose_name='Status')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Next Attempt')
+    last_error = models.TextField(blank=True, verbose_name='Last Error')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Sent')
+
+    class Meta:
+        verbose_name = 'Outgoing Email'
+        verbose_name_plural = 'Outgoing Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at', 'id'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.recipient}"
+
+
 class DoctorSpeciality(models.Model):
     speciality_name = models.CharField(max_length=200, verbose_name='Specialty Name')
 
@@ -43,11 +73,19 @@ class Clinics(models.Model):
     contacts = models.CharField(max_length=200, verbose_name='Contacts')
     address = models.CharField(max_length=200, verbose_name='Address')
     clinic_location = models.CharField(max_length=200, verbose_name='Clinic Location')
+    # Parsed from clinic_location on save (see geo.py); grid cells back the nearest-clinic search
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    grid_lat = models.IntegerField(null=True, blank=True, editable=False)
+    grid_lng = models.IntegerField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = "Clinic"
         verbose_name_plural = "Clinics"
         ordering = ['clinic_name']
+        indexes = [
+            models.Index(fields=['grid_lat', 'grid_lng'], name='clinic_grid_idx'),
+        ]
 
     def __str__(self):
         return self.clinic_name
@@ -61,15 +99,29 @@ class Doctors(models.Model):
     doctor_phone = models.CharField(max_length=11, verbose_name='Contact Phone')
     doctor_license_no = models.CharField(max_length=200, verbose_name='License Number')
     speciality_name = models.ForeignKey(DoctorSpeciality, on_delete=models.CASCADE, verbose_name='Specialty')
+    # Review aggregates, kept up to date incrementally by the DoctorReview signals (see ratings.py)
+    review_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of Reviews')
+    rating_sum = models.IntegerField(default=0, editable=False, verbose_name='Sum of Ratings')
+    rating_avg = models.FloatField(default=0, editable=False, verbose_name='Average Rating')
 
     class Meta:
         verbose_name = "Doctor"
         verbose_name_plural = "Doctors"
         ordering = ['doctor_fullname', 'speciality_name']
+        indexes = [
+            models.Index(fields=['rating_avg', 'id'], name='doctor_rating_idx'),
+            models.Index(fields=['speciality_name', 'rating_avg', 'id'], name='doctor_speciality_rating_idx'),
+            models.Index(fields=['clinic', 'rating_avg', 'id'], name='doctor_clinic_rating_idx'),
+        ]
 
     def __str__(self):
         return f"{self.doctor_fullname} ({self.speciality_name})"
 
+    @cached_property
+    def latest_reviews(self):
+        # Usually filled in by a Prefetch(to_attr='latest_reviews') instead
+        return list(self.doctorreview_set.order_by('-id')[:REVIEW_PREVIEW_SIZE])
+
 
 class DoctorReview(models.Model):
     doctor = models.ForeignKey(Doctors, on_delete=models.CASCADE, verbose_name='Doctor')
@@ -80,6 +132,9 @@ class DoctorReview(models.Model):
         verbose_name = "Doctor Review"
         verbose_name_plural = "Doctor Reviews"
         ordering = ['doctor']
+        indexes = [
+            models.Index(fields=['doctor', 'id'], name='review_doctor_latest_idx'),
+        ]
 
     def __str__(self):
         return f"{self.doctor.doctor_fullname} - Review"
@@ -153,7 +208,15 @@ class Appointment(models.Model):
         ordering = ['date', 'start_time', 'doctor']
         constraints = [
             models.CheckConstraint(check=models.Q(end_time__gt=models.F('start_time')),
-                                   name='appointment_end_time_must_be_after_start_time')
+                                   name='appointment_end_time_must_be_after_start_time'),
+            # A slot can hold only one active appointment; cancelling frees it again
+            models.UniqueConstraint(fields=['doctor', 'date', 'start_time'], condition=~models.Q(status='cancelled'),
+                                    name='unique_active_appointment_slot')
+        ]
+        indexes = [
+            models.Index(fields=['date', 'start_time', 'id'], name='appointment_date_idx'),
+            models.Index(fields=['doctor', 'date', 'start_time', 'id'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', 'date', 'start_time', 'id'], name='appointment_patient_date_idx'),
         ]
 
     def __str__(self):
@@ -167,6 +230,13 @@ class Medication(models.Model):
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Interval queries over every patient (medications.overlap) range-scan start_date and
+            # check end_date from the index
+            models.Index(fields=['start_date', 'end_date'], name='medication_interval_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -214,5 +284,38 @@ class PatientMedicalProfile(models.Model):
     condition_id = models.ForeignKey(MedicalCondition, on_delete=models.CASCADE)
     doctor_notes = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient_id', 'id'], name='medical_profile_patient_idx'),
+            # Covers the medication ids of a patient, so interval queries read Medication rows by primary key only
+            models.Index(fields=['patient_id', 'medication_id'], name='medical_profile_medication_idx'),
+        ]
+
     def __str__(self):
         return f"Profile {self.id} for Patient {self.patient_id}"
+
+    def clean(self):
+        from .contraindications import prescription_conflicts
+
+        if self.allergy_id_id is None or self.medication_id_id is None:
+            return
+        conflicts = prescription_conflicts(self)
+        if conflicts:
+            raise ValidationError({'medication_id': [
+                f"{conflict['medication']} is contraindicated with the patient's {conflict['allergy']} allergy"
+                + (f": {conflict['reason']}" if conflict['reason'] else '.') for conflict in conflicts]})
+
+
+class Contraindication(models.Model):
+    """A medication that must not be prescribed to patients with an allergy; names match case-insensitively."""
+    allergy_name = models.CharField(max_length=255)
+    medication_name = models.CharField(max_length=255)
+    reason = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['allergy_name', 'medication_name'], name='unique_contraindication'),
+        ]
+
+    def __str__(self):
+        return f"{self.medication_name} with {self.allergy_name} allergy"
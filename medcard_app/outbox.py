@@ -0,0 +1,119 @@
+"""
+Durable outbox for transactional email.
+
+Requests only insert ``OutgoingEmail`` rows (``enqueue``); ``manage.py
+send_queued_emails`` drains the due rows in batches over a single connection
+of the configured email backend.  A failed message is retried with exponential
+backoff and marked ``failed`` after ``MAX_ATTEMPTS`` attempts.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 60 * 60
+# A claimed batch is hidden from other workers for this long, so a crashed worker's batch is retried later
+CLAIM_SECONDS = 5 * 60
+UPDATED_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+
+
+def enqueue(subject, body, recipients, from_email=None):
+    """Queue one message per recipient; nothing is sent inside the request."""
+    from_email = from_email or settings.EMAIL_HOST_USER
+    return OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(subject=subject, body=body, from_email=from_email, recipient=recipient)
+        for recipient in recipients
+    ])
+
+
+def retry_delay(attempts):
+    """Backoff after the ``attempts``-th failure: 30s, 1m, 2m... capped at an hour."""
+    return timedelta(seconds=min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempts - 1)))
+
+
+def lease(candidates, now=None):
+    """
+    Lease the ``candidates`` that are still due to this worker and return them.
+
+    Each row is claimed with its own conditional UPDATE, so of two workers that read the same
+    candidates only the first to write gets a row; SQLite has no ``SELECT ... FOR UPDATE``.
+    """
+    now = now or timezone.now()
+    until = now + timedelta(seconds=CLAIM_SECONDS)
+    with transaction.atomic():
+        return [email for email in candidates
+                if OutgoingEmail.objects.filter(pk=email.pk, status='pending', next_attempt_at__lte=now).update(
+                    next_attempt_at=until)]
+
+
+def claim_batch(batch_size, now=None):
+    """Return up to ``batch_size`` due messages, oldest first, leased to this worker."""
+    now = now or timezone.now()
+    candidates = OutgoingEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by(
+        'next_attempt_at', 'id')[:batch_size]
+    return lease(list(candidates), now)
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+
+def send_batch(batch, connection, max_attempts=MAX_ATTEMPTS):
+    """
+    Send ``batch`` over the already open ``connection`` and record the outcome with one UPDATE.
+
+    Returns ``(sent, retrying, failed)`` counts.  After a connection-level error the
+    connection is reopened before the next message.
+    """
+    sent = retrying = failed = 0
+    healthy = True
+    for email in batch:
+        try:
+            if not healthy:
+                _close_quietly(connection)
+                connection.open()
+                healthy = True
+            EmailMessage(email.subject, email.body, email.from_email or None, [email.recipient],
+                         connection=connection).send()
+        except (smtplib.SMTPException, OSError) as error:
+            # A refused recipient leaves the SMTP session usable; anything else may not
+            healthy = isinstance(error, smtplib.SMTPRecipientsRefused)
+            email.attempts += 1
+            email.last_error = f'{type(error).__name__}: {error}'[:1000]
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+                failed += 1
+            else:
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                retrying += 1
+        else:
+            email.status = 'sent'
+            email.attempts += 1
+            email.sent_at = timezone.now()
+            sent += 1
+    OutgoingEmail.objects.bulk_update(batch, UPDATED_FIELDS)
+    return sent, retrying, failed
+
+
+def drain(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS, connection=None):
+    """Send every due message, batch after batch, over one connection.  Returns the summed counts."""
+    connection = connection or get_connection()
+    totals = [0, 0, 0]
+    connection.open()
+    try:
+        while batch := claim_batch(batch_size):
+            totals = [total + count for total, count in zip(totals, send_batch(batch, connection, max_attempts))]
+    finally:
+        _close_quietly(connection)
+    return tuple(totals)
@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``OFFSET`` the next page is selected with a ``WHERE`` clause on the
+ordering columns of the last row returned, so every page costs the same index
+range scan no matter how deep the client has paged.  The last row's values are
+handed to the client as an opaque, URL-safe cursor.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on ``ordering``, a tuple of field names optionally
+    prefixed with ``-``.  The last field must be unique (usually ``id``).
+    """
+
+    def __init__(self, ordering, page_size=50, max_page_size=200):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    @staticmethod
+    def _field_name(ordering):
+        return ordering.lstrip('-')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except (TypeError, ValueError):
+            raise ValidationError({'page_size': 'A valid integer is required.'})
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        values = []
+        for ordering in self.ordering:
+            value = getattr(obj, self._field_name(ordering))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, queryset, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(cursor)
+            opts = queryset.model._meta
+            return [opts.get_field(self._field_name(ordering)).to_python(value)
+                    for ordering, value in zip(self.ordering, values)]
+        except Exception:
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+
+    def keyset_filter(self, values):
+        """``Q`` selecting the rows that sort strictly after ``values``."""
+        condition = Q()
+        for position, ordering in enumerate(self.ordering):
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            step = Q(**{f'{self._field_name(ordering)}__{lookup}': values[position]})
+            for previous, value in zip(self.ordering[:position], values):
+                step &= Q(**{self._field_name(previous): value})
+            condition |= step
+        return condition
+
+    def paginate_queryset(self, queryset, request):
+        """Return ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last page."""
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            queryset = queryset.filter(self.keyset_filter(self.decode_cursor(queryset, cursor)))
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            return rows, self.encode_cursor(rows[-1])
+        return rows, None
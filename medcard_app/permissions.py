@@ -0,0 +1,25 @@
+from rest_framework.permissions import BasePermission
+
+from .models import Doctors, PatientProfile
+
+
+class CanViewMedicalRecord(BasePermission):
+    """
+    The patient themself, staff and doctors may read medical records.
+
+    ``patient_id`` in the URL is a ``PatientProfile`` id.  Every doctor may read
+    every record, not only those of patients they have appointments with: the
+    multi-patient views (medication lists, contraindication screening) work
+    across all patients.
+    """
+    message = 'You may only view your own medical record.'
+
+    def has_permission(self, request, view):
+        user = request.user
+        if user.is_staff:
+            return True
+        patient_id = view.kwargs.get('patient_id')
+        if patient_id is not None and PatientProfile.objects.filter(pk=patient_id,
+                                                                    patient_username_id=user.pk).exists():
+            return True
+        return Doctors.objects.filter(doctor_username_id=user.pk).exists()
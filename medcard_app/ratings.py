@@ -0,0 +1,31 @@
+"""
+Denormalized review aggregates on ``Doctors``.
+
+``review_count``, ``rating_sum`` and ``rating_avg`` are adjusted with a single
+``UPDATE`` per review write instead of aggregating ``DoctorReview`` on read,
+which keeps sorting and filtering doctors by rating an index scan.
+"""
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Doctors
+
+
+def average(total, count):
+    return Coalesce(Cast(total, FloatField()) / NullIf(count, Value(0)), Value(0.0))
+
+
+def apply_rating_delta(doctor_id, count_delta, sum_delta):
+    """Add ``count_delta`` reviews totalling ``sum_delta`` to a doctor's aggregates."""
+    count = F('review_count') + count_delta
+    total = F('rating_sum') + sum_delta
+    Doctors.objects.filter(pk=doctor_id).update(review_count=count, rating_sum=total,
+                                                rating_avg=average(total, count))
+
+
+def recompute_ratings(doctors, reviews):
+    """Rebuild the aggregates of every doctor in ``doctors`` from ``reviews`` in one ``UPDATE``."""
+    per_doctor = reviews.filter(doctor=OuterRef('pk')).order_by().values('doctor')
+    count = Coalesce(Subquery(per_doctor.annotate(count=Count('pk')).values('count')), 0)
+    total = Coalesce(Subquery(per_doctor.annotate(total=Sum('rating')).values('total')), 0)
+    return doctors.update(review_count=count, rating_sum=total, rating_avg=average(total, count))
@@ -0,0 +1,91 @@
+"""
+Read/write splitting between the primary database and a read-only replica alias.
+
+Reads go to ``settings.DATABASE_REPLICA`` (a second SQLite connection to the
+same file opened with ``mode=ro``, or any lagging copy), writes to
+``default``.  Reads stay on the primary when they could otherwise miss the
+caller's own writes:
+
+* inside a transaction on the primary, so a view reading back what it is
+  about to commit sees it;
+* for the whole of a write (non-GET/HEAD/OPTIONS) request;
+* for ``REPLICA_PIN_SECONDS`` after a successful write request, for requests
+  carrying the same credentials (token or session cookie).  A replica that
+  lags by less than that gives every client read-your-writes.
+"""
+import contextlib
+import hashlib
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_pinned = ContextVar('medcard_pinned_to_primary', default=False)
+
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA', None)
+    return alias if alias in settings.DATABASES else None
+
+
+@contextlib.contextmanager
+def pin_to_primary():
+    """Send every read in the block to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def credential_keys(request, response=None):
+    """Cache keys of the pins for the credentials a request (and its response) carries."""
+    credentials = [request.META.get('HTTP_AUTHORIZATION'), request.COOKIES.get(settings.SESSION_COOKIE_NAME)]
+    if response is not None and settings.SESSION_COOKIE_NAME in response.cookies:
+        # A login starts a new session; pin the cookie the client will send next
+        credentials.append(response.cookies[settings.SESSION_COOKIE_NAME].value)
+    return [f'db_pin:{hashlib.sha256(credential.encode()).hexdigest()}' for credential in credentials if credential]
+
+
+class ReadYourWritesMiddleware:
+    """Pins write requests, and reads shortly after a client's write, to the primary database."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if replica_alias() is None:
+            return self.get_response(request)
+
+        write = request.method not in SAFE_METHODS
+        keys = credential_keys(request)
+        if not write and not (keys and cache.get_many(keys)):
+            return self.get_response(request)
+
+        with pin_to_primary():
+            response = self.get_response(request)
+        if write and response.status_code < 400:
+            cache.set_many(dict.fromkeys(credential_keys(request, response), True),
+                           timeout=settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,159 @@
+"""
+Full-text search over doctors and clinics backed by an SQLite FTS5 table.
+
+``medcard_search`` holds one row per doctor and per clinic.  The FTS rowid
+encodes both the kind and the primary key (``pk * 2`` for doctors,
+``pk * 2 + 1`` for clinics) so rows can be replaced by rowid instead of
+scanning unindexed columns.  The table is kept in sync by the model signals in
+``signals.py`` and can be rebuilt with ``manage.py rebuild_search_index``.
+On other databases the search falls back to ``icontains`` lookups.
+
+Results are ordered by FTS5's ``rank`` column, configured as a weighted bm25,
+so FTS5 keeps only the best ``limit`` matches while scanning them all.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Clinics, Doctors, DoctorSpeciality
+
+SEARCH_TABLE = 'medcard_search'
+DOCTOR, CLINIC = 'doctor', 'clinic'
+KIND_BITS = {DOCTOR: 0, CLINIC: 1}
+# bm25 weights of the name, speciality, clinic_name and address columns
+COLUMN_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+CREATE_SEARCH_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "name, speciality, clinic_name, address, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+DROP_SEARCH_TABLE = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+
+_DOCTOR_ROWS = (
+    f"SELECT d.id * 2, d.doctor_fullname, s.speciality_name, c.clinic_name, c.address "
+    f"FROM {Doctors._meta.db_table} d "
+    f"JOIN {DoctorSpeciality._meta.db_table} s ON s.id = d.speciality_name_id "
+    f"JOIN {Clinics._meta.db_table} c ON c.id = d.clinic_id"
+)
+_CLINIC_ROWS = (
+    f"SELECT c.id * 2 + 1, c.clinic_name, '', c.clinic_name, c.address FROM {Clinics._meta.db_table} c"
+)
+
+
+def is_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _rowids(kind, pks):
+    return [pk * 2 + KIND_BITS[kind] for pk in pks]
+
+
+def _in_clause(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def remove(kind, pks):
+    rowids = _rowids(kind, pks)
+    if not rowids or not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({_in_clause(rowids)})", rowids)
+
+
+def index_doctors(pks):
+    """(Re)index the given doctors."""
+    pks = list(pks)
+    if not pks or not is_enabled():
+        return
+    remove(DOCTOR, pks)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, name, speciality, clinic_name, address) "
+                       f"{_DOCTOR_ROWS} WHERE d.id IN ({_in_clause(pks)})", pks)
+
+
+def index_clinics(pks):
+    """(Re)index the given clinics; their doctors carry the clinic name too and are reindexed as well."""
+    pks = list(pks)
+    if not pks or not is_enabled():
+        return
+    remove(CLINIC, pks)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, name, speciality, clinic_name, address) "
+                       f"{_CLINIC_ROWS} WHERE c.id IN ({_in_clause(pks)})", pks)
+    index_doctors(Doctors.objects.filter(clinic_id__in=pks).values_list('pk', flat=True))
+
+
+def rebuild():
+    """Repopulate the whole index with two set-based ``INSERT ... SELECT`` statements."""
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SEARCH_TABLE)
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, name, speciality, clinic_name, address) {_DOCTOR_ROWS}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, name, speciality, clinic_name, address) {_CLINIC_ROWS}")
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query where every word must match as a prefix."""
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_ids(query, kind=None, limit=20):
+    """Return ``[(kind, pk)]`` best matches first."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if not is_enabled():
+        return _search_ids_icontains(query, kind, limit)
+    sql = f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rank MATCH %s"
+    params = [expression, f"bm25({', '.join(map(str, COLUMN_WEIGHTS))})"]
+    if kind is not None:
+        sql += " AND rowid %% 2 = %s"
+        params.append(KIND_BITS[kind])
+    sql += " ORDER BY rank LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(CLINIC if rowid % 2 else DOCTOR, rowid // 2) for rowid, in cursor.fetchall()]
+
+
+def _search_ids_icontains(query, kind, limit):
+    results = []
+    terms = re.findall(r'\w+', query)
+    if kind in (None, DOCTOR):
+        condition = Q()
+        for term in terms:
+            condition &= (Q(doctor_fullname__icontains=term) | Q(speciality_name__speciality_name__icontains=term)
+                          | Q(clinic__clinic_name__icontains=term) | Q(clinic__address__icontains=term))
+        results += [(DOCTOR, pk) for pk in Doctors.objects.filter(condition).values_list('pk', flat=True)[:limit]]
+    if kind in (None, CLINIC):
+        condition = Q()
+        for term in terms:
+            condition &= Q(clinic_name__icontains=term) | Q(address__icontains=term)
+        results += [(CLINIC, pk) for pk in Clinics.objects.filter(condition).values_list('pk', flat=True)[:limit]]
+    return results[:limit]
+
+
+def search(query, kind=None, limit=20):
+    """Search doctors and clinics, returning JSON-ready dicts best matches first."""
+    ids = search_ids(query, kind, limit)
+    doctors = Doctors.objects.select_related('clinic', 'speciality_name').in_bulk(
+        [pk for found, pk in ids if found == DOCTOR])
+    clinics = Clinics.objects.in_bulk([pk for found, pk in ids if found == CLINIC])
+    results = []
+    for found, pk in ids:
+        if found == DOCTOR and pk in doctors:
+            doctor = doctors[pk]
+            results.append({'type': DOCTOR, 'id': pk, 'name': doctor.doctor_fullname,
+                            'speciality': doctor.speciality_name.speciality_name,
+                            'clinic': doctor.clinic.clinic_name, 'address': doctor.clinic.address,
+                            'rating': round(doctor.rating_avg, 2)})
+        elif found == CLINIC and pk in clinics:
+            clinic = clinics[pk]
+            results.append({'type': CLINIC, 'id': pk, 'name': clinic.clinic_name, 'speciality': None,
+                            'clinic': clinic.clinic_name, 'address': clinic.address, 'rating': None})
+    return results
@@ -1,8 +1,123 @@
 from datetime import datetime, timedelta
 
+from django.db.models import Prefetch
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from .models import *
+from .slots import local_now
+
+
+def parse_field_tree(value):
+    """
+    Turn ``"a,b.c,b.d"`` into ``{'a': {}, 'b': {'c': {}, 'd': {}}}``.
+
+    An empty dict means "everything" for that level; ``None`` means nothing was requested.
+    """
+    if value is None or isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        value = value.split(',')
+    tree = {}
+    for path in value:
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree or None
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and on-demand expansion for read serializers.
+
+    The representation can be trimmed with ``fields`` (``?fields=doctor_fullname,clinic.clinic_name``;
+    dotted names reach into nested serializers) and fields listed in ``Meta.expandable_fields`` can be
+    swapped for their full serializer with ``expand`` (``?expand=doctor``).  Both are read from the
+    request in the serializer context or passed as keyword arguments.
+
+    ``Meta.select_related_fields`` and ``Meta.prefetch_related_fields`` map field names to the
+    relations they need, so ``setup_eager_loading`` loads exactly what will be rendered.  A prefetch
+    entry is either a lookup or a ``(lookup, queryset, to_attr)`` tuple turned into a ``Prefetch``.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            fields = request.query_params.get('fields') if fields is None else fields
+            expand = request.query_params.get('expand') if expand is None else expand
+        if fields is not None or expand is not None:
+            self.apply_field_selection(parse_field_tree(fields), parse_field_tree(expand))
+
+    def apply_field_selection(self, fields=None, expand=None):
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in expand or {}:
+            if name in expandable and (not fields or name in fields):
+                serializer_class, field_kwargs = expandable[name]
+                self.fields[name] = serializer_class(**field_kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name, field in self.fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, DynamicFieldsMixin):
+                nested.apply_field_selection((fields or {}).get(name), (expand or {}).get(name))
+
+    @classmethod
+    def _nested_serializer_class(cls, name, expanded):
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        if expanded and name in expandable:
+            return expandable[name][0]
+        field = cls._declared_fields.get(name)
+        nested = getattr(field, 'child', field)
+        return type(nested) if isinstance(nested, DynamicFieldsMixin) else None
+
+    @classmethod
+    def eager_loading_lookups(cls, fields=None, expand=None, prefix='', in_prefetch=False):
+        """Return ``(select_related, prefetch_related)`` lookups needed to render the selected fields."""
+        select_map = getattr(cls.Meta, 'select_related_fields', {})
+        prefetch_map = getattr(cls.Meta, 'prefetch_related_fields', {})
+        names = fields or [*cls.Meta.fields]
+        selects, prefetches = [], []
+        for name in names:
+            if name in select_map:
+                lookup, nested_prefetch = prefix + select_map[name], in_prefetch
+                (prefetches if nested_prefetch else selects).append(lookup)
+            elif name in prefetch_map and isinstance(prefetch_map[name], tuple):
+                path, queryset, to_attr = prefetch_map[name]
+                prefetches.append(Prefetch(prefix + path, queryset=queryset, to_attr=to_attr))
+                lookup, nested_prefetch = prefix + to_attr, True
+            elif name in prefetch_map:
+                lookup, nested_prefetch = prefix + prefetch_map[name], True
+                prefetches.append(lookup)
+            else:
+                continue
+            expanded = expand is not None and name in expand
+            nested_class = cls._nested_serializer_class(name, expanded)
+            if nested_class is not None:
+                nested_selects, nested_prefetches = nested_class.eager_loading_lookups(
+                    (fields or {}).get(name), (expand or {}).get(name), lookup + '__', nested_prefetch)
+                selects += nested_selects
+                prefetches += nested_prefetches
+        return selects, prefetches
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None, fields=None, expand=None):
+        """Add the ``select_related``/``prefetch_related`` calls for the fields the request asks for."""
+        if request is not None:
+            fields = request.query_params.get('fields') if fields is None else fields
+            expand = request.query_params.get('expand') if expand is None else expand
+        selects, prefetches = cls.eager_loading_lookups(parse_field_tree(fields), parse_field_tree(expand))
+        if selects:
+            queryset = queryset.select_related(*selects)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+class DynamicFieldsModelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    pass
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -31,6 +146,20 @@ class PatientProfileSerializer(serializers.ModelSerializer):
         }
 
 
+class ImportUserSerializer(UserSerializer):
+    """``UserSerializer`` without the per-row username query; ``import_patients`` checks uniqueness per chunk."""
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            **UserSerializer.Meta.extra_kwargs,
+            'username': {**UserSerializer.Meta.extra_kwargs['username'], 'validators': [UnicodeUsernameValidator()]},
+        }
+
+
+class ImportPatientSerializer(PatientProfileSerializer):
+    user = ImportUserSerializer()
+
+
 class EmailVerificationSerializer(serializers.Serializer):
     email = serializers.EmailField(
         help_text="Email address of the user."
@@ -41,18 +170,19 @@ class EmailVerificationSerializer(serializers.Serializer):
     )
 
 
-class UserRetrievalSerializer(serializers.ModelSerializer):
+class UserRetrievalSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
 
-class PatientProfileRetrievalSerializer(serializers.ModelSerializer):
+class PatientProfileRetrievalSerializer(DynamicFieldsModelSerializer):
     user = UserRetrievalSerializer(source='patient_username', read_only=True)  # Ensure this points to the correct field
 
     class Meta:
         model = PatientProfile
         fields = ['user', 'patient_fullname', 'patient_birthdate', 'patient_phone', 'patient_gender']
+        select_related_fields = {'user': 'patient_username'}
         extra_kwargs = {
             'patient_fullname': {'help_text': 'Full name of the patient.'},
             'patient_birthdate': {'help_text': 'Birthdate of the patient (YYYY-MM-DD).'},
@@ -94,43 +224,43 @@ class PatientProfileUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class DoctorUserSerializer(serializers.ModelSerializer):
+class DoctorUserSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email']  # Excluding password for security and relevance in read operations
 
 
-class ClinicSerializer(serializers.ModelSerializer):
+class ClinicSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Clinics
         fields = ['clinic_name', 'contacts', 'address']
 
 
-class DoctorSpecialitySerializer(serializers.ModelSerializer):
+class DoctorSpecialitySerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = DoctorSpeciality
         fields = ['speciality_name']
 
 
-class DoctorReviewSerializer(serializers.ModelSerializer):
+class DoctorReviewSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = DoctorReview
         fields = ['rating', 'review']
 
 
-class DoctorWorkExperienceSerializer(serializers.ModelSerializer):
+class DoctorWorkExperienceSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = DoctorWorkExperience
         fields = ['place_of_experience', 'start_year', 'end_year', 'position', 'description']
 
 
-class DoctorQualificationSerializer(serializers.ModelSerializer):
+class DoctorQualificationSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = DoctorQualification
         fields = ['qualification', 'institution', 'year_obtained']
 
 
-class DoctorAvailabilitySerializer(serializers.ModelSerializer):
+class DoctorAvailabilitySerializer(DynamicFieldsModelSerializer):
     day_of_week = serializers.SerializerMethodField()
 
     class Meta:
@@ -151,31 +281,42 @@ class DoctorAvailabilitySerializer(serializers.ModelSerializer):
         return days.get(obj.day_of_week, "")
 
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(DynamicFieldsModelSerializer):
     doctor_username = DoctorUserSerializer()  # Use the customized serializer without password
     clinic = ClinicSerializer()
     speciality_name = DoctorSpecialitySerializer()
-    reviews = DoctorReviewSerializer(many=True, source='doctorreview_set', read_only=True)  # Default related name
+    reviews = DoctorReviewSerializer(many=True, source='latest_reviews', read_only=True)  # Latest few only
     experiences = DoctorWorkExperienceSerializer(many=True, source='doctorworkexperience_set',
                                                  read_only=True)  # Default related name
     qualifications = DoctorQualificationSerializer(many=True, source='doctorqualification_set',
                                                    read_only=True)  # Default related name
 
     availabilities = DoctorAvailabilitySerializer(many=True, read_only=True)
+    rating = serializers.DecimalField(source='rating_avg', max_digits=3, decimal_places=2, coerce_to_string=False,
+                                      read_only=True)
 
     class Meta:
         model = Doctors
         fields = ['doctor_username', 'doctor_fullname', 'doctor_birthdate', 'doctor_phone', 'doctor_license_no',
-                  'clinic', 'speciality_name', 'reviews', 'experiences', 'qualifications', 'availabilities']
-
-
-class ClinicListSerializer(serializers.ModelSerializer):
+                  'clinic', 'speciality_name', 'rating', 'review_count', 'reviews', 'experiences', 'qualifications',
+                  'availabilities']
+        select_related_fields = {'doctor_username': 'doctor_username', 'clinic': 'clinic',
+                                 'speciality_name': 'speciality_name'}
+        prefetch_related_fields = {'reviews': ('doctorreview_set',
+                                               DoctorReview.objects.order_by('-id')[:REVIEW_PREVIEW_SIZE],
+                                               'latest_reviews'),
+                                   'experiences': 'doctorworkexperience_set',
+                                   'qualifications': 'doctorqualification_set', 'availabilities': 'availabilities'}
+
+
+class ClinicListSerializer(DynamicFieldsModelSerializer):
     doctors = DoctorSerializer(many=True,
                                source='doctors_set')  # Adjust 'doctors_set' based on related_name if specified
 
     class Meta:
         model = Clinics
         fields = ['clinic_name', 'contacts', 'address', 'doctors']
+        prefetch_related_fields = {'doctors': 'doctors_set'}
 
 
 class AppointmentSerializer(serializers.ModelSerializer):
@@ -201,6 +342,10 @@ class AppointmentSerializer(serializers.ModelSerializer):
         end_time = datetime.combine(data['date'], data['end_time'])
         if (end_time - start_time) != timedelta(minutes=30):
             raise serializers.ValidationError("Appointments must be exactly 30 minutes long.")
+        # Slots are aligned to the half-hour grid so that the (doctor, date, start_time) uniqueness
+        # constraint is enough to rule out overlapping bookings
+        if data['start_time'].minute % 30 or data['start_time'].second or data['start_time'].microsecond:
+            raise serializers.ValidationError("Appointments must start on the hour or half hour.")
 
         # Check doctor's availability
         day_of_week = data['date'].weekday() + 1  # Monday is 1, Sunday is 7
@@ -216,13 +361,14 @@ class AppointmentSerializer(serializers.ModelSerializer):
         return data
 
 
-class AppointmentDetailSerializer(serializers.ModelSerializer):
+class AppointmentDetailSerializer(DynamicFieldsModelSerializer):
     patient = UserSerializer(read_only=True)
     doctor = DoctorSerializer(read_only=True)
 
     class Meta:
         model = Appointment
         fields = ['id', 'patient', 'doctor', 'date', 'start_time', 'end_time', 'status']
+        select_related_fields = {'patient': 'patient', 'doctor': 'doctor'}
         extra_kwargs = {
             'date': {'help_text': 'Date of the appointment (YYYY-MM-DD).'},
             'start_time': {'help_text': 'Start time of the appointment (formatted as HH:MM, 24-hour clock).'},
@@ -231,6 +377,86 @@ class AppointmentDetailSerializer(serializers.ModelSerializer):
         }
 
 
+class DoctorCompactSerializer(DynamicFieldsModelSerializer):
+    speciality = serializers.CharField(source='speciality_name.speciality_name', read_only=True)
+    clinic_name = serializers.CharField(source='clinic.clinic_name', read_only=True)
+
+    class Meta:
+        model = Doctors
+        fields = ['id', 'doctor_fullname', 'speciality', 'clinic_name']
+        select_related_fields = {'speciality': 'speciality_name', 'clinic_name': 'clinic'}
+
+
+class DoctorSummarySerializer(DoctorCompactSerializer):
+    rating = serializers.DecimalField(source='rating_avg', max_digits=3, decimal_places=2, coerce_to_string=False,
+                                      read_only=True)
+
+    class Meta(DoctorCompactSerializer.Meta):
+        fields = DoctorCompactSerializer.Meta.fields + ['rating', 'review_count']
+
+
+class AppointmentListSerializer(DynamicFieldsModelSerializer):
+    """Appointment with a compact doctor; ``expand=doctor`` embeds the full doctor profile."""
+    patient = UserSerializer(read_only=True)
+    doctor = DoctorCompactSerializer(read_only=True)
+
+    class Meta:
+        model = Appointment
+        fields = ['id', 'patient', 'doctor', 'date', 'start_time', 'end_time', 'status']
+        select_related_fields = {'patient': 'patient', 'doctor': 'doctor'}
+        expandable_fields = {'doctor': (DoctorSerializer, {'read_only': True})}
+
+
+class AllergySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Allergies
+        fields = ['id', 'allergy_name', 'allergy_description']
+
+
+class MedicationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Medication
+        fields = ['id', 'name', 'dosage', 'side_effects', 'start_date', 'end_date']
+
+
+class MedicalConditionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MedicalCondition
+        fields = ['id', 'diagnosis']
+
+
+class ChronicIllnessSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChronicIllnesses
+        fields = ['id', 'chronic_illness_name', 'description', 'monitoring_freq', 'severity_stage']
+
+
+class GeneticIllnessSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GeneticIllnesses
+        fields = ['id', 'genetic_illness_name', 'description']
+
+
+class DoctorNoteSerializer(serializers.Serializer):
+    profile = serializers.IntegerField()
+    note = serializers.CharField()
+
+
+class PatientMedicationsSerializer(serializers.Serializer):
+    patient_id = serializers.IntegerField()
+    medications = MedicationSerializer(many=True)
+
+
+class MedicalRecordSerializer(serializers.Serializer):
+    patient_id = serializers.IntegerField()
+    allergies = AllergySerializer(many=True)
+    medications = MedicationSerializer(many=True)
+    conditions = MedicalConditionSerializer(many=True)
+    chronic_illnesses = ChronicIllnessSerializer(many=True)
+    genetic_illnesses = GeneticIllnessSerializer(many=True)
+    doctor_notes = DoctorNoteSerializer(many=True)
+
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField(
         max_length=150,
@@ -240,3 +466,169 @@ class LoginSerializer(serializers.Serializer):
         max_length=128,
         help_text="Password of the user."
     )
+
+
+class FreeSlotQuerySerializer(serializers.Serializer):
+    MAX_DAYS = 31
+
+    doctor = serializers.ListField(
+        child=serializers.IntegerField(), required=False,
+        help_text="ID of a doctor to search. Repeat the parameter to search several doctors."
+    )
+    clinic = serializers.IntegerField(required=False, help_text="Search every doctor of this clinic.")
+    date_from = serializers.DateField(help_text="First day of the search (YYYY-MM-DD).")
+    date_to = serializers.DateField(required=False, help_text="Last day of the search (YYYY-MM-DD). "
+                                                              "Defaults to a week after date_from.")
+
+    def validate(self, data):
+        if not data.get('doctor') and data.get('clinic') is None:
+            raise serializers.ValidationError("Either doctor or clinic must be provided.")
+        data.setdefault('date_to', data['date_from'] + timedelta(days=6))
+        if data['date_to'] < data['date_from']:
+            raise serializers.ValidationError("date_to must not be before date_from.")
+        if (data['date_to'] - data['date_from']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"The search range cannot exceed {self.MAX_DAYS} days.")
+        return data
+
+
+class NextAvailableQuerySerializer(serializers.Serializer):
+    speciality = serializers.IntegerField(required=False, help_text="ID of the doctor specialty to search.")
+    clinic = serializers.IntegerField(required=False, help_text="ID of the clinic to search.")
+    date_from = serializers.DateField(required=False, help_text="First day of the search (YYYY-MM-DD). "
+                                                                "Defaults to today.")
+    limit = serializers.IntegerField(required=False, default=5, min_value=1, max_value=50,
+                                     help_text="Number of slots to return.")
+    max_days = serializers.IntegerField(required=False, default=30, min_value=1, max_value=90,
+                                        help_text="How many days ahead to search.")
+
+    def validate(self, data):
+        if data.get('speciality') is None and data.get('clinic') is None:
+            raise serializers.ValidationError("Either speciality or clinic must be provided.")
+        return data
+
+
+class NextAvailableSlotSerializer(serializers.Serializer):
+    doctor = serializers.IntegerField(source='doctor.pk')
+    doctor_fullname = serializers.CharField(source='doctor.doctor_fullname')
+    speciality = serializers.CharField(source='doctor.speciality_name.speciality_name')
+    clinic = serializers.CharField(source='doctor.clinic.clinic_name')
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+
+class AppointmentFilterSerializer(serializers.Serializer):
+    doctor = serializers.IntegerField(required=False, help_text="Only appointments with this doctor.")
+    patient = serializers.IntegerField(required=False, help_text="Only appointments of this patient (user ID).")
+    date_from = serializers.DateField(required=False, help_text="Only appointments on or after this date.")
+    date_to = serializers.DateField(required=False, help_text="Only appointments on or before this date.")
+    status = serializers.ChoiceField(choices=['scheduled', 'cancelled', 'completed'], required=False,
+                                     help_text="Only appointments with this status.")
+    cursor = serializers.CharField(required=False, help_text="Cursor returned as next_cursor by the previous page.")
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=200,
+                                         help_text="Number of appointments per page (default 50).")
+
+
+class DoctorFilterSerializer(serializers.Serializer):
+    ORDERINGS = {'-rating': ('-rating_avg', '-id'), 'rating': ('rating_avg', 'id')}
+
+    speciality = serializers.IntegerField(required=False, help_text="Only doctors of this specialty.")
+    clinic = serializers.IntegerField(required=False, help_text="Only doctors of this clinic.")
+    min_rating = serializers.FloatField(required=False, min_value=0, max_value=5,
+                                        help_text="Only doctors with at least this average rating.")
+    ordering = serializers.ChoiceField(choices=list(ORDERINGS), required=False, default='-rating',
+                                       help_text="Sort by rating, highest first (-rating) or lowest first (rating).")
+    cursor = serializers.CharField(required=False, help_text="Cursor returned as next_cursor by the previous page.")
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=200,
+                                         help_text="Number of doctors per page (default 50).")
+
+
+class ReviewPageQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False, help_text="Cursor returned as next_cursor by the previous page.")
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=100,
+                                         help_text="Number of reviews per page (default 20).")
+
+
+class NearbyClinicQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90, help_text="Latitude of the search origin.")
+    lng = serializers.FloatField(min_value=-180, max_value=180, help_text="Longitude of the search origin.")
+    k = serializers.IntegerField(required=False, default=5, min_value=1, max_value=50,
+                                 help_text="Number of clinics to return.")
+    max_distance_km = serializers.FloatField(required=False, default=50, min_value=0.1, max_value=500,
+                                             help_text="Ignore clinics further away than this.")
+    within_hours = serializers.IntegerField(required=False, default=4, min_value=1, max_value=48,
+                                            help_text="Doctors with a free slot starting within this many hours "
+                                                      "are listed as open soon.")
+
+
+class MedicationIntervalQuerySerializer(serializers.Serializer):
+    on = serializers.DateField(required=False, help_text="Medications taken on this day (YYYY-MM-DD). "
+                                                         "Defaults to today when no window is given.")
+    date_from = serializers.DateField(required=False, help_text="Start of a window (YYYY-MM-DD); medications "
+                                                                "taken on any day of it match.")
+    date_to = serializers.DateField(required=False, help_text="End of the window (YYYY-MM-DD). Either bound may "
+                                                              "be left out for an open window.")
+
+    def validate(self, data):
+        if data.get('on') is not None:
+            if data.get('date_from') is not None or data.get('date_to') is not None:
+                raise serializers.ValidationError("Give either on or a date_from/date_to window, not both.")
+            data['date_from'] = data['date_to'] = data.pop('on')
+        elif data.get('date_from') is None and data.get('date_to') is None:
+            data['date_from'] = data['date_to'] = local_now().date()
+        elif None not in (data.get('date_from'), data.get('date_to')) and data['date_to'] < data['date_from']:
+            raise serializers.ValidationError("date_to must not be before date_from.")
+        data.setdefault('date_from', None)
+        data.setdefault('date_to', None)
+        return data
+
+
+class PatientMedicationQuerySerializer(MedicationIntervalQuerySerializer):
+    MAX_PATIENTS = 1000
+
+    patient = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=MAX_PATIENTS,
+        help_text="ID of a patient. Repeat the parameter for several patients."
+    )
+
+
+class ContraindicationCheckSerializer(serializers.Serializer):
+    medications = serializers.ListField(child=serializers.CharField(max_length=255), min_length=1,
+                                        help_text="Names of the medications to prescribe.")
+    allergies = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list,
+                                      help_text="Allergy names to check against.")
+    patient_id = serializers.IntegerField(required=False,
+                                          help_text="Also check against every allergy recorded for this patient.")
+
+
+class ConflictSerializer(serializers.Serializer):
+    allergy = serializers.CharField()
+    medication = serializers.CharField()
+    reason = serializers.CharField()
+
+
+class PatientConflictsSerializer(serializers.Serializer):
+    patient_id = serializers.IntegerField()
+    conflicts = ConflictSerializer(many=True)
+
+
+class ContraindicationScreenQuerySerializer(serializers.Serializer):
+    patient = serializers.ListField(
+        child=serializers.IntegerField(), required=False,
+        help_text="ID of a patient to screen. Repeat the parameter for several patients; leave out to screen "
+                  "every patient."
+    )
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=['ndjson', 'json'], default='ndjson',
+                                     help_text='ndjson streams one object per line; json streams a single array.')
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200, help_text="Words to look for in doctor names, specialties, clinic "
+                                                        "names and addresses. Every word matches as a prefix.")
+    type = serializers.ChoiceField(choices=['doctor', 'clinic'], required=False,
+                                   help_text="Only return doctors or only clinics.")
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100,
+                                     help_text="Maximum number of results.")
@@ -0,0 +1,188 @@
+"""
+Model signal receivers that keep cached responses in sync with the database.
+
+Queryset ``update()``/``bulk_create()`` calls do not send these signals; code
+that uses them must bump the affected generations itself.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+from .caching import (CLINIC_LIST_GENERATION, bump_generation, bump_generations, doctor_generation_key,
+                      medical_record_generation_key, patient_generation_key)
+from .models import (Allergies, ChronicIllnesses, Clinics, Contraindication, DoctorAvailability, DoctorQualification,
+                     DoctorReview, Doctors, DoctorSpeciality, DoctorWorkExperience, GeneticIllnesses, MedicalCondition,
+                     Medication, PatientMedicalProfile, PatientProfile)
+from . import geo, search
+from .contraindications import CONTRAINDICATION_GENERATION, contraindications
+from .ratings import apply_rating_delta
+
+CLINIC_LIST_MODELS = (Clinics, Doctors, DoctorSpeciality, DoctorAvailability, DoctorReview, DoctorWorkExperience,
+                      DoctorQualification)
+
+
+def is_login_update(kwargs):
+    """``True`` for the ``last_login`` only save that every login performs."""
+    update_fields = kwargs.get('update_fields')
+    return update_fields is not None and set(update_fields) <= {'last_login'}
+
+
+def invalidate_clinic_list(sender, instance, **kwargs):
+    bump_generation(CLINIC_LIST_GENERATION)
+
+
+for model in CLINIC_LIST_MODELS:
+    post_save.connect(invalidate_clinic_list, sender=model)
+    post_delete.connect(invalidate_clinic_list, sender=model)
+
+
+def invalidate_doctors(doctor_ids):
+    bump_generations(doctor_generation_key(pk) for pk in doctor_ids)
+
+
+@receiver([post_save, post_delete], sender=Doctors)
+def invalidate_doctor(sender, instance, **kwargs):
+    invalidate_doctors([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=DoctorReview)
+@receiver([post_save, post_delete], sender=DoctorWorkExperience)
+@receiver([post_save, post_delete], sender=DoctorQualification)
+@receiver([post_save, post_delete], sender=DoctorAvailability)
+def invalidate_doctor_detail(sender, instance, **kwargs):
+    invalidate_doctors([instance.doctor_id])
+
+
+@receiver(pre_save, sender=Clinics)
+def locate_clinic(sender, instance, **kwargs):
+    geo.locate(instance)
+
+
+@receiver(post_save, sender=Clinics)
+def invalidate_clinic_doctors(sender, instance, **kwargs):
+    invalidate_doctors(Doctors.objects.filter(clinic_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=DoctorSpeciality)
+def invalidate_speciality_doctors(sender, instance, **kwargs):
+    invalidate_doctors(Doctors.objects.filter(speciality_name_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_doctor_user(sender, instance, **kwargs):
+    # Usernames and emails are part of patient profiles, the clinic list and doctor profiles
+    if is_login_update(kwargs):
+        return
+    bump_generation(patient_generation_key(instance.username))
+    doctor_ids = list(Doctors.objects.filter(doctor_username_id=instance.pk).values_list('pk', flat=True))
+    if doctor_ids:
+        bump_generation(CLINIC_LIST_GENERATION)
+        invalidate_doctors(doctor_ids)
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, **kwargs):
+    # Deactivation, password and permission changes must reach token-authenticated requests
+    if not is_login_update(kwargs):
+        invalidate_tokens(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+
+
+@receiver([post_save, post_delete], sender=PatientProfile)
+def invalidate_patient_profile(sender, instance, **kwargs):
+    bump_generation(patient_generation_key(instance.patient_username.username))
+
+
+def invalidate_medical_records(patient_ids):
+    bump_generations(medical_record_generation_key(patient_id) for patient_id in set(patient_ids))
+
+
+@receiver(pre_save, sender=PatientMedicalProfile)
+def remember_previous_patient(sender, instance, **kwargs):
+    instance._previous_patient_id = None
+    if instance.pk is not None:
+        instance._previous_patient_id = PatientMedicalProfile.objects.filter(pk=instance.pk).values_list(
+            'patient_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=PatientMedicalProfile)
+def invalidate_medical_record(sender, instance, **kwargs):
+    # A row moved to another patient leaves the previous patient's record stale too
+    previous = getattr(instance, '_previous_patient_id', None)
+    invalidate_medical_records([instance.patient_id] + ([previous] if previous is not None else []))
+
+
+@receiver(post_save, sender=Allergies)
+@receiver(post_save, sender=GeneticIllnesses)
+@receiver(post_save, sender=Medication)
+@receiver(post_save, sender=ChronicIllnesses)
+@receiver(post_save, sender=MedicalCondition)
+def invalidate_referencing_medical_records(sender, instance, **kwargs):
+    # Deletes cascade to the profile rows, whose own post_delete invalidates the records
+    field = {Allergies: 'allergy_id', GeneticIllnesses: 'genetic_id', Medication: 'medication_id',
+             ChronicIllnesses: 'chron_illness_id', MedicalCondition: 'condition_id'}[sender]
+    invalidate_medical_records(PatientMedicalProfile.objects.filter(**{field: instance.pk}).values_list(
+        'patient_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Contraindication)
+def reload_contraindications(sender, instance, **kwargs):
+    # This process reloads on its next check; the others once they see the new generation
+    contraindications.invalidate()
+    bump_generation(CONTRAINDICATION_GENERATION)
+
+
+@receiver(pre_save, sender=DoctorReview)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk is not None:
+        instance._previous_rating = DoctorReview.objects.filter(pk=instance.pk).values_list(
+            'doctor_id', 'rating').first()
+
+
+@receiver(post_save, sender=DoctorReview)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        apply_rating_delta(instance.doctor_id, 1, instance.rating)
+    elif previous[0] != instance.doctor_id:
+        apply_rating_delta(previous[0], -1, -previous[1])
+        apply_rating_delta(instance.doctor_id, 1, instance.rating)
+    elif previous[1] != instance.rating:
+        apply_rating_delta(instance.doctor_id, 0, instance.rating - previous[1])
+
+
+@receiver(post_delete, sender=DoctorReview)
+def update_rating_on_delete(sender, instance, **kwargs):
+    apply_rating_delta(instance.doctor_id, -1, -instance.rating)
+
+
+@receiver(post_save, sender=Doctors)
+def index_doctor(sender, instance, **kwargs):
+    search.index_doctors([instance.pk])
+
+
+@receiver(post_delete, sender=Doctors)
+def unindex_doctor(sender, instance, **kwargs):
+    search.remove(search.DOCTOR, [instance.pk])
+
+
+@receiver(post_save, sender=Clinics)
+def index_clinic(sender, instance, **kwargs):
+    search.index_clinics([instance.pk])
+
+
+@receiver(post_delete, sender=Clinics)
+def unindex_clinic(sender, instance, **kwargs):
+    search.remove(search.CLINIC, [instance.pk])
+
+
+@receiver(post_save, sender=DoctorSpeciality)
+def index_speciality_doctors(sender, instance, **kwargs):
+    search.index_doctors(Doctors.objects.filter(speciality_name_id=instance.pk).values_list('pk', flat=True))
@@ -0,0 +1,179 @@
+"""
+Half-hour slot index for doctor schedules.
+
+Every doctor/day pair is represented by a single integer used as a bitmap:
+bit ``i`` stands for the slot that starts ``i * SLOT_MINUTES`` minutes after
+midnight.  Weekly ``DoctorAvailability`` windows are turned into one bitmap per
+weekday, non-cancelled ``Appointment`` rows into a "busy" bitmap per day, and
+the free slots of a day are simply ``weekly[weekday] & ~busy``.  Building the
+index for any number of doctors costs two queries.
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.utils import timezone
+
+from .models import Appointment, DoctorAvailability
+
+SLOT_MINUTES = 30
+SLOT_SECONDS = SLOT_MINUTES * 60
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _range_mask(first, last):
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def window_mask(start_time, end_time):
+    """Bitmap of the slots that fit entirely inside ``[start_time, end_time)``."""
+    first = -(-_seconds(start_time) // SLOT_SECONDS)
+    last = _seconds(end_time) // SLOT_SECONDS
+    return _range_mask(first, last)
+
+
+def busy_mask(start_time, end_time):
+    """Bitmap of every slot that overlaps ``[start_time, end_time)``."""
+    first = _seconds(start_time) // SLOT_SECONDS
+    last = -(-_seconds(end_time) // SLOT_SECONDS)
+    return _range_mask(first, last)
+
+
+def slot_times(index):
+    """Start and end time of slot ``index``."""
+    start = index * SLOT_MINUTES
+    end = start + SLOT_MINUTES
+    end_time = time.max.replace(microsecond=0) if end >= 24 * 60 else time(end // 60, end % 60)
+    return time(start // 60, start % 60), end_time
+
+
+def iter_slots(mask):
+    """Yield ``(start_time, end_time)`` for every bit set in ``mask``, earliest first."""
+    while mask:
+        low = mask & -mask
+        yield slot_times(low.bit_length() - 1)
+        mask ^= low
+
+
+def cutoff_mask(moment):
+    """Bitmap of the slots of ``moment``'s day that start at or after ``moment``."""
+    first = -(-_seconds(moment) // SLOT_SECONDS)
+    return _range_mask(first, SLOTS_PER_DAY)
+
+
+def load_weekly_masks(doctors):
+    """
+    Map doctor id to seven bitmaps (Monday first) built from its availability windows.
+
+    ``doctors`` may be a queryset or a list of ids; it is used as a subquery so the
+    whole schedule is read in a single query.
+    """
+    weekly = defaultdict(lambda: [0] * 7)
+    rows = DoctorAvailability.objects.filter(doctor__in=doctors).order_by().values_list(
+        'doctor_id', 'day_of_week', 'start_time', 'end_time'
+    )
+    for doctor_id, day_of_week, start_time, end_time in rows:
+        weekly[doctor_id][day_of_week - 1] |= window_mask(start_time, end_time)
+    return dict(weekly)
+
+
+def load_busy_masks(doctors, date_from, date_to):
+    """Map ``(doctor_id, date)`` to the bitmap of slots taken by active appointments."""
+    busy = defaultdict(int)
+    rows = Appointment.objects.filter(
+        doctor__in=doctors, date__range=(date_from, date_to)
+    ).exclude(status='cancelled').order_by().values_list('doctor_id', 'date', 'start_time', 'end_time')
+    for doctor_id, day, start_time, end_time in rows:
+        busy[doctor_id, day] |= busy_mask(start_time, end_time)
+    return busy
+
+
+def build_slot_index(doctors, date_from, date_to, not_before=None, weekly=None):
+    """
+    Free-slot bitmaps for ``doctors`` between ``date_from`` and ``date_to`` inclusive.
+
+    Returns ``{doctor_id: {date: mask}}`` containing only days with at least one free
+    slot.  Slots starting before ``not_before`` (a naive local datetime) are dropped.
+    A precomputed ``weekly`` map from ``load_weekly_masks`` may be passed in.
+    """
+    if weekly is None:
+        weekly = load_weekly_masks(doctors)
+    if not weekly or date_to < date_from:
+        return {}
+    busy = load_busy_masks(doctors, date_from, date_to)
+
+    index = {}
+    day = date_from
+    while day <= date_to:
+        limit = FULL_DAY
+        if not_before is not None:
+            if day < not_before.date():
+                day += timedelta(days=1)
+                continue
+            if day == not_before.date():
+                limit = cutoff_mask(not_before)
+        weekday = day.weekday()
+        for doctor_id, masks in weekly.items():
+            free = masks[weekday] & ~busy.get((doctor_id, day), 0) & limit
+            if free:
+                index.setdefault(doctor_id, {})[day] = free
+        day += timedelta(days=1)
+    return index
+
+
+def serialize_slots(mask):
+    """JSON-ready list of the slots set in ``mask``."""
+    return [
+        {'start_time': start.isoformat(), 'end_time': end.isoformat()}
+        for start, end in iter_slots(mask)
+    ]
+
+
+def local_now():
+    """Naive local datetime used as the ``not_before`` bound for slot searches."""
+    return timezone.localtime().replace(tzinfo=None)
+
+
+def find_next_slots(doctors, date_from, limit, max_days, not_before=None, chunk_days=7):
+    """
+    The first ``limit`` free slots across ``doctors``, earliest first.
+
+    The weekly schedule is read once, then appointments are fetched one chunk of
+    ``chunk_days`` at a time while walking forward day by day, so the number of
+    queries depends on how far the search has to go, not on the number of doctors.
+    Returns a list of ``(date, slot_index, doctor_id)`` tuples.
+    """
+    weekly = load_weekly_masks(doctors)
+    by_weekday = [
+        [(doctor_id, masks[weekday]) for doctor_id, masks in weekly.items() if masks[weekday]]
+        for weekday in range(7)
+    ]
+    found = []
+    chunk_start = date_from
+    date_last = date_from + timedelta(days=max_days - 1)
+    while chunk_start <= date_last and len(found) < limit:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), date_last)
+        busy = load_busy_masks(doctors, chunk_start, chunk_end)
+        day = chunk_start
+        while day <= chunk_end and len(found) < limit:
+            limit_mask = FULL_DAY
+            if not_before is not None and day <= not_before.date():
+                limit_mask = cutoff_mask(not_before) if day == not_before.date() else 0
+            candidates = []
+            for doctor_id, mask in by_weekday[day.weekday()]:
+                free = mask & ~busy.get((doctor_id, day), 0) & limit_mask
+                while free:
+                    low = free & -free
+                    candidates.append((low.bit_length() - 1, doctor_id))
+                    free ^= low
+            candidates.sort()
+            found.extend((day, index, doctor_id) for index, doctor_id in candidates[:limit - len(found)])
+            day += timedelta(days=1)
+        chunk_start = chunk_end + timedelta(days=1)
+    return found
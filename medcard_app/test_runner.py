@@ -0,0 +1,28 @@
+"""
+Test runner that points the cache at a private file for the length of the run.
+
+The default cache is a SQLite file shared by every worker process on the host
+(``cache_backends.py``), and the tests clear it; without this they would wipe
+live pending signups, login roles and throttle counters, and leave entries
+behind for the next run.
+"""
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        self._cache_directory = tempfile.TemporaryDirectory(prefix='medcard-test-cache-')
+        caches = {alias: {**options, 'LOCATION': f'{self._cache_directory.name}/{alias}.sqlite3'}
+                  for alias, options in settings.CACHES.items()}
+        self._cache_settings = override_settings(CACHES=caches)
+        self._cache_settings.enable()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self._cache_settings.disable()
+        self._cache_directory.cleanup()
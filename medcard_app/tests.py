@@ -1,3 +1,1108 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import os
+import smtplib
+import sqlite3
+import stat
+import tempfile
+import threading
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+import time as clock
+from datetime import date, datetime, time, timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import geo, medications, outbox, search, throttling
+from .authentication import CachedTokenAuthentication, shared_key, token_cache
+from .caching import doctor_generation_key, get_or_render
+from .cache_backends import SQLiteCache
+from .contraindications import contraindications, prescription_conflicts, screen
+from .routers import ReadReplicaRouter, ReadYourWritesMiddleware, pin_to_primary
+from .models import *
+from .slots import build_slot_index, busy_mask, iter_slots, window_mask
+
+
+class MedcardFixturesMixin:
+    """Small clinic/doctor/patient fixture shared by the API tests."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        token_cache.clear()
+        contraindications.invalidate()
+
+    @classmethod
+    def make_doctor(cls, username='DOC1', clinic=None, speciality=None):
+        clinic = clinic or Clinics.objects.create(clinic_name='Central', contacts='555', address='Main st',
+                                                  clinic_location='41.31,69.24')
+        speciality = speciality or DoctorSpeciality.objects.create(speciality_name='Cardiology')
+        user = User.objects.create_user(username=username, password='secret-pass-1', email=f'{username}@x.com')
+        return Doctors.objects.create(clinic=clinic, doctor_username=user, doctor_fullname=f'Dr {username}',
+                                      doctor_birthdate=date(1980, 1, 1), doctor_phone='123',
+                                      doctor_license_no='L-1', speciality_name=speciality)
+
+    @staticmethod
+    def next_weekday(weekday):
+        """The next date (after today) falling on ``weekday`` (Monday is 0)."""
+        today = date.today()
+        return today + timedelta(days=(weekday - today.weekday()) % 7 or 7)
+
+
+class SlotIndexTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.patient = User.objects.create_user(username='patient', password='secret-pass-1')
+        DoctorAvailability.objects.create(doctor=cls.doctor, day_of_week=1, start_time=time(9),
+                                          end_time=time(11))
+        cls.monday = cls.next_weekday(0)
+
+    def test_masks(self):
+        self.assertEqual(list(iter_slots(window_mask(time(9), time(10, 15)))),
+                         [(time(9), time(9, 30)), (time(9, 30), time(10))])
+        self.assertEqual(busy_mask(time(9, 15), time(9, 45)), window_mask(time(9), time(10)))
+
+    def test_booked_and_cancelled_slots(self):
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.monday,
+                                   start_time=time(9, 30), end_time=time(10))
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.monday,
+                                   start_time=time(10), end_time=time(10, 30), status='cancelled')
+        with self.assertNumQueries(2):
+            index = build_slot_index(Doctors.objects.values('pk'), self.monday, self.monday + timedelta(days=6))
+        self.assertEqual(list(index[self.doctor.pk]), [self.monday])
+        self.assertEqual([start for start, _ in iter_slots(index[self.doctor.pk][self.monday])],
+                         [time(9), time(10), time(10, 30)])
+
+    def test_free_slots_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.patient)
+        response = client.get('/api/free_slots/', {'clinic': self.doctor.clinic_id,
+                                                    'date_from': self.monday.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['doctor'], self.doctor.pk)
+        self.assertEqual(len(response.data[0]['slots']), 4)
+        self.assertEqual(client.get('/api/free_slots/', {'date_from': self.monday.isoformat()}).status_code, 400)
+
+    def test_next_available_across_speciality(self):
+        other = self.make_doctor('DOC2', clinic=self.doctor.clinic, speciality=self.doctor.speciality_name)
+        DoctorAvailability.objects.create(doctor=other, day_of_week=1, start_time=time(8, 30), end_time=time(9, 30))
+        client = APIClient()
+        client.force_authenticate(self.patient)
+        with self.assertNumQueries(3):
+            response = client.get('/api/next_available/', {'speciality': self.doctor.speciality_name_id,
+                                                           'date_from': self.monday.isoformat(), 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(slot['doctor'], slot['start_time']) for slot in response.data],
+                         [(other.pk, '08:30:00'), (self.doctor.pk, '09:00:00'), (other.pk, '09:00:00')])
+
+
+class AppointmentListTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.patient = User.objects.create_user(username='patient', password='secret-pass-1')
+        cls.monday = cls.next_weekday(0)
+        for offset, hour, state in [(0, 9, 'scheduled'), (0, 10, 'scheduled'), (1, 9, 'cancelled'),
+                                    (2, 9, 'scheduled'), (6, 11, 'completed')]:
+            Appointment.objects.create(patient=cls.patient, doctor=cls.doctor, date=cls.monday + timedelta(days=offset),
+                                       start_time=time(hour), end_time=time(hour, 30), status=state)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_cursor_pages_grouped_by_weekday(self):
+        seen, params = [], {'page_size': 2}
+        while True:
+            response = self.client.get('/api/appointments_list/', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [(day, item['id']) for day, items in response.data.items() if day != 'next_cursor'
+                     for item in items]
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual([day for day, _ in seen],
+                         ['monday', 'monday', 'tuesday', 'wednesday', 'sunday'])
+        self.assertEqual(len({pk for _, pk in seen}), 5)
+
+    def test_compact_doctor_in_constant_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/appointments_list/')
+        self.assertEqual(response.data['monday'][0]['doctor'],
+                         {'id': self.doctor.pk, 'doctor_fullname': 'Dr DOC1', 'speciality': 'Cardiology',
+                          'clinic_name': 'Central'})
+        response = self.client.get('/api/appointments_list/', {'expand': 'doctor'})
+        self.assertIn('availabilities', response.data['monday'][0]['doctor'])
+
+    def test_filters_and_bad_cursor(self):
+        response = self.client.get('/api/appointments_list/', {'status': 'scheduled',
+                                                               'date_from': (self.monday + timedelta(days=1)).isoformat()})
+        self.assertEqual([len(response.data[day]) for day in ['monday', 'tuesday', 'wednesday']], [0, 0, 1])
+        self.assertEqual(self.client.get('/api/appointments_list/', {'cursor': 'bogus'}).status_code, 400)
+
+
+class FieldSelectionTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.make_doctor('DOC2', clinic=cls.doctor.clinic, speciality=cls.doctor.speciality_name)
+        DoctorAvailability.objects.create(doctor=cls.doctor, day_of_week=1, start_time=time(9), end_time=time(11))
+        DoctorReview.objects.create(doctor=cls.doctor, rating=5, review='Great')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor.doctor_username)
+
+    def test_full_clinic_list_in_constant_queries(self):
+        with self.assertNumQueries(8):
+            response = self.client.get('/api/clinics/')
+        self.assertEqual(len(response.json()[0]['doctors']), 2)
+
+    def test_clinic_list_cache_invalidation(self):
+        self.client.get('/api/clinics/')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get('/api/clinics/').json()[0]['doctors'][0]['reviews']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            DoctorReview.objects.create(doctor=self.doctor, rating=4, review='Good')
+        self.assertEqual(len(self.client.get('/api/clinics/').json()[0]['doctors'][0]['reviews']), 2)
+
+    def test_sparse_clinic_list_skips_unrequested_relations(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/clinics/', {'fields': 'clinic_name,doctors.doctor_fullname,'
+                                                                   'doctors.speciality_name'})
+        self.assertEqual(response.json()[0], {'clinic_name': 'Central', 'doctors': [
+            {'doctor_fullname': 'Dr DOC1', 'speciality_name': {'speciality_name': 'Cardiology'}},
+            {'doctor_fullname': 'Dr DOC2', 'speciality_name': {'speciality_name': 'Cardiology'}},
+        ]})
+
+    def test_warmed_doctor_profile_skips_the_orm(self):
+        call_command('warm_doctor_cache', stdout=StringIO())
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/doctor_detail/{self.doctor.pk}/')
+        self.assertEqual(response.json()['doctor_fullname'], 'Dr DOC1')
+        with self.captureOnCommitCallbacks(execute=True):
+            DoctorAvailability.objects.create(doctor=self.doctor, day_of_week=2, start_time=time(9),
+                                              end_time=time(10))
+        self.assertEqual(len(self.client.get(f'/api/doctor_detail/{self.doctor.pk}/').json()['availabilities']), 2)
+        self.assertEqual(self.client.get('/api/doctor_detail/999/').status_code, 404)
+
+    def test_conditional_get(self):
+        url = f'/api/doctor_detail/{self.doctor.pk}/'
+        # Last-Modified is only sent once the generation's second is over
+        cache.set(doctor_generation_key(self.doctor.pk), f'{clock.time_ns() - 2 * 10 ** 9:x}', timeout=None)
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(url, {'fields': 'doctor_fullname'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # A write in the current second cannot be told apart by If-Modified-Since
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_missing_doctor_has_no_validators(self):
+        for _ in range(2):
+            response = self.client.get('/api/doctor_detail/999/')
+            self.assertEqual(response.status_code, 404)
+            self.assertFalse(response.has_header('ETag'))
+            self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_doctor_detail_fields(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/doctor_detail/{self.doctor.pk}/', {'fields': 'doctor_fullname,clinic'})
+        self.assertEqual(set(response.json()), {'doctor_fullname', 'clinic'})
+
+
+class RatingAggregateTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.other = cls.make_doctor('DOC2', clinic=cls.doctor.clinic, speciality=cls.doctor.speciality_name)
+
+    def aggregates(self, doctor):
+        doctor.refresh_from_db()
+        return doctor.review_count, doctor.rating_sum, round(doctor.rating_avg, 2)
+
+    def test_incremental_updates(self):
+        first = DoctorReview.objects.create(doctor=self.doctor, rating=5, review='Great')
+        second = DoctorReview.objects.create(doctor=self.doctor, rating=2, review='Meh')
+        self.assertEqual(self.aggregates(self.doctor), (2, 7, 3.5))
+        second.rating = 4
+        second.save()
+        self.assertEqual(self.aggregates(self.doctor), (2, 9, 4.5))
+        first.doctor = self.other
+        first.save()
+        self.assertEqual(self.aggregates(self.doctor), (1, 4, 4.0))
+        self.assertEqual(self.aggregates(self.other), (1, 5, 5.0))
+        second.delete()
+        self.assertEqual(self.aggregates(self.doctor), (0, 0, 0.0))
+
+    def test_review_preview_and_pages(self):
+        for rating in range(1, 6):
+            DoctorReview.objects.create(doctor=self.doctor, rating=rating, review=f'Review {rating}')
+        client = APIClient()
+        client.force_authenticate(self.doctor.doctor_username)
+        doctor = client.get(f'/api/doctor_detail/{self.doctor.pk}/').json()
+        self.assertEqual(([review['rating'] for review in doctor['reviews']], doctor['review_count']), ([5, 4, 3], 5))
+        clinic = client.get('/api/clinics/').json()[0]
+        self.assertEqual([len(doctor['reviews']) for doctor in clinic['doctors']], [3, 0])
+
+        ratings, params = [], {'page_size': 2}
+        while True:
+            response = client.get(f'/api/doctor_detail/{self.doctor.pk}/reviews/', params)
+            ratings += [review['rating'] for review in response.data['results']]
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(ratings, [5, 4, 3, 2, 1])
+        self.assertEqual(client.get('/api/doctor_detail/999/reviews/').status_code, 404)
+
+    def test_repair_command_and_ordering(self):
+        DoctorReview.objects.create(doctor=self.doctor, rating=3, review='Ok')
+        DoctorReview.objects.create(doctor=self.other, rating=5, review='Great')
+        Doctors.objects.update(review_count=0, rating_sum=0, rating_avg=0)
+        call_command('recompute_doctor_ratings', stdout=StringIO())
+        self.assertEqual(self.aggregates(self.doctor), (1, 3, 3.0))
+
+        client = APIClient()
+        client.force_authenticate(self.doctor.doctor_username)
+        response = client.get('/api/doctors/', {'min_rating': 2})
+        self.assertEqual([(doctor['id'], doctor['rating']) for doctor in response.data['results']],
+                         [(self.other.pk, 5.0), (self.doctor.pk, 3.0)])
+        response = client.get('/api/doctors/', {'ordering': 'rating', 'page_size': 1})
+        self.assertEqual(response.data['results'][0]['id'], self.doctor.pk)
+        response = client.get('/api/doctors/', {'ordering': 'rating', 'cursor': response.data['next_cursor']})
+        self.assertEqual([doctor['id'] for doctor in response.data['results']], [self.other.pk])
+
+
+class SearchTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.surgeon = cls.make_doctor('DOC2', clinic=cls.doctor.clinic,
+                                      speciality=DoctorSpeciality.objects.create(speciality_name='Surgery'))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor.doctor_username)
+
+    def search(self, **params):
+        return [(result['type'], result['id']) for result in self.client.get('/api/search/', params).data]
+
+    def test_prefix_match_and_ranking(self):
+        self.assertEqual(self.search(q='surg'), [('doctor', self.surgeon.pk)])
+        self.assertEqual(self.search(q='centr')[0], ('clinic', self.doctor.clinic_id))
+        self.assertEqual(self.search(q='centr', type='doctor'), [('doctor', self.doctor.pk), ('doctor', self.surgeon.pk)])
+        self.assertEqual(self.search(q='cardio doc1'), [('doctor', self.doctor.pk)])
+
+    def test_best_match_ranked_over_earlier_rows(self):
+        for number in range(5):
+            Clinics.objects.create(clinic_name=f'Clinic {number}', contacts='1', address='Ward st')
+        ward = self.make_doctor('WARD', clinic=self.doctor.clinic, speciality=self.doctor.speciality_name)
+        ward.doctor_fullname = 'Dr Ward'
+        ward.save()
+        self.assertEqual(search.search_ids('ward', limit=1), [('doctor', ward.pk)])
+
+    def test_index_follows_writes(self):
+        speciality = self.surgeon.speciality_name
+        speciality.speciality_name = 'Neurology'
+        speciality.save()
+        self.assertEqual(self.search(q='surg'), [])
+        self.assertEqual(self.search(q='neuro'), [('doctor', self.surgeon.pk)])
+        self.surgeon.delete()
+        self.assertEqual(self.search(q='neuro'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search(q='cardio'), [('doctor', self.doctor.pk)])
+
+
+class NearbyClinicTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.near = Clinics.objects.create(clinic_name='Near', contacts='1', address='a',
+                                          clinic_location='https://maps.example.com/@41.33,69.26,15z')
+        cls.far = Clinics.objects.create(clinic_name='Far', contacts='1', address='a', clinic_location='40.10 64.40')
+        Clinics.objects.create(clinic_name='Unknown', contacts='1', address='a', clinic_location='ask at reception')
+        DoctorAvailability.objects.create(doctor=cls.doctor, day_of_week=1, start_time=time(9), end_time=time(12))
+
+    def test_coordinates_parsed_on_save(self):
+        self.assertEqual((self.near.latitude, self.near.longitude), (41.33, 69.26))
+        self.assertEqual((self.near.grid_lat, self.near.grid_lng), geo.grid_cell(41.33, 69.26))
+        self.assertIsNone(Clinics.objects.get(clinic_name='Unknown').grid_lat)
+
+    def test_nearest_reads_only_nearby_rings(self):
+        with self.assertNumQueries(2):
+            nearest = geo.nearest_clinics(41.31, 69.24, 2)
+        self.assertEqual([clinic.pk for _, clinic in nearest], [self.doctor.clinic_id, self.near.pk])
+        self.assertAlmostEqual(nearest[1][0], 2.78, places=1)
+        self.assertEqual([clinic.pk for _, clinic in geo.nearest_clinics(41.31, 69.24, 5)],
+                         [self.doctor.clinic_id, self.near.pk])
+
+    def test_high_latitude_search_is_bounded(self):
+        with self.assertNumQueries(geo.MAX_RINGS + 1):
+            self.assertEqual(geo.nearest_clinics(75.0, 30.0, 3, max_distance_km=500), [])
+
+    def test_nearest_wraps_across_the_antimeridian(self):
+        east = Clinics.objects.create(clinic_name='East', contacts='1', address='a', clinic_location='65.0, 179.98')
+        west = Clinics.objects.create(clinic_name='West', contacts='1', address='a', clinic_location='65.0, -179.9')
+        nearest = geo.nearest_clinics(65.0, -179.99, 2)
+        self.assertEqual([clinic.pk for _, clinic in nearest], [east.pk, west.pk])
+
+    def test_open_soon_doctors(self):
+        monday = self.next_weekday(0)
+        Appointment.objects.create(patient=self.doctor.doctor_username, doctor=self.doctor, date=monday,
+                                   start_time=time(9), end_time=time(10))
+        found = geo.open_soon([self.doctor.clinic_id], 2, now=datetime.combine(monday, time(8, 45)))
+        self.assertEqual(found[self.doctor.clinic_id][0][1:], (monday, time(10), time(10, 30)))
+        self.assertEqual(geo.open_soon([self.doctor.clinic_id], 1, now=datetime.combine(monday, time(8, 45))), {})
+
+        client = APIClient()
+        client.force_authenticate(self.doctor.doctor_username)
+        response = client.get('/api/clinics/nearby/', {'lat': 41.31, 'lng': 69.24, 'k': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([clinic['id'] for clinic in response.data], [self.doctor.clinic_id])
+        self.assertEqual(client.get('/api/clinics/nearby/', {'lat': 100, 'lng': 0}).status_code, 400)
+
+
+class MedicalRecordTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.patient = User.objects.create_user(username='pat', password='secret-pass-1')
+        cls.other = User.objects.create_user(username='other', password='secret-pass-1')
+        # Records are keyed by PatientProfile id, chosen here to differ from the user id
+        cls.patient_profile, cls.other_profile = [
+            PatientProfile.objects.create(pk=pk, patient_username=user, patient_fullname=user.username,
+                                          patient_birthdate=date(1990, 1, 1), patient_phone='123',
+                                          patient_gender='F', patient_address='Main st')
+            for pk, user in [(500, cls.patient), (501, cls.other)]]
+        cls.allergy = Allergies.objects.create(allergy_name='Penicillin', allergy_description='Rash')
+        genetic = GeneticIllnesses.objects.create(genetic_illness_name='Thalassemia', description='Minor')
+        chronic = ChronicIllnesses.objects.create(chronic_illness_name='Asthma', description='Mild',
+                                                  monitoring_freq='Yearly', severity_stage='1')
+        old, new = [Medication.objects.create(name=name, dosage='1/day', side_effects='', start_date=started,
+                                              end_date=ended)
+                    for name, started, ended in [('Salbutamol', date(2020, 1, 1), date(2020, 5, 31)),
+                                                 ('Budesonide', date(2020, 6, 1), None)]]
+        # Conditions and profile rows reference each other, so the profile ids are chosen up front
+        condition = MedicalCondition.objects.create(patient_id_id=1000, diagnosis='Bronchitis')
+        for pk, patient, medication, notes in [(1000, cls.patient_profile, old, 'Follow up in May'),
+                                               (1001, cls.patient_profile, new, 'Follow up in May'),
+                                               (1002, cls.other_profile, new, '')]:
+            PatientMedicalProfile.objects.create(pk=pk, patient_id=patient.pk, allergy_id=cls.allergy,
+                                                 genetic_id=genetic, medication_id=medication,
+                                                 chron_illness_id=chronic, condition_id=condition,
+                                                 doctor_notes=notes)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+        self.url = f'/api/patients/{self.patient_profile.pk}/medical_record/'
+
+    def test_grouped_record_in_one_query(self):
+        # The first query checks that the profile is the patient's own
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        record = response.json()
+        self.assertEqual([allergy['allergy_name'] for allergy in record['allergies']], ['Penicillin'])
+        self.assertEqual([medication['name'] for medication in record['medications']], ['Budesonide', 'Salbutamol'])
+        self.assertEqual(len(record['conditions']), 1)
+        self.assertEqual(record['doctor_notes'], [{'profile': 1000, 'note': 'Follow up in May'}])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).json(), record)
+
+    def test_writes_invalidate_the_cached_record(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.allergy.allergy_name = 'Amoxicillin'
+            self.allergy.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['allergies'][0]['allergy_name'], 'Amoxicillin')
+        with self.captureOnCommitCallbacks(execute=True):
+            PatientMedicalProfile.objects.filter(pk=1001).first().delete()
+        self.assertEqual(len(self.client.get(self.url).json()['medications']), 1)
+
+    def test_access(self):
+        other_url = f'/api/patients/{self.other_profile.pk}/medical_record/'
+        self.assertEqual(self.client.get(other_url).status_code, 403)
+        # The URL takes the profile id; the patient's user id names no record of theirs
+        self.assertEqual(self.client.get(f'/api/patients/{self.patient.pk}/medical_record/').status_code, 403)
+        # Any doctor may read any record, with or without an appointment with the patient
+        self.assertFalse(Appointment.objects.filter(doctor=self.doctor).exists())
+        self.client.force_authenticate(self.doctor.doctor_username)
+        self.assertEqual(len(self.client.get(other_url).json()['allergies']), 1)
+        self.assertEqual(self.client.get('/api/patients/999/medical_record/').status_code, 404)
+
+    def test_medication_intervals(self):
+        def names(found):
+            return [medication.name for medication in found]
+
+        def taken(date_from, date_to=None):
+            return names(medications.patient_medications(self.patient_profile.pk, date_from,
+                                                         date_to or date_from))
+
+        self.assertEqual(taken(date(2019, 12, 31)), [])
+        self.assertEqual(taken(date(2020, 5, 31)), ['Salbutamol'])
+        self.assertEqual(taken(date(2020, 6, 1)), ['Budesonide'])
+        self.assertEqual(taken(date(2030, 1, 1)), ['Budesonide'])
+        self.assertEqual(taken(date(2020, 5, 1), date(2020, 7, 1)), ['Budesonide', 'Salbutamol'])
+        self.assertEqual(names(medications.patient_medications(self.patient_profile.pk, None, date(2020, 3, 1))),
+                         ['Salbutamol'])
+        with self.assertNumQueries(1):
+            found = medications.medications_by_patient([self.patient_profile.pk, self.other_profile.pk],
+                                                        date(2021, 1, 1), date(2021, 1, 1))
+        self.assertEqual({patient_id: names(taken) for patient_id, taken in found.items()},
+                         {self.patient_profile.pk: ['Budesonide'], self.other_profile.pk: ['Budesonide']})
+        found = medications.medications_by_patient(None, date(2020, 3, 1), date(2020, 3, 1))
+        self.assertEqual({patient_id: names(taken) for patient_id, taken in found.items()},
+                         {self.patient_profile.pk: ['Salbutamol']})
+
+    def test_interval_queries_use_the_interval_index(self):
+        taken = Medication.objects.filter(medications.overlap(date(2020, 3, 1), date(2020, 3, 1)))
+        self.assertIn('USING INDEX medication_interval_idx', taken.explain())
+        with self.assertNumQueries(1):
+            self.assertEqual([medication.name for medication in taken], ['Salbutamol'])
+
+    def test_medication_endpoints(self):
+        url = f'/api/patients/{self.patient_profile.pk}/medications/'
+        self.assertEqual([medication['name'] for medication in self.client.get(url).json()], ['Budesonide'])
+        response = self.client.get(url, {'date_from': '2020-05-01', 'date_to': '2020-07-01'})
+        self.assertEqual([medication['name'] for medication in response.json()], ['Budesonide', 'Salbutamol'])
+        self.assertEqual(self.client.get(url, {'on': '2020-05-01', 'date_to': '2020-07-01'}).status_code, 400)
+
+        bulk = {'patient': [self.patient_profile.pk, self.other_profile.pk], 'on': '2020-03-01'}
+        self.assertEqual(self.client.get('/api/patients/medications/', bulk).status_code, 403)
+        self.client.force_authenticate(self.doctor.doctor_username)
+        response = self.client.get('/api/patients/medications/', bulk)
+        self.assertEqual([(row['patient_id'], [medication['name'] for medication in row['medications']])
+                          for row in response.json()], [(self.patient_profile.pk, ['Salbutamol'])])
+        self.assertEqual(self.client.get('/api/patients/medications/', {'on': '2020-03-01'}).status_code, 400)
+
+    def test_contraindication_lookup(self):
+        Contraindication.objects.create(allergy_name='penicillin', medication_name='Amoxicillin', reason='Rash')
+        self.assertEqual(contraindications.conflicts(['Penicillin'], ['AMOXICILLIN ', 'Budesonide']),
+                         [{'allergy': 'Penicillin', 'medication': 'AMOXICILLIN ', 'reason': 'Rash'}])
+        with self.assertNumQueries(0):
+            self.assertEqual(contraindications.conflicts(['Penicillin'], ['Budesonide']), [])
+        self.assertEqual(screen(), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Contraindication.objects.create(allergy_name='Penicillin', medication_name='budesonide')
+        self.assertEqual(screen(), {patient.pk: [{'allergy': 'Penicillin', 'medication': 'Budesonide', 'reason': ''}]
+                                    for patient in [self.patient_profile, self.other_profile]})
+        self.assertEqual(list(screen([self.other_profile.pk])), [self.other_profile.pk])
+
+    def test_prescription_validation(self):
+        Contraindication.objects.create(allergy_name='Penicillin', medication_name='Amoxicillin', reason='Rash')
+        existing = PatientMedicalProfile.objects.get(pk=1000)
+        profile = PatientMedicalProfile(
+            patient_id=self.patient_profile.pk, allergy_id=Allergies.objects.create(
+                allergy_name='Latex', allergy_description=''), genetic_id=existing.genetic_id,
+            medication_id=Medication.objects.create(name='Amoxicillin', dosage='500mg', side_effects='',
+                                                    start_date=date(2021, 1, 1)),
+            chron_illness_id=existing.chron_illness_id, condition_id=existing.condition_id, doctor_notes='Start')
+        with self.assertRaisesMessage(ValidationError, "Amoxicillin is contraindicated with the patient's "
+                                                       "Penicillin allergy: Rash"):
+            profile.full_clean()
+        profile.patient_id = self.doctor.doctor_username_id
+        profile.full_clean()
+        profile.save()
+        # A newly recorded allergy is checked against the medications already prescribed
+        existing.patient_id = self.doctor.doctor_username_id
+        conflicts = prescription_conflicts(existing)
+        self.assertEqual([(conflict['allergy'], conflict['medication']) for conflict in conflicts],
+                         [('Penicillin', 'Amoxicillin')])
+
+    def test_contraindication_endpoints(self):
+        Contraindication.objects.create(allergy_name='Penicillin', medication_name='Amoxicillin', reason='Rash')
+        body = {'patient_id': self.patient_profile.pk, 'medications': ['Amoxicillin', 'Ibuprofen']}
+        self.assertEqual(self.client.post('/api/contraindications/check/', body, format='json').status_code, 403)
+        self.client.force_authenticate(self.doctor.doctor_username)
+        response = self.client.post('/api/contraindications/check/', body, format='json')
+        self.assertEqual(response.json(), [{'allergy': 'Penicillin', 'medication': 'Amoxicillin', 'reason': 'Rash'}])
+        response = self.client.post('/api/contraindications/check/', {'medications': ['Amoxicillin'],
+                                                                      'allergies': ['Latex']}, format='json')
+        self.assertEqual(response.json(), [])
+        self.assertEqual(self.client.post('/api/contraindications/check/', {}, format='json').status_code, 400)
+        self.assertEqual(self.client.get('/api/contraindications/screen/').json(), [])
+
+
+class ExportTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = cls.make_doctor()
+        cls.admin = User.objects.create_user(username='admin', password='secret-pass-1', is_staff=True)
+        for day in range(5):
+            Appointment.objects.create(patient=cls.admin, doctor=cls.doctor, date=date(2026, 1, 5 + day),
+                                       start_time=time(9), end_time=time(9, 30))
+
+    def test_streamed_ndjson_and_json(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch('medcard_app.exports.BATCH_SIZE', 2):
+            response = client.get('/api/exports/appointments/')
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+            self.assertEqual([row['date'] for row in rows], [f'2026-01-0{5 + day}' for day in range(5)])
+            self.assertEqual(rows[0]['start_time'], '09:00:00')
+
+            response = client.get('/api/exports/appointments/', {'output': 'json'})
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), rows)
+        self.assertEqual(json.loads(b''.join(client.get('/api/exports/medical_profiles/', {'output': 'json'})
+                                             .streaming_content)), [])
+        self.assertEqual(client.get('/api/exports/doctors/').status_code, 404)
+        client.force_authenticate(self.doctor.doctor_username)
+        self.assertEqual(client.get('/api/exports/appointments/').status_code, 403)
+
+    def test_export_command(self):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('export_records', 'patients', stdout=stdout, stderr=stderr)
+        self.assertEqual(stdout.getvalue(), '')
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'appointments.json'
+            call_command('export_records', 'appointments', '--format', 'json', '--output', str(path),
+                         '--chunk-size', '2', stdout=stdout)
+            self.assertEqual(len(json.loads(path.read_text())), 5)
+        self.assertIn('Exported 5 appointments rows', stdout.getvalue())
+
+
+class TokenCacheTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='secret-pass-1', is_staff=True)
+        cls.token = Token.objects.create(user=cls.admin)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_the_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/auth/cache_stats/').data['misses'], 1)
+        with self.assertNumQueries(0):
+            stats = self.client.get('/api/auth/cache_stats/').data
+        self.assertEqual((stats['local_hits'], stats['size']), (1, 1))
+        token_cache.delete(self.token.key)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auth/cache_stats/').data['shared_hits'], 1)
+
+    def test_password_hash_is_not_cached(self):
+        self.client.get('/api/auth/cache_stats/')
+        self.assertNotIn('password', cache.get(shared_key(self.token.key)))
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual(user.get_deferred_fields(), {'password'})
+        self.assertTrue(user.check_password('secret-pass-1'))
+        user.first_name = 'Ada'
+        user.save()
+        self.admin.refresh_from_db()
+        self.assertEqual(self.admin.first_name, 'Ada')
+        self.assertTrue(self.admin.check_password('secret-pass-1'))
+
+    def test_deactivation_and_token_deletion_evict(self):
+        self.assertEqual(self.client.get('/api/auth/cache_stats/').status_code, 200)
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.client.get('/api/auth/cache_stats/').status_code, 403)
+        self.admin.is_active = True
+        self.admin.save()
+        self.assertEqual(self.client.get('/api/auth/cache_stats/').status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/auth/cache_stats/').status_code, 403)
+
+    def test_stats_are_staff_only(self):
+        user = User.objects.create_user(username='patient', password='secret-pass-1')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        self.assertEqual(self.client.get('/api/auth/cache_stats/').status_code, 403)
+
+
+class LoginTests(MedcardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='pat', password='secret-pass-1', email='pat@x.com')
+        EmailVerification.objects.create(user=cls.user, code='1234', verified=True)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def login(self, password='secret-pass-1', username='pat', **extra):
+        return APIClient().post('/api/login/', {'username': username, 'password': password}, **extra)
+
+    def test_login_goes_through_the_authentication_backends(self):
+        # The user, verification and token; the rest is login()'s session write and last_login update
+        with self.assertNumQueries(11):
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], self.token.key)
+        EmailVerification.objects.filter(user=self.user).update(verified=False)
+        self.assertEqual(self.login().status_code, 400)
+
+    def test_failed_logins_are_throttled_before_hashing(self):
+        for _ in range(throttling.USERNAME_FAILURE_LIMIT):
+            self.assertEqual(self.login('wrong').status_code, 401)
+        with mock.patch.object(User, 'check_password') as check_password:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        check_password.assert_not_called()
+        self.assertEqual(response['Retry-After'], str(throttling.FAILURE_WINDOW))
+        # Other usernames from another address are unaffected; unknown users still count per IP
+        self.assertEqual(self.login('wrong', username='nobody', REMOTE_ADDR='10.0.0.2').status_code, 401)
+        throttling.reset('pat', '127.0.0.1')
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_failures_send_user_login_failed(self):
+        failed = mock.Mock()
+        user_login_failed.connect(failed)
+        self.addCleanup(user_login_failed.disconnect, failed)
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(failed.call_count, 1)
+
+    def test_address_limit_is_configurable(self):
+        for number in range(2):
+            self.login('wrong', username=f'user{number}')
+        with self.settings(LOGIN_IP_FAILURE_LIMIT=2):
+            self.assertEqual(self.login().status_code, 429)
+        with self.settings(LOGIN_IP_FAILURE_LIMIT=None):
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_throttled_address_does_not_lock_out_the_owner(self):
+        for _ in range(throttling.USERNAME_FAILURE_LIMIT):
+            self.login('wrong', REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.9').status_code, 429)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_storms_across_addresses_are_shed_briefly(self):
+        with mock.patch.object(throttling, 'STORM_FAILURE_LIMIT', 3):
+            for number in range(3):
+                self.assertEqual(self.login('wrong', REMOTE_ADDR=f'10.0.1.{number}').status_code, 401)
+            response = self.login(REMOTE_ADDR='10.0.2.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(throttling.STORM_WINDOW))
+
+
+class OutboxTests(TestCase):
+    def test_signup_enqueues_instead_of_sending(self):
+        response = APIClient().post('/api/patient_crud/', {
+            'user': {'username': 'pat', 'password': 'secret-pass-1', 'email': 'pat@x.com'},
+            'patient_fullname': 'Pat', 'patient_birthdate': '1990-01-01', 'patient_phone': '123',
+            'patient_gender': 'F', 'patient_address': 'Main st'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual((queued.recipient, queued.status), ('pat@x.com', 'pending'))
+
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        self.assertIn('Sent 1, retrying 0, failed 0', out.getvalue())
+        self.assertEqual(mail.outbox[0].to, ['pat@x.com'])
+        self.assertEqual(OutgoingEmail.objects.get().status, 'sent')
+        call_command('send_queued_emails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_pending_signup_keeps_only_the_password_hash(self):
+        client = APIClient()
+        client.post('/api/patient_crud/', {
+            'user': {'username': 'pat', 'password': 'secret-pass-1', 'email': 'pat@x.com'},
+            'patient_fullname': 'Pat', 'patient_birthdate': '1990-01-01', 'patient_phone': '123',
+            'patient_gender': 'F', 'patient_address': 'Main st'}, format='json')
+        pending = cache.get('verification_pat@x.com')
+        self.assertNotIn('secret-pass-1', repr(pending))
+        self.assertTrue(check_password('secret-pass-1', pending['user']['password']))
+
+        response = client.post('/api/verify-email/', {'email': 'pat@x.com', 'code': pending['code']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get(username='pat').check_password('secret-pass-1'))
+
+    def test_batches_share_one_connection(self):
+        outbox.enqueue('Hi', 'Body', [f'user{number}@x.com' for number in range(5)])
+        connection = mail.get_connection()
+        with mock.patch.object(connection, 'open', wraps=connection.open) as opened:
+            self.assertEqual(outbox.drain(batch_size=2, connection=connection), (5, 0, 0))
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_retries_with_backoff_then_fails(self):
+        outbox.enqueue('Hi', 'Body', ['pat@x.com'])
+        down = smtplib.SMTPServerDisconnected('gone')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=down):
+            self.assertEqual(outbox.drain(max_attempts=2), (0, 1, 0))
+            email = OutgoingEmail.objects.get()
+            self.assertEqual((email.status, email.attempts), ('pending', 1))
+            self.assertIn('SMTPServerDisconnected', email.last_error)
+            # Not due again until the backoff has passed
+            self.assertEqual(outbox.drain(max_attempts=2), (0, 0, 0))
+            OutgoingEmail.objects.update(next_attempt_at=email.created_at)
+            self.assertEqual(outbox.drain(max_attempts=2), (0, 0, 1))
+        self.assertEqual(OutgoingEmail.objects.get().status, 'failed')
+        self.assertEqual(outbox.retry_delay(1).total_seconds(), 30)
+        self.assertEqual(outbox.retry_delay(20).total_seconds(), outbox.MAX_BACKOFF_SECONDS)
+
+    def test_a_row_is_claimed_by_one_worker(self):
+        outbox.enqueue('Hi', 'Body', ['a@x.com', 'b@x.com'])
+        # Another worker read the same due rows but wrote its lease second
+        stale = list(OutgoingEmail.objects.order_by('id'))
+        self.assertEqual(len(outbox.claim_batch(10)), 2)
+        self.assertEqual(outbox.lease(stale), [])
+
+    def test_loop_survives_a_locked_database(self):
+        err = StringIO()
+        locked = OperationalError('database is locked')
+        with mock.patch.object(outbox, 'drain', side_effect=[locked, KeyboardInterrupt]) as drain:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('send_queued_emails', loop=True, interval=0, stdout=StringIO(), stderr=err)
+        self.assertEqual(drain.call_count, 2)
+        self.assertIn('database is locked', err.getvalue())
+
+
+class ImportPatientsTests(TestCase):
+    HEADER = 'username,password,email,patient_fullname,patient_birthdate,patient_phone,patient_gender,patient_address\n'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/patients.csv'
+        User.objects.create_user(username='taken', password='secret-pass-1')
+
+    def run_import(self, *args, workers=1):
+        out, err = StringIO(), StringIO()
+        call_command('import_patients', self.path, '--workers', str(workers), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_passwords_hashed_in_worker_processes(self):
+        with open(self.path, 'w') as target:
+            target.write(self.HEADER)
+            target.write('ann,pw-ann-1,ann@x.com,Ann,1990-01-01,123,F,Main st\n')
+            target.write('cyd,pw-cyd-1,cyd@x.com,Cyd,1991-02-03,456,F,Side st\n')
+        out, err = self.run_import(workers=2)
+        self.assertIn('Imported 2 patients, rejected 0 rows', out)
+        self.assertTrue(User.objects.get(username='ann').check_password('pw-ann-1'))
+        self.assertTrue(User.objects.get(username='cyd').check_password('pw-cyd-1'))
+
+    def test_import_validates_and_writes_in_chunks(self):
+        with open(self.path, 'w') as target:
+            target.write(self.HEADER)
+            target.write('ann,pw-ann-1,ann@x.com,Ann,1990-01-01,123,F,Main st\n')
+            target.write('bob,pw-bob-1,not-an-email,Bob,1990-01-01,123,M,Main st\n')
+            target.write('taken,pw-1,t@x.com,Taken,1990-01-01,123,M,Main st\n')
+            target.write('ann,pw-ann-2,ann2@x.com,Ann Two,1990-01-01,123,F,Main st\n')
+            target.write('cyd,pw-cyd-1,cyd@x.com,Cyd,1991-02-03,456,F,Side st\n')
+        out, err = self.run_import('--chunk-size', '2')
+        self.assertIn('Imported 2 patients, rejected 3 rows', out)
+        self.assertEqual([line.split(':')[0] for line in err.splitlines()], ['Row 2', 'Row 3', 'Row 4'])
+        ann = User.objects.get(username='ann')
+        self.assertTrue(ann.check_password('pw-ann-1'))
+        self.assertEqual(ann.patientprofile.patient_fullname, 'Ann')
+        self.assertTrue(EmailVerification.objects.get(user__username='cyd').verified)
+        self.assertFalse(Path(self.path + '.checkpoint').exists())
+
+    def test_resume_skips_committed_rows(self):
+        with open(self.path, 'w') as target:
+            target.write(self.HEADER)
+            target.write('ann,pw-ann-1,ann@x.com,Ann,1990-01-01,123,F,Main st\n')
+            target.write('cyd,pw-cyd-1,cyd@x.com,Cyd,1991-02-03,456,F,Side st\n')
+        Path(self.path + '.checkpoint').write_text('{"rows": 1}')
+        out, err = self.run_import('--resume')
+        self.assertIn('Resuming after row 1', out)
+        self.assertEqual((err, list(PatientProfile.objects.values_list('patient_fullname', flat=True))), ('', ['Cyd']))
+
+
+class DirectorySyncTests(MedcardFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/directory.ndjson'
+        self.legacy = self.make_doctor('LEGACY')
+
+    def export(self, end_time='17:00', fullname='Dr Ann'):
+        return {'clinic_name': 'North', 'contacts': '1', 'address': 'North st', 'clinic_location': '41.40,69.30',
+                'doctors': [{'doctor_username': 'DOC_ANN', 'doctor_fullname': fullname,
+                             'doctor_birthdate': '1980-01-01', 'doctor_phone': '1', 'doctor_license_no': 'L',
+                             'speciality_name': 'Neurology',
+                             'availabilities': [{'day_of_week': 1, 'start_time': '09:00', 'end_time': end_time},
+                                                {'day_of_week': 2, 'start_time': '09:00', 'end_time': '12:00'}],
+                             'qualifications': [{'qualification': 'MD', 'institution': 'TMA',
+                                                 'year_obtained': '2005-06-01'}]}]}
+
+    def sync(self, *clinics, options=()):
+        with open(self.path, 'w') as target:
+            target.writelines(json.dumps(clinic) + '\n' for clinic in clinics)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sync_directory', self.path, *options, stdout=out)
+        return out.getvalue()
+
+    def test_sync_creates_then_diffs(self):
+        out = self.sync(self.export())
+        self.assertRegex(out, r'doctors\s+1 created')
+        self.assertRegex(out, r'availabilities\s+2 created')
+        ann = Doctors.objects.get(doctor_username__username='DOC_ANN')
+        self.assertEqual((ann.clinic.grid_lat, ann.speciality_name.speciality_name),
+                         (geo.grid_cell(41.4, 69.3)[0], 'Neurology'))
+        self.assertEqual(self.search_names('neuro'), ['Dr Ann'])
+
+        out = self.sync(self.export())
+        self.assertNotRegex(out, r'[1-9]\d* (created|updated|deleted)')
+        out = self.sync(self.export(end_time='15:00', fullname='Dr Ann Smith'))
+        self.assertRegex(out, r'doctors\s+0 created\s+1 updated')
+        self.assertRegex(out, r'availabilities\s+1 created\s+0 updated\s+1 deleted')
+        self.assertEqual(list(ann.availabilities.values_list('end_time', flat=True)), [time(15), time(12)])
+        self.assertTrue(Doctors.objects.filter(pk=self.legacy.pk).exists())
+
+    def test_dry_run_prune_and_errors(self):
+        out = self.sync(self.export(), options=['--prune', '--dry-run'])
+        self.assertRegex(out, r'clinics\s+1 created\s+0 updated\s+1 deleted')
+        self.assertEqual(list(Clinics.objects.values_list('clinic_name', flat=True)), ['Central'])
+        self.sync(self.export(), options=['--prune'])
+        self.assertEqual(list(Doctors.objects.values_list('doctor_fullname', flat=True)), ['Dr Ann'])
+        bad = self.export()
+        bad['doctors'][0]['doctor_birthdate'] = 'someday'
+        with self.assertRaisesMessage(CommandError, "doctor 'DOC_ANN': doctor_birthdate"):
+            self.sync(bad)
+
+    def test_values_are_validated_like_the_admin(self):
+        bad = self.export()
+        bad['doctors'][0]['doctor_phone'] = '123456789012'
+        with self.assertRaisesMessage(CommandError, "doctor 'DOC_ANN': doctor_phone: Ensure this value has at most"):
+            self.sync(bad)
+        bad = self.export()
+        bad['doctors'][0]['availabilities'][0]['day_of_week'] = 9
+        with self.assertRaisesMessage(CommandError, 'availabilities: day_of_week: Value 9 is not a valid choice.'):
+            self.sync(bad)
+        self.assertFalse(Doctors.objects.filter(doctor_username__username='DOC_ANN').exists())
+
+    def test_prune_keeps_doctors_with_appointments(self):
+        Appointment.objects.create(patient=self.legacy.doctor_username, doctor=self.legacy, date=self.next_weekday(0),
+                                   start_time=time(9), end_time=time(9, 30))
+        with self.assertRaisesMessage(CommandError, 'cannot prune 1 doctors who still have appointments or reviews '
+                                                    '(LEGACY)'):
+            self.sync(self.export(), options=['--prune'])
+        self.assertTrue(Doctors.objects.filter(pk=self.legacy.pk).exists())
+        self.assertFalse(Clinics.objects.filter(clinic_name='North').exists())
+
+    def search_names(self, query):
+        return [result['name'] for result in search.search(query)]
+
+
+class DatabaseProfileTests(TestCase):
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'cache_size': -8000})
+    def test_pragmas_applied_on_connect(self):
+        tuned = connection.copy()
+        try:
+            with tuned.cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 1234)
+                self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -8000)
+        finally:
+            tuned.close()
+
+
+@override_settings(REPLICA_PIN_SECONDS=5)
+class ReadReplicaRouterTests(MedcardFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.router = ReadReplicaRouter()
+        # Routing needs only the alias name, which the development profile leaves unconfigured
+        patcher = mock.patch('medcard_app.routers.replica_alias', return_value='replica')
+        self.replica_alias = patcher.start()
+        self.addCleanup(patcher.stop)
+        # TestCase runs inside a transaction, which always reads from the primary
+        patcher = mock.patch.object(connections['default'], 'in_atomic_block', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_routing(self):
+        self.assertEqual(self.router.db_for_read(Doctors), 'replica')
+        self.assertEqual(self.router.db_for_write(Doctors), 'default')
+        with pin_to_primary():
+            self.assertEqual(self.router.db_for_read(Doctors), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'medcard_app'))
+        self.replica_alias.return_value = None
+        self.assertEqual(self.router.db_for_read(Doctors), 'default')
+
+    def test_reads_follow_the_clients_writes(self):
+        routed = []
+
+        def view(request):
+            routed.append(self.router.db_for_read(Appointment))
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        middleware = ReadYourWritesMiddleware(view)
+        factory = RequestFactory()
+        mine, theirs = {'HTTP_AUTHORIZATION': 'Token mine'}, {'HTTP_AUTHORIZATION': 'Token theirs'}
+        middleware(factory.get('/api/appointments_list/', **mine))
+        middleware(factory.post('/api/appointments_crud/', **mine))
+        middleware(factory.get('/api/appointments_list/', **mine))
+        middleware(factory.get('/api/appointments_list/', **theirs))
+        self.assertEqual(routed, ['replica', 'default', 'default', 'replica'])
+        cache.clear()
+        middleware(factory.get('/api/appointments_list/', **mine))
+        self.assertEqual(routed[-1], 'replica')
+
+    def test_cached_responses_are_rendered_from_the_primary(self):
+        routed = []
+
+        def build():
+            routed.append(self.router.db_for_read(Doctors))
+            return {}
+
+        get_or_render('rendered_from_primary', build)
+        get_or_render('rendered_from_primary', build)
+        self.assertEqual(routed, ['default'])
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/cache.sqlite3'
+
+    def backend(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_tests_use_a_private_cache_file(self):
+        location = Path(settings.CACHES['default']['LOCATION'])
+        self.assertEqual(location.parent.parent, Path(tempfile.gettempdir()))
+        self.assertTrue(location.exists())
+
+    def test_values_are_shared_between_processes(self):
+        first, second = self.backend(), self.backend()
+        first.set('verification_pat@x.com', {'code': '1234'})
+        self.assertEqual(second.get('verification_pat@x.com'), {'code': '1234'})
+        process = multiprocessing.get_context('fork').Process(target=first.set, args=('from_child', 42))
+        process.start()
+        process.join()
+        self.assertEqual(second.get_many(['from_child', 'missing']), {'from_child': 42})
+        second.delete('verification_pat@x.com')
+        self.assertIsNone(first.get('verification_pat@x.com'))
+
+    def test_ttl_add_and_incr(self):
+        cache = self.backend()
+        cache.set('gone', 1, timeout=0)
+        self.assertFalse(cache.has_key('gone'))
+        self.assertTrue(cache.add('gone', 2))
+        self.assertFalse(cache.add('gone', 3))
+        self.assertEqual(cache.incr('gone', 5), 7)
+        self.assertRaises(ValueError, cache.incr, 'missing')
+        self.assertTrue(cache.touch('gone', None))
+        self.assertIsNone(cache._connection().execute("SELECT expires FROM cache WHERE key LIKE '%gone'").fetchone()[0])
+
+    def test_size_is_bounded(self):
+        cache = self.backend(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.set('forever', 0, timeout=None)
+        for number in range(30):
+            cache.set(f'key{number}', number, timeout=100 + number)
+        count, = cache._connection().execute("SELECT count(*) FROM cache").fetchone()
+        self.assertLessEqual(count, 10)
+        self.assertEqual(cache._connection().execute("SELECT entries FROM cache_size").fetchone()[0], count)
+        self.assertEqual((cache.get('forever'), cache.get('key29'), cache.get('key0')), (0, 29, None))
+
+    def test_cull_frequency_zero_clears_the_cache(self):
+        cache = self.backend(MAX_ENTRIES=3, CULL_FREQUENCY=0)
+        for number in range(4):
+            cache.set(f'key{number}', number)
+        self.assertEqual(cache._connection().execute("SELECT count(*) FROM cache").fetchone()[0], 0)
+
+    def test_files_are_private(self):
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        self.backend().set('verification_pat@x.com', {'code': '1234'})
+        for suffix in ['', '-wal', '-shm']:
+            self.assertEqual(stat.S_IMODE(os.stat(self.path + suffix).st_mode), 0o600)
+
+
+class ConcurrentBookingTests(MedcardFixturesMixin, TransactionTestCase):
+    # Outside a transaction reads are routed to the replica, if configured, a mirror of default under test
+    databases = '__all__'
+    THREADS = 8
+    SLOTS = 6
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Threads writing to the shared-cache in-memory test database fail on its table locks instead
+        # of waiting for SQLite's file lock; run this class on a copy of it in a file
+        if not connection.is_in_memory_db():
+            return
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        memory_name, path = connection.settings_dict['NAME'], f'{directory.name}/test.sqlite3'
+        # Keeps the in-memory database alive while no Django connection uses it
+        keepalive = sqlite3.connect(memory_name, uri=True)
+        cls.addClassCleanup(keepalive.close)
+        target = sqlite3.connect(path)
+        keepalive.backup(target)
+        target.close()
+        for alias in cls.databases:
+            settings_dict = connections[alias].settings_dict
+            # Renamed first: Django never closes a connection to an in-memory database
+            settings_dict['NAME'] = path
+            connections[alias].close()
+            cls.addClassCleanup(settings_dict.__setitem__, 'NAME', memory_name)
+            cls.addClassCleanup(connections[alias].close)
+
+    def setUp(self):
+        super().setUp()
+        self.doctor = self.make_doctor()
+        DoctorAvailability.objects.create(doctor=self.doctor, day_of_week=1, start_time=time(9), end_time=time(12))
+        self.patients = [User.objects.create_user(username=f'patient{i}', password='secret-pass-1')
+                         for i in range(self.THREADS)]
+        self.monday = self.next_weekday(0)
+
+    def book(self, patient, start_hour, start_minute):
+        client = APIClient()
+        client.force_authenticate(patient)
+        return client.post('/api/appointments_crud/', {
+            'doctor': self.doctor.pk, 'date': self.monday.isoformat(), 'status': 'scheduled',
+            'start_time': f'{start_hour:02}:{start_minute:02}',
+            'end_time': f'{start_hour + (start_minute + 30) // 60:02}:{(start_minute + 30) % 60:02}',
+        })
+
+    def test_conflict_and_cancellation(self):
+        self.assertEqual(self.book(self.patients[0], 9, 0).status_code, 201)
+        self.assertEqual(self.book(self.patients[1], 9, 0).status_code, 409)
+        self.assertEqual(self.book(self.patients[1], 9, 15).status_code, 400)
+        Appointment.objects.filter(start_time=time(9)).update(status='cancelled')
+        self.assertEqual(self.book(self.patients[1], 9, 0).status_code, 201)
+
+    def test_concurrent_bookings_never_double_book(self):
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def worker(patient):
+            barrier.wait()
+            try:
+                for slot in range(self.SLOTS):
+                    statuses.append(self.book(patient, 9 + slot // 2, slot % 2 * 30).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(patient,)) for patient in self.patients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(set(statuses)), [201, 409])
+        self.assertEqual(statuses.count(201), self.SLOTS)
+        self.assertEqual(Appointment.objects.count(), self.SLOTS)
@@ -0,0 +1,61 @@
+"""
+Cache-backed failed-login counters.
+
+Failures are counted per username and client IP, per client IP, and per
+username from any address, each in a fixed window.  Once a counter reaches its
+limit the login view answers 429 before any password hash is computed, so
+bursts of bad-password retries cannot saturate the CPUs.
+
+Wrong passwords from one address lock out only that address for the
+username; its owner can still log in from anywhere else.  The per-username
+counter only sheds storms spread over many addresses, so its window is short.
+The per-address limit is ``settings.LOGIN_IP_FAILURE_LIMIT``: raise it when
+many users share an address behind a NAT or proxy, or set it to ``None``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+FAILURE_WINDOW = 15 * 60
+USERNAME_FAILURE_LIMIT = 5
+IP_FAILURE_LIMIT = 50
+STORM_WINDOW = 60
+STORM_FAILURE_LIMIT = 100
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _counters(username, ip):
+    """``(key, limit, window)`` of every counter a failed login for ``username`` from ``ip`` adds to."""
+    username = username.lower()
+    counters = [
+        (f'login_failures:user:{username}:ip:{ip}', USERNAME_FAILURE_LIMIT, FAILURE_WINDOW),
+        (f'login_failures:user:{username}', STORM_FAILURE_LIMIT, STORM_WINDOW),
+    ]
+    ip_limit = getattr(settings, 'LOGIN_IP_FAILURE_LIMIT', IP_FAILURE_LIMIT)
+    if ip_limit is not None:
+        counters.append((f'login_failures:ip:{ip}', ip_limit, FAILURE_WINDOW))
+    return counters
+
+
+def blocked_for(username, ip):
+    """Seconds until a login for ``username`` from ``ip`` may be attempted again, or 0."""
+    counters = _counters(username, ip)
+    failures = cache.get_many([key for key, _, _ in counters])
+    return max([window for key, limit, window in counters if failures.get(key, 0) >= limit], default=0)
+
+
+def record_failure(username, ip):
+    for key, _, window in _counters(username, ip):
+        # add() starts the window; incr() keeps its expiry
+        if not cache.add(key, 1, timeout=window):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=window)
+
+
+def reset(username, ip):
+    """Clear the failures of ``username`` from ``ip`` after it logged in there."""
+    cache.delete(_counters(username, ip)[0][0])
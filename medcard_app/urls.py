@@ -20,17 +20,31 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('patient_crud/', PatientSignupAPIView.as_view(), name='patient_crud'),
     path('patient_crud/<str:username>/', PatientRetrieveAPIView.as_view(), name='patient-detail'),
+    path('patients/<int:patient_id>/medical_record/', PatientMedicalRecordView.as_view(),
+         name='patient-medical-record'),
+    path('patients/<int:patient_id>/medications/', PatientMedicationListView.as_view(), name='patient-medications'),
+    path('patients/medications/', PatientMedicationBulkView.as_view(), name='patients-medications'),
+    path('contraindications/check/', ContraindicationCheckView.as_view(), name='contraindication-check'),
+    path('contraindications/screen/', ContraindicationScreenView.as_view(), name='contraindication-screen'),
     path('login/', LoginAPIView.as_view(), name='login'),
 
     path('verify-email/', VerifyEmailAPIView.as_view(), name='verify-email'),
+    path('auth/cache_stats/', AuthCacheStatsView.as_view(), name='auth-cache-stats'),
+    path('exports/<str:dataset>/', ExportView.as_view(), name='export'),
 
     path('doctor_detail/<int:pk>/', DoctorDetailView.as_view(), name='doctor_detail'),
+    path('doctor_detail/<int:pk>/reviews/', DoctorReviewListView.as_view(), name='doctor-reviews'),
+    path('doctors/', DoctorListView.as_view(), name='doctor-list'),
 
     path('clinics/', ClinicListView.as_view(), name='clinics-list'),
+    path('clinics/nearby/', NearbyClinicListView.as_view(), name='clinics-nearby'),
+    path('search/', SearchView.as_view(), name='search'),
 
     path('appointments_crud/<int:pk>/', AppointmentAPIView.as_view(), name='appointment-crud'),
     path('appointments_crud/', AppointmentAPIViewPost.as_view(), name='appointment-create'),
     path('appointments_list/', AppointmentListView.as_view(), name='appointment-list'),
+    path('free_slots/', FreeSlotListView.as_view(), name='free-slots'),
+    path('next_available/', NextAvailableSlotView.as_view(), name='next-available'),
 
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]
@@ -1,11 +1,11 @@
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.core.cache import cache
 from django.contrib.auth import authenticate, login, logout
-from django.core.mail import send_mail
 from drf_yasg.utils import swagger_auto_schema
-from django.utils.dateparse import parse_date
-from rest_framework.authentication import SessionAuthentication, TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
@@ -13,9 +13,22 @@ from rest_framework.views import APIView
 import random
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from .models import EmailVerification
+from .caching import (CLINIC_LIST_GENERATION, doctor_generation_key, doctor_profile_key, generation_condition,
+                      get_generation, get_or_render, medical_record_generation_key, medical_record_key,
+                      patient_generation_key, variant_key)
+from . import exports, geo, medical_records, medications, outbox, search
+from .authentication import CachedTokenAuthentication, token_cache
+from .contraindications import chart_names, contraindications, screen as screen_contraindications
+from .permissions import CanViewMedicalRecord
+from .throttling import blocked_for, client_ip, record_failure, reset as reset_failures
+from .pagination import KeysetPaginator
 from .serializers import *
+from .slots import build_slot_index, find_next_slots, local_now, serialize_slots, slot_times
 from drf_yasg import openapi
+from django.db import transaction
+from django.db.models.functions import ExtractIsoWeekDay
 from django.db.utils import IntegrityError
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.password_validation import validate_password
@@ -23,6 +36,16 @@ from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.core.exceptions import ObjectDoesNotExist
 
+SLOT_TAKEN_MESSAGE = 'This time slot has already been booked. Please choose another one.'
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+FIELD_SELECTION_PARAMETERS = [
+    openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Comma separated fields to return; use dots for nested fields "
+                                  "(e.g. doctor_fullname,clinic.clinic_name)."),
+    openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Comma separated fields to expand into their full representation."),
+]
+
 
 # Create your views here.
 class PatientSignupAPIView(APIView):
@@ -43,10 +66,12 @@ class PatientSignupAPIView(APIView):
             # Serialize user data and patient profile data into a form suitable for caching
             user_data = validated_data.pop('user')  # separate the nested user data
             profile_data = validated_data  # remaining data is for the patient profile
+            # The cache is a file on disk; keep only the hash until the account is created
+            user_data['password'] = make_password(user_data['password'])
 
             # Combine all necessary data for caching
             cache_data = {
-                'user': user_data,  # user data includes username, password, and email
+                'user': user_data,  # user data includes username, password hash, and email
                 'profile': profile_data,  # profile data includes all other patient details
                 'code': verification_code
             }
@@ -54,13 +79,11 @@ class PatientSignupAPIView(APIView):
             # Cache the data with a 30-minute timeout
             cache_key = f'verification_{user_data["email"]}'
             cache.set(cache_key, cache_data, timeout=1800)  # 1800 seconds = 30 minutes
-            # Send verification email
-            send_mail(
+            # Queue the verification email; manage.py send_queued_emails delivers it
+            outbox.enqueue(
                 'Verification Code',
                 f'Your verification code is: {verification_code}. Use this code to complete your registration.',
-                settings.EMAIL_HOST_USER,
                 [user_data['email']],
-                fail_silently=False,
             )
 
             return Response({'detail': 'Signup data cached. Please verify your email.'}, status=status.HTTP_201_CREATED)
@@ -91,8 +114,11 @@ class VerifyEmailAPIView(APIView):
             if cached_data and cached_data['code'] == code:
                 try:
                     # Create the user
-                    user_data = cached_data['user']
+                    user_data = dict(cached_data['user'])
+                    password = user_data.pop('password')  # hashed at signup
                     user = User.objects.create_user(**user_data)
+                    user.password = password
+                    user.save(update_fields=['password'])
 
                     # Create the patient profile
                     profile_data = cached_data['profile']
@@ -123,18 +149,21 @@ class VerifyEmailAPIView(APIView):
 
 
 class PatientRetrieveAPIView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(generation_condition(lambda username: patient_generation_key(username)))
     @swagger_auto_schema(
         operation_summary="Retrieve Patient Profile",
         operation_description="Retrieves a detailed patient profile along with associated user data based on the username.",
         responses={
             status.HTTP_200_OK: openapi.Response(description="Detailed patient profile data",
                                                  schema=PatientProfileRetrievalSerializer),
+            status.HTTP_304_NOT_MODIFIED: openapi.Response(description="Profile unchanged since the given ETag"),
             status.HTTP_404_NOT_FOUND: openapi.Response(description="User not found or no associated patient profile"),
             status.HTTP_500_INTERNAL_SERVER_ERROR: openapi.Response(description="Internal Server Error")
         },
+        manual_parameters=FIELD_SELECTION_PARAMETERS,
         tags=['Patient Profile'],
 
     )
@@ -142,8 +171,9 @@ class PatientRetrieveAPIView(APIView):
         # Simplify exception handling to focus on common cases
         try:
             user = User.objects.get(username=username)
-            patient_profile = get_object_or_404(PatientProfile, patient_username=user)
-            serializer = PatientProfileRetrievalSerializer(patient_profile)
+            profiles = PatientProfileRetrievalSerializer.setup_eager_loading(PatientProfile.objects.all(), request)
+            patient_profile = get_object_or_404(profiles, patient_username=user)
+            serializer = PatientProfileRetrievalSerializer(patient_profile, context={'request': request})
             return Response(serializer.data)
         except User.DoesNotExist:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -175,33 +205,252 @@ class PatientRetrieveAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class PatientMedicalRecordView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, CanViewMedicalRecord]
+
+    @method_decorator(generation_condition(lambda patient_id: medical_record_generation_key(patient_id)))
+    @swagger_auto_schema(
+        operation_summary="Retrieve a patient's medical record",
+        operation_description="Returns the patient's complete chart: allergies, medications, conditions, chronic "
+                              "and genetic illnesses and doctor notes, each listed once. Available to the patient, "
+                              "doctors and staff.",
+        responses={
+            200: openapi.Response(description="The grouped medical record", schema=MedicalRecordSerializer),
+            304: "Record unchanged since the given ETag",
+            403: "Not the patient, a doctor or staff",
+            404: "Patient not found"
+        },
+        tags=['Patient Profile'],
+    )
+    def get(self, request, patient_id):
+        def build():
+            rows = list(medical_records.profile_rows(patient_id))
+            if not rows and not PatientProfile.objects.filter(pk=patient_id).exists():
+                raise PatientProfile.DoesNotExist
+            return medical_records.build_record(patient_id, rows)
+
+        try:
+            return HttpResponse(get_or_render(medical_record_key(patient_id), build), content_type='application/json')
+        except PatientProfile.DoesNotExist:
+            return Response({'error': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+
+
+class PatientMedicationListView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, CanViewMedicalRecord]
+
+    @swagger_auto_schema(
+        operation_summary="List a patient's medications on a day or over a window",
+        operation_description="Returns the medications the patient took on a day (today by default) or on any day "
+                              "of a window, most recently started first. A medication without an end date is "
+                              "still being taken.",
+        query_serializer=MedicationIntervalQuerySerializer,
+        responses={
+            200: openapi.Response(description="Matching medications", schema=MedicationSerializer(many=True)),
+            400: openapi.Response(description="Invalid query parameters"),
+            403: openapi.Response(description="Not the patient, a doctor or staff")
+        },
+        tags=['Patient Profile'],
+    )
+    def get(self, request, patient_id):
+        query = MedicationIntervalQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        found = medications.patient_medications(patient_id, params['date_from'], params['date_to'])
+        return Response(MedicationSerializer(found, many=True).data, status=status.HTTP_200_OK)
+
+
+class PatientMedicationBulkView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, CanViewMedicalRecord]
+
+    @swagger_auto_schema(
+        operation_summary="List the medications of several patients on a day or over a window",
+        operation_description="Same as the single patient listing for up to "
+                              f"{PatientMedicationQuerySerializer.MAX_PATIENTS} patients in one query. Patients "
+                              "without a matching medication are left out. Doctors and staff only.",
+        query_serializer=PatientMedicationQuerySerializer,
+        responses={
+            200: openapi.Response(description="Matching medications per patient",
+                                  schema=PatientMedicationsSerializer(many=True)),
+            400: openapi.Response(description="Invalid query parameters"),
+            403: openapi.Response(description="Not a doctor or staff")
+        },
+        tags=['Patient Profile'],
+    )
+    def get(self, request):
+        query = PatientMedicationQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        found = medications.medications_by_patient(params['patient'], params['date_from'], params['date_to'])
+        results = [{'patient_id': patient_id, 'medications': taken} for patient_id, taken in found.items()]
+        return Response(PatientMedicationsSerializer(results, many=True).data, status=status.HTTP_200_OK)
+
+
+class ContraindicationCheckView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, CanViewMedicalRecord]
+
+    @swagger_auto_schema(
+        operation_summary="Check a prescription for allergy conflicts",
+        operation_description="Checks medications against the given allergies and, with patient_id, every allergy "
+                              "recorded for that patient. Doctors and staff only.",
+        request_body=ContraindicationCheckSerializer,
+        responses={
+            200: openapi.Response(description="Contraindicated pairs; empty when the prescription is safe",
+                                  schema=ConflictSerializer(many=True)),
+            400: openapi.Response(description="Invalid request body"),
+            403: openapi.Response(description="Not a doctor or staff")
+        },
+        tags=['Patient Profile'],
+    )
+    def post(self, request):
+        serializer = ContraindicationCheckSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        allergies = data['allergies']
+        if data.get('patient_id') is not None:
+            recorded, _ = chart_names(PatientMedicalProfile.objects.filter(patient_id=data['patient_id'])
+                                      .values_list('allergy_id__allergy_name', 'medication_id__name'))
+            allergies = allergies + recorded
+        conflicts = contraindications.conflicts(allergies, data['medications'])
+        return Response(ConflictSerializer(conflicts, many=True).data, status=status.HTTP_200_OK)
+
+
+class ContraindicationScreenView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, CanViewMedicalRecord]
+
+    @swagger_auto_schema(
+        operation_summary="Screen patients for allergy conflicts",
+        operation_description="Checks every recorded medication of every patient (or of the given patients) "
+                              "against their recorded allergies in one pass. Lists only patients with a conflict. "
+                              "Doctors and staff only.",
+        query_serializer=ContraindicationScreenQuerySerializer,
+        responses={
+            200: openapi.Response(description="Conflicts per patient", schema=PatientConflictsSerializer(many=True)),
+            400: openapi.Response(description="Invalid query parameters"),
+            403: openapi.Response(description="Not a doctor or staff")
+        },
+        tags=['Patient Profile'],
+    )
+    def get(self, request):
+        query = ContraindicationScreenQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        found = screen_contraindications(query.validated_data.get('patient') or None)
+        results = [{'patient_id': patient_id, 'conflicts': conflicts} for patient_id, conflicts in found.items()]
+        return Response(PatientConflictsSerializer(results, many=True).data, status=status.HTTP_200_OK)
+
+
 class DoctorDetailView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(generation_condition(lambda pk: doctor_generation_key(pk)))
     @swagger_auto_schema(
         operation_summary="Get detailed information about a doctor",
         operation_description="Retrieves comprehensive details about a doctor, including work experience, qualifications, reviews, and availability schedules.",
         responses={
             200: openapi.Response(description="Doctor details retrieved successfully", schema=DoctorSerializer),
+            304: "Doctor unchanged since the given ETag",
             404: "Doctor not found"
         },
+        manual_parameters=FIELD_SELECTION_PARAMETERS,
         tags=['Doctor Detail'],
 
     )
     def get(self, request, pk, format=None):
+        # A cache hit is served without touching the ORM; the key changes whenever the doctor's rows do
+        key = doctor_profile_key(pk, request)
+
+        def build():
+            doctor = DoctorSerializer.setup_eager_loading(Doctors.objects.all(), request).get(pk=pk)
+            return DoctorSerializer(doctor, context={'request': request}).data
+
         try:
-            doctor = Doctors.objects.get(pk=pk)
-            serializer = DoctorSerializer(doctor)
-            return Response(serializer.data)
+            return HttpResponse(get_or_render(key, build), content_type='application/json')
         except Doctors.DoesNotExist:
             return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+class DoctorReviewListView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination = KeysetPaginator(('-id',), page_size=20, max_page_size=100)
+
+    @swagger_auto_schema(
+        operation_summary="List a doctor's reviews",
+        operation_description="Retrieve one page of a doctor's reviews, newest first. Doctor payloads only carry "
+                              "the latest few; follow next_cursor here to read the rest.",
+        query_serializer=ReviewPageQuerySerializer,
+        responses={
+            200: openapi.Response(description="A page of reviews plus next_cursor",
+                                  schema=DoctorReviewSerializer(many=True)),
+            400: openapi.Response(description="Invalid cursor"),
+            404: "Doctor not found"
+        },
+        tags=['Doctor Detail'],
+    )
+    def get(self, request, pk):
+        page, next_cursor = self.pagination.paginate_queryset(DoctorReview.objects.filter(doctor_id=pk), request)
+        if not page and not Doctors.objects.filter(pk=pk).exists():
+            return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = DoctorReviewSerializer(page, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+
+
+class DoctorListView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="List doctors by rating",
+        operation_description="Retrieve one page of doctors with their average rating, optionally filtered by "
+                              "specialty, clinic and minimum rating. Follow next_cursor to fetch the next page.",
+        query_serializer=DoctorFilterSerializer,
+        manual_parameters=FIELD_SELECTION_PARAMETERS,
+        responses={
+            200: openapi.Response(description="A page of doctors plus next_cursor",
+                                  schema=DoctorSummarySerializer(many=True)),
+            400: openapi.Response(description="Invalid filters or cursor")
+        },
+        tags=['Doctor Detail'],
+    )
+    def get(self, request):
+        filters = DoctorFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = filters.validated_data
+
+        doctors = Doctors.objects.all()
+        if 'speciality' in params:
+            doctors = doctors.filter(speciality_name_id=params['speciality'])
+        if 'clinic' in params:
+            doctors = doctors.filter(clinic_id=params['clinic'])
+        if 'min_rating' in params:
+            doctors = doctors.filter(rating_avg__gte=params['min_rating'])
+        doctors = DoctorSummarySerializer.setup_eager_loading(doctors, request)
+
+        pagination = KeysetPaginator(DoctorFilterSerializer.ORDERINGS[params['ordering']])
+        page, next_cursor = pagination.paginate_queryset(doctors, request)
+        serializer = DoctorSummarySerializer(page, many=True, context={'request': request})
+        return Response({'results': serializer.data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+
+
 class ClinicListView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(generation_condition(lambda: CLINIC_LIST_GENERATION))
     @swagger_auto_schema(
         operation_summary="List all clinics",
         operation_description="Retrieve a list of clinics with details of associated doctors, including their specialities and availabilities.",
@@ -210,22 +459,25 @@ class ClinicListView(APIView):
                 description="A list of clinics",
                 schema=ClinicListSerializer(many=True)
             ),
+            304: "Clinics unchanged since the given ETag",
             404: "Not Found"
         },
+        manual_parameters=FIELD_SELECTION_PARAMETERS,
         tags=['Clinics'],
     )
     def get(self, request):
-        clinics = Clinics.objects.prefetch_related(
-            'doctors_set',
-            'doctors_set__availabilities',
-            'doctors_set__speciality_name'
-        ).all()
-        serializer = ClinicListSerializer(clinics, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # The rendered list is cached until any clinic, doctor or doctor detail row changes
+        key = variant_key('clinic_list', get_generation(CLINIC_LIST_GENERATION), request)
+
+        def build():
+            clinics = ClinicListSerializer.setup_eager_loading(Clinics.objects.all(), request)
+            return ClinicListSerializer(clinics, many=True, context={'request': request}).data
+
+        return HttpResponse(get_or_render(key, build), content_type='application/json')
 
 
 class AppointmentAPIView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
@@ -235,11 +487,13 @@ class AppointmentAPIView(APIView):
             200: openapi.Response(description='Success', schema=AppointmentDetailSerializer),
             404: 'Not Found'
         },
+        manual_parameters=FIELD_SELECTION_PARAMETERS,
         tags=['Appointments'],
     )
     def get(self, request, pk, *args, **kwargs):
-        appointment = get_object_or_404(Appointment, pk=pk)
-        serializer = AppointmentDetailSerializer(appointment)
+        appointments = AppointmentDetailSerializer.setup_eager_loading(Appointment.objects.all(), request)
+        appointment = get_object_or_404(appointments, pk=pk)
+        serializer = AppointmentDetailSerializer(appointment, context={'request': request})
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -249,7 +503,8 @@ class AppointmentAPIView(APIView):
         responses={
             200: openapi.Response(description='Success', schema=AppointmentSerializer),
             400: openapi.Response(description='Bad Request - Invalid data'),
-            404: 'Not Found'
+            404: 'Not Found',
+            409: openapi.Response(description='The time slot has already been booked')
         },
         tags=['Appointments'],
     )
@@ -257,13 +512,17 @@ class AppointmentAPIView(APIView):
         appointment = get_object_or_404(Appointment, pk=pk)
         serializer = AppointmentSerializer(appointment, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            try:
+                with transaction.atomic():
+                    serializer.save()
+            except IntegrityError:
+                return Response({'detail': SLOT_TAKEN_MESSAGE}, status=status.HTTP_409_CONFLICT)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class AppointmentAPIViewPost(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
@@ -274,6 +533,7 @@ class AppointmentAPIViewPost(APIView):
             201: openapi.Response(description="Appointment created successfully", schema=AppointmentSerializer),
             400: openapi.Response(description="Invalid input data or doctor is not available at the given time"),
             404: openapi.Response(description="Not Found"),
+            409: openapi.Response(description="The time slot has already been booked"),
             403: openapi.Response(description="Permission denied")
         },
         tags=['Appointments'],
@@ -281,44 +541,265 @@ class AppointmentAPIViewPost(APIView):
     def post(self, request, *args, **kwargs):
         serializer = AppointmentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(patient=request.user)
+            # The insert is the claim: the unique_active_appointment_slot constraint lets exactly one
+            # of several concurrent requests for the same slot commit
+            try:
+                with transaction.atomic():
+                    serializer.save(patient=request.user)
+            except IntegrityError:
+                return Response({'detail': SLOT_TAKEN_MESSAGE}, status=status.HTTP_409_CONFLICT)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class AppointmentListView(APIView):
-    authentication_classes = [SessionAuthentication, TokenAuthentication]
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination = KeysetPaginator(('date', 'start_time', 'id'))
 
     @swagger_auto_schema(
         operation_summary="List all appointments",
-        operation_description="Retrieve a list of all appointments organized by day of the week.",
+        operation_description="Retrieve one page of appointments organized by day of the week. Filter by doctor, "
+                              "patient, date range and status; follow next_cursor to fetch the next page. "
+                              "Doctors are compact unless expand=doctor is given.",
+        query_serializer=AppointmentFilterSerializer,
+        manual_parameters=FIELD_SELECTION_PARAMETERS,
         responses={
             200: openapi.Response(
-                description="A dictionary of appointments grouped by day of the week",
-                schema=AppointmentDetailSerializer(many=True)
+                description="A dictionary of appointments grouped by day of the week, plus next_cursor",
+                schema=AppointmentListSerializer(many=True)
                 # This description might need to be adjusted based on actual schema
-            )
+            ),
+            400: openapi.Response(description="Invalid filters or cursor")
         },
         tags=['Appointments']
     )
     def get(self, request):
-        appointments = Appointment.objects.all()
-        serializer = AppointmentDetailSerializer(appointments, many=True)
-        data = serializer.data
+        filters = AppointmentFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = filters.validated_data
+
+        appointments = Appointment.objects.annotate(weekday=ExtractIsoWeekDay('date'))
+        if 'doctor' in params:
+            appointments = appointments.filter(doctor_id=params['doctor'])
+        if 'patient' in params:
+            appointments = appointments.filter(patient_id=params['patient'])
+        if 'date_from' in params:
+            appointments = appointments.filter(date__gte=params['date_from'])
+        if 'date_to' in params:
+            appointments = appointments.filter(date__lte=params['date_to'])
+        if 'status' in params:
+            appointments = appointments.filter(status=params['status'])
+        appointments = AppointmentListSerializer.setup_eager_loading(appointments, request)
+
+        page, next_cursor = self.pagination.paginate_queryset(appointments, request)
+        data = AppointmentListSerializer(page, many=True, context={'request': request}).data
+
+        # Group appointments by the ISO day of the week computed by the database (Monday is 1)
+        weekdays = {day: [] for day in WEEKDAYS}
+        for appointment, item in zip(page, data):
+            weekdays[WEEKDAYS[appointment.weekday - 1]].append(item)
+        weekdays['next_cursor'] = next_cursor
 
-        # Create a dictionary to hold the appointments by weekdays
-        weekdays = {day: [] for day in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']}
+        return Response(weekdays, status=status.HTTP_200_OK)
 
-        # Group appointments by the day of the week
-        for item in data:
-            appointment_date = parse_date(item['date'])
-            if appointment_date:
-                day_of_week = appointment_date.strftime('%A').lower()
-                if day_of_week in weekdays:
-                    weekdays[day_of_week].append(item)
 
-        return Response(weekdays, status=status.HTTP_200_OK)
+class FreeSlotListView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="List free appointment slots",
+        operation_description="Returns the open 30-minute slots of one or more doctors (or of every doctor of a "
+                              "clinic) over a date range, so clients can book without trial and error.",
+        query_serializer=FreeSlotQuerySerializer,
+        responses={
+            200: openapi.Response(description="Free slots grouped by doctor and day"),
+            400: openapi.Response(description="Invalid query parameters")
+        },
+        tags=['Appointments'],
+    )
+    def get(self, request):
+        query = FreeSlotQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        doctors = Doctors.objects.all()
+        if params.get('doctor'):
+            doctors = doctors.filter(pk__in=params['doctor'])
+        if params.get('clinic') is not None:
+            doctors = doctors.filter(clinic_id=params['clinic'])
+
+        index = build_slot_index(doctors.values('pk'), params['date_from'], params['date_to'],
+                                 not_before=local_now())
+        results = [
+            {'doctor': doctor_id, 'date': day.isoformat(), 'slots': serialize_slots(mask)}
+            for doctor_id, days in sorted(index.items())
+            for day, mask in sorted(days.items())
+        ]
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class NextAvailableSlotView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Find the next available doctors",
+        operation_description="Returns the earliest free 30-minute slots with any doctor of a specialty and/or "
+                              "clinic, walking forward day by day from date_from.",
+        query_serializer=NextAvailableQuerySerializer,
+        responses={
+            200: openapi.Response(description="Earliest free slots",
+                                  schema=NextAvailableSlotSerializer(many=True)),
+            400: openapi.Response(description="Invalid query parameters")
+        },
+        tags=['Appointments'],
+    )
+    def get(self, request):
+        query = NextAvailableQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        doctors = Doctors.objects.all()
+        if params.get('speciality') is not None:
+            doctors = doctors.filter(speciality_name_id=params['speciality'])
+        if params.get('clinic') is not None:
+            doctors = doctors.filter(clinic_id=params['clinic'])
+
+        now = local_now()
+        found = find_next_slots(doctors.values('pk'), params.get('date_from') or now.date(), params['limit'],
+                                params['max_days'], not_before=now)
+        profiles = Doctors.objects.select_related('clinic', 'speciality_name').in_bulk(
+            {doctor_id for _, _, doctor_id in found})
+        slots = []
+        for day, index, doctor_id in found:
+            start_time, end_time = slot_times(index)
+            slots.append({'doctor': profiles[doctor_id], 'date': day, 'start_time': start_time,
+                          'end_time': end_time})
+        return Response(NextAvailableSlotSerializer(slots, many=True).data, status=status.HTTP_200_OK)
+
+
+class SearchView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Search doctors and clinics",
+        operation_description="Full-text search over doctor names, specialties, clinic names and addresses with "
+                              "prefix matching, best matches first.",
+        query_serializer=SearchQuerySerializer,
+        responses={
+            200: openapi.Response(description="Matching doctors and clinics, best first"),
+            400: openapi.Response(description="Invalid query parameters")
+        },
+        tags=['Search'],
+    )
+    def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+        results = search.search(params['q'], kind=params.get('type'), limit=params['limit'])
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class NearbyClinicListView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Find the nearest clinics",
+        operation_description="Returns the k clinics closest to a point, nearest first, each with the doctors that "
+                              "have a free slot starting within the next few hours. Only the grid cells around the "
+                              "point are read.",
+        query_serializer=NearbyClinicQuerySerializer,
+        responses={
+            200: openapi.Response(description="Nearest clinics with their open-soon doctors"),
+            400: openapi.Response(description="Invalid query parameters")
+        },
+        tags=['Clinics'],
+    )
+    def get(self, request):
+        query = NearbyClinicQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        nearest = geo.nearest_clinics(params['lat'], params['lng'], params['k'], params['max_distance_km'])
+        open_soon = geo.open_soon([clinic.pk for distance, clinic in nearest], params['within_hours'])
+        results = [
+            {
+                'id': clinic.pk,
+                'clinic_name': clinic.clinic_name,
+                'address': clinic.address,
+                'contacts': clinic.contacts,
+                'latitude': clinic.latitude,
+                'longitude': clinic.longitude,
+                'distance_km': round(distance, 3),
+                'open_soon': [
+                    {'doctor': doctor.pk, 'doctor_fullname': doctor.doctor_fullname,
+                     'speciality': doctor.speciality_name.speciality_name, 'date': day.isoformat(),
+                     'start_time': start_time.isoformat(), 'end_time': end_time.isoformat()}
+                    for doctor, day, start_time, end_time in open_soon.get(clinic.pk, [])
+                ],
+            }
+            for distance, clinic in nearest
+        ]
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class AuthCacheStatsView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Token cache statistics",
+        operation_description="Hit/miss counters of the token authentication cache of the process that serves the "
+                              "request. Staff only.",
+        responses={
+            200: openapi.Response(description="Counters, current size and hit ratio"),
+            403: openapi.Response(description="Not a staff user")
+        },
+        tags=['Admin'],
+    )
+    def get(self, request):
+        return Response(token_cache.stats(), status=status.HTTP_200_OK)
+
+
+class ExportView(APIView):
+    authentication_classes = [SessionAuthentication, CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Export every row of a dataset",
+        operation_description="Streams all patients, appointments or medical profile rows as NDJSON or a JSON "
+                              "array, in primary key order. Memory use does not grow with the export. Staff only.",
+        query_serializer=ExportQuerySerializer,
+        responses={
+            200: openapi.Response(description="The streamed rows"),
+            400: openapi.Response(description="Invalid query parameters"),
+            403: openapi.Response(description="Not a staff user"),
+            404: openapi.Response(description="Unknown dataset")
+        },
+        tags=['Admin'],
+    )
+    def get(self, request, dataset):
+        if dataset not in exports.DATASETS:
+            return Response({'error': f'Unknown dataset, expected one of {", ".join(exports.DATASETS)}'},
+                            status=status.HTTP_404_NOT_FOUND)
+        query = ExportQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        output = query.validated_data['output']
+
+        response = StreamingHttpResponse(exports.stream(exports.iter_rows(dataset), output),
+                                         content_type=exports.FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{output}"'
+        return response
 
 
 class LoginAPIView(APIView):
@@ -329,6 +810,7 @@ class LoginAPIView(APIView):
             status.HTTP_200_OK: "Login successful. Token, username and role returned.",
             status.HTTP_400_BAD_REQUEST: "Invalid username or password. Email not verified. Email verification record not found.",
             status.HTTP_401_UNAUTHORIZED: "Username and password are required.",
+            status.HTTP_429_TOO_MANY_REQUESTS: "Too many failed login attempts from this address, or for this username from many addresses.",
             status.HTTP_500_INTERNAL_SERVER_ERROR: "An error occurred while processing your request. Please try again later."
         }
     )
@@ -342,16 +824,25 @@ class LoginAPIView(APIView):
             if not username or not password:
                 return Response({'detail': 'Username and password are required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            user = authenticate(request, username=username, password=password)
+            # Refuse credential storms before paying for a password hash
+            ip = client_ip(request)
+            retry_after = blocked_for(username, ip)
+            if retry_after:
+                return Response({'detail': 'Too many failed login attempts. Please try again later.'},
+                                status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
 
+            # Runs the configured backends and sends user_login_failed; ModelBackend hashes the password
+            # even for unknown usernames, so they take as long as wrong passwords
+            user = authenticate(request, username=username, password=password)
             if user is None:
+                record_failure(username, ip)
                 return Response({'detail': 'Invalid username or password.'}, status=status.HTTP_401_UNAUTHORIZED)
+            reset_failures(username, ip)
 
             if 'DOC' not in username:
                 # Check if email is verified
                 try:
-                    email_verification = EmailVerification.objects.get(user=user)
-                    if not email_verification.verified:
+                    if not user.emailverification.verified:
                         return Response({'detail': 'Email not verified. Please verify your email.'},
                                         status=status.HTTP_400_BAD_REQUEST)
                 except ObjectDoesNotExist:
@@ -362,7 +853,10 @@ class LoginAPIView(APIView):
             role = 'patient' if 'DOC' in username else 'patient'
 
             # Generate or get token
-            token, created = Token.objects.get_or_create(user=user)
+            try:
+                token = user.auth_token
+            except ObjectDoesNotExist:
+                token, created = Token.objects.get_or_create(user=user)
 
             login(request, user)
 
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Outside the session middleware, so it sees the session cookie a login sets
+    "medcard_app.routers.ReadYourWritesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -79,9 +81,67 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+    },
+}
+
+# MEDCARD_DB_PROFILE=production keeps connections open across requests and tunes every new SQLite
+# connection (see medcard_app/database.py): WAL lets readers run alongside the single writer, and
+# busy_timeout makes a writer wait for the lock instead of failing with "database is locked".
+DATABASE_PROFILE = os.environ.get("MEDCARD_DB_PROFILE", "development")
+
+# Read-only "replica" connection; medcard_app.routers sends reads there so directory listings do not
+# hold the primary connection that bookings write through. MEDCARD_DB_REPLICA names its file, and the
+# production profile opens db.sqlite3 itself. mode=ro cannot create a file, so the alias is only added
+# once the file exists (after the first migrate); until then every query goes to default.
+DATABASE_REPLICA_FILE = os.environ.get("MEDCARD_DB_REPLICA") or (
+    DATABASES["default"]["NAME"] if DATABASE_PROFILE == "production" else None
+)
+
+if DATABASE_REPLICA_FILE and Path(DATABASE_REPLICA_FILE).exists():
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"{Path(DATABASE_REPLICA_FILE).resolve().as_uri()}?mode=ro",
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["medcard_app.routers.ReadReplicaRouter"]
+    DATABASE_REPLICA = "replica"
+    # After a write, the same client reads from the primary this long, covering any replica lag
+    REPLICA_PIN_SECONDS = 5
+
+SQLITE_PRAGMAS = {}
+
+if DATABASE_PROFILE == "production":
+    for database in DATABASES.values():
+        database.update({"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True})
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "busy_timeout": 5000,
+        # Durable at every checkpoint; a power loss can only drop the last transactions, never corrupt
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # KiB, per connection
+        "mmap_size": 256 * 1024 * 1024,
+    }
+
+# Cache
+# Every worker process shares one SQLite file, so pending signups, login roles, cache generations
+# and cached tokens are visible to all of them without a cache server.
+
+CACHES = {
+    "default": {
+        "BACKEND": "medcard_app.cache_backends.SQLiteCache",
+        "LOCATION": os.environ.get("MEDCARD_CACHE_PATH", BASE_DIR / "cache.sqlite3"),
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 100000, "CULL_FREQUENCY": 3},
     }
 }
 
+# Failed logins from one address before it gets 429s for 15 minutes (medcard_app/throttling.py); raise it
+# for clients behind a shared NAT or proxy, or set None to count only per username
+LOGIN_IP_FAILURE_LIMIT = 50
+
+# Tests run against a temporary cache file, never the one live workers share
+TEST_RUNNER = "medcard_app.test_runner.IsolatedCacheRunner"
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 